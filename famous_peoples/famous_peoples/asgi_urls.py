@@ -0,0 +1,10 @@
+from django.urls import path, include
+from famous_peoples.urls import handler404, urlpatterns as wsgi_urlpatterns
+
+
+# Корневой URLconf для запросов через ASGI (его выбирает peoples.middleware.AsyncUrlconf):
+# те же маршруты, но горячие страницы на чтение обслуживают асинхронные представления
+urlpatterns = [
+    path('', include('peoples.async_urls')),
+    *wsgi_urlpatterns,
+]
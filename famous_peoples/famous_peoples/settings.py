@@ -39,12 +39,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'peoples.middleware.Instrumentation',
     'django.middleware.security.SecurityMiddleware',
+    'peoples.middleware.AsyncUrlconf',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'peoples.middleware.PageCache',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware'
 ]
@@ -53,7 +56,7 @@ ROOT_URLCONF = 'famous_peoples.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'peoples.metrics.DjangoTemplates',
         'DIRS': [
             BASE_DIR / 'templates',
         ],
@@ -166,11 +169,22 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 
 
+# default - локальный LRU процесса перед Redis (peoples/cache_backends.py); локально хранятся версии пространств
+# имен и записи под версионными ключами (кроме блокировок), остальное читается прямо из Redis
 CACHES = {
     "default": {
+        "BACKEND": "peoples.cache_backends.TwoTierCache",
+        "LOCATION": "redis",
+        "OPTIONS": {
+            "MAX_ENTRIES": 2000,
+            "LOCAL_TIMEOUT": 10,
+            "LOCAL_KEYS": r"((peoples|api_person)_[^:]*:(version|v\d+(:.*)?)|peoples_page:.*)(?<!:lock)",
+        },
+    },
+    "redis": {
         "BACKEND": "django.core.cache.backends.redis.RedisCache",
         "LOCATION": "redis://127.0.0.1:6379/1"
-    }
+    },
 }
 
 
@@ -31,7 +31,7 @@ class BasePersonAdmin(admin.ModelAdmin):
     list_display_links = ('title', )
     ordering = ['-time_create', 'title']
     list_editable = ('is_published', )
-    actions = ('set_published', 'set_draft')
+    actions = ('set_published', 'set_draft', 'link_companions', 'unlink_companions')
     search_fields = ('title__startswith', 'cat__name')
     list_filter = (CompanionFilter, 'cat__name', 'is_published')
     fields = ('title', 'slug', 'gender', 'content', 'photo', 'post_photo', 'cat', 'companion', 'tag')
@@ -67,7 +67,7 @@ class BasePersonAdmin(admin.ModelAdmin):
     @admin.display(description='Изображение')
     def post_photo(self, obj):
         if obj.photo:
-            return mark_safe(f"<img src='{obj.photo.url}' width=50>")
+            return mark_safe(f"<img src='{obj.photo_url(50)}' width=50>")
         return 'Без фото'
 
     @admin.action(description="Опубликовать выбранные записи")
@@ -82,16 +82,30 @@ class BasePersonAdmin(admin.ModelAdmin):
         count = queryset.update(is_published=model.Status.DRAFT)
         self.message_user(request, f"{count} записи были сняты с публикации", messages.WARNING)
 
+    @admin.action(description="Связать две выбранные записи в пару")
+    def link_companions(self, request, queryset):
+        persons = list(queryset.only('gender')[:3])
+        if len(persons) != 2 or persons[0].gender == persons[1].gender:
+            self.message_user(request, "Выберите две записи противоположного пола", messages.ERROR)
+            return
+        queryset.link_companions({persons[0].pk: persons[1].pk})
+        self.message_user(request, "Пара связана", messages.SUCCESS)
+
+    @admin.action(description="Разорвать пары выбранных записей")
+    def unlink_companions(self, request, queryset):
+        count = queryset.link_companions(dict.fromkeys(queryset.values_list('pk', flat=True)))
+        self.message_user(request, f"Партнер обнулен у {count} записей", messages.WARNING)
+
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ('name', )
+    list_display = ('name', 'posts_count')
     list_display_links = ('name', )
     prepopulated_fields = {'slug': ('name', )}
 
 
 @admin.register(TagPost)
 class TagPostAdmin(admin.ModelAdmin):
-    list_display = ('tag', )
+    list_display = ('tag', 'posts_count')
     list_display_links = ('tag', )
     prepopulated_fields = {'slug': ('tag', )}
\ No newline at end of file
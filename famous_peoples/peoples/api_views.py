@@ -1,11 +1,18 @@
+from django.http import StreamingHttpResponse
+from django.utils.functional import cached_property
 from rest_framework import generics, viewsets, mixins
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
 import peoples.models as m
 from peoples.custom_permissions import IsAdminOrReadOnly
-from peoples.serializers import CategorySerializer, PersonSerializer
-from django.core.cache import cache
+from peoples.filters import PersonFilter
+from peoples.pagination import PersonPagination, SearchPagination
+from peoples.renderers import FastJSONRenderer, dumps
+from peoples.serializers import CATEGORY_PLAN, CategorySerializer, PersonFieldset, PersonSerializer
+from peoples import records, search, utils
 
 
 class CategoryAPIDestroy(generics.RetrieveDestroyAPIView):
@@ -23,6 +30,11 @@ class CategoryAPIDestroy(generics.RetrieveDestroyAPIView):
     queryset = m.Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = (IsAdminOrReadOnly, )
+    renderer_classes = (FastJSONRenderer, BrowsableAPIRenderer)
+
+    def retrieve(self, request, *args, **kwargs):
+        # чтение - по плану полей сериализатора (serializers.FieldPlan), без полей DRF
+        return Response(CATEGORY_PLAN.data([self.get_object()])[0])
 
 
 class PersonViewSet(mixins.RetrieveModelMixin, mixins.UpdateModelMixin, mixins.ListModelMixin, mixins.CreateModelMixin,
@@ -31,9 +43,16 @@ class PersonViewSet(mixins.RetrieveModelMixin, mixins.UpdateModelMixin, mixins.L
     Управление данными личностей
 
     Доступ:
-    - GET /api/person/ - список личностей
+    - GET /api/person/ - список личностей по страницам (?page=, ?page_size=)
+    - GET /api/person/?cursor= - список личностей постранично по курсору
+    - GET /api/person/export/ - выгрузка всех личностей потоком
+    - GET /api/person/search/?q= - полнотекстовый поиск по опубликованным личностям
     - POST /api/person/ - создание новой личности
     - GET /api/person/{id}/ - просмотр личности по ID
+    - ?fields=title,slug - только перечисленные поля (для чтения списка, поиска, выгрузки и личности)
+    - ?expand=cat,tags,companion - категория, теги и партнер объектами вместо ID
+    - ?gender=, ?cat=, ?tag=, ?published=, ?has_companion=, ?created_after=, ?created_before= - фильтры списка,
+      поиска и выгрузки; ?ordering= - сортировка списка и выгрузки (peoples/filters.py)
     - PUT /api/person/{id}/ - обновление личности по ID
     - PATCH /api/person/{id}/ - частичное обновление личности по ID
 
@@ -45,7 +64,35 @@ class PersonViewSet(mixins.RetrieveModelMixin, mixins.UpdateModelMixin, mixins.L
     """
     queryset = m.Person.objects.all()
     serializer_class = PersonSerializer
+    # только цифры, как <int:pk> в async_urls: '+1', ' 1' и '1_0' int() принял бы за 1 и 10
+    lookup_value_regex = r'\d+'
     permission_classes = (IsAuthenticatedOrReadOnly, )
+    pagination_class = PersonPagination
+    renderer_classes = (FastJSONRenderer, BrowsableAPIRenderer)
+    export_chunk_size = 2000
+    read_actions = ('list', 'retrieve', 'export', 'search_persons')
+
+    @cached_property
+    def fieldset(self):
+        return PersonFieldset.from_query(self.request.query_params)
+
+    @cached_property
+    def filters(self):
+        return PersonFilter(self.request.query_params)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        # get_object() тоже проходит через filter_queryset, а ключ кэша личности от фильтров не зависит
+        if self.action in ('list', 'export'):
+            queryset = self.filters.apply(queryset)
+        return queryset
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # при записи объект нужен целиком: save() с отложенными полями обновит только загруженные
+        if self.action in self.read_actions:
+            queryset = self.fieldset.prepare(queryset)
+        return queryset
 
     @action(methods=['get', 'put'], detail=True, serializer_class=CategorySerializer)
     def category(self, request, pk=None):
@@ -96,20 +143,71 @@ class PersonViewSet(mixins.RetrieveModelMixin, mixins.UpdateModelMixin, mixins.L
             return Response(serializer.errors, status=400)
 
 
+    @action(methods=['get'], detail=False)
+    def export(self, request):
+        """
+        Выгрузка всех личностей потоком, без загрузки всей таблицы в память
+
+        - GET /api/person/export/ - NDJSON, одна личность на строку
+        - GET /api/person/export/?style=json - JSON-массив
+
+        Права доступа:
+        - Чтение: все
+        """
+        # строки values_list по выбранным полям PersonSerializer, без моделей и полей DRF
+        rows = self.fieldset.iterator(self.filter_queryset(self.get_queryset()), self.export_chunk_size)
+
+        def ndjson():
+            for person in rows:
+                yield dumps(person) + b'\n'
+
+        def json_array():
+            yield b'['
+            for n, person in enumerate(rows):
+                yield (b',' if n else b'') + dumps(person)
+            yield b']'
+
+        if request.query_params.get('style') == 'json':
+            return StreamingHttpResponse(json_array(), content_type='application/json')
+        return StreamingHttpResponse(ndjson(), content_type='application/x-ndjson')
+
+    @action(methods=['get'], detail=False, url_path='search', url_name='search', pagination_class=SearchPagination)
+    def search_persons(self, request):
+        """
+        Полнотекстовый поиск по заголовку и описанию опубликованных личностей с учетом форм слов
+
+        - GET /api/person/search/?q= - результаты по убыванию релевантности (?page=, ?page_size=)
+
+        Права доступа:
+        - Чтение: все
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': 'Укажите поисковый запрос'})
+        # сортировка - по релевантности, ?ordering= не действует
+        fieldset, filters = self.fieldset, self.filters
+        persons = filters.filter(m.Person.published.defer('search_vector'))
+        queryset = utils.CachedPages(utils.SEARCH_CACHE_KEY, fieldset.prepare(search.search(persons, query)),
+                                     serialize=fieldset.data,
+                                     key_parts=('api', search.query_key(query), *filters.filter_key_parts,
+                                                *fieldset.key_parts),
+                                     codec=records.DICTS)
+        return self.get_paginated_response(self.paginate_queryset(queryset))
+
     def list(self, request, *args, **kwargs):
-        cache_key = 'api_person_list'
-        if (data := cache.get(cache_key)) is None:
-            queryset = self.filter_queryset(self.get_queryset())
-            serializer = self.get_serializer(queryset, many=True)
-            data = serializer.data
-            cache.set(cache_key, data, 60 * 15)
-        return Response(data)
+        # в кэш кладутся уже сериализованные страницы, отдельно на каждое сочетание фильтров, ?fields= и ?expand=
+        queryset = utils.CachedPages(utils.API_LIST_CACHE_KEY, self.filter_queryset(self.get_queryset()),
+                                     serialize=self.fieldset.data,
+                                     key_parts=(*self.filters.key_parts, *self.fieldset.key_parts),
+                                     codec=records.DICTS)
+        return self.get_paginated_response(self.paginate_queryset(queryset))
 
     def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        cache_key = f'api_person_{instance.pk}'
-        if (data := cache.get(cache_key)) is None:
-            serializer = self.get_serializer(instance)
-            data = serializer.data
-            cache.set(cache_key, data, 60 * 30)
-        return Response(data)
\ No newline at end of file
+        # ключ строится по pk из URL, чтобы при попадании в кэш не ходить в БД за объектом. pk приводится к числу:
+        # инвалидация поднимает версию для числового pk, а /api/person/01/ иначе закэшировал бы отдельную копию.
+        # Нецифровой pk отсекает lookup_value_regex в маршруте
+        pk = int(self.kwargs['pk'])
+        fieldset = self.fieldset
+        data = utils.cached_versioned(utils.api_person_cache_key(pk), utils.api_person_key_parts(fieldset),
+                                      lambda: fieldset.data([self.get_object()])[0], utils.DETAIL_CACHE_TIMEOUT)
+        return Response(data)
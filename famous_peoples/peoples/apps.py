@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class PeoplesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'peoples'
+
+    def ready(self):
+        import peoples.counters
+        import peoples.invalidation
+        import peoples.metrics
+        import peoples.thumbnails
@@ -0,0 +1,17 @@
+from django.urls import path
+from peoples import async_views
+
+
+# Маршруты, которые под ASGI обслуживают асинхронные представления. Имена и пути совпадают с peoples/urls.py,
+# famous_peoples/asgi_urls.py подключает их раньше синхронных
+urlpatterns = [
+    path('persons/', async_views.Peoples.as_view(), name='peoples'),
+    path('men/', async_views.Men.as_view(), name='men'),
+    path('women/', async_views.Women.as_view(), name='women'),
+    path('post/<slug:post_slug>/', async_views.ShowPost.as_view(), name='post'),
+    path('category/<slug:cat_slug>/', async_views.Category.as_view(), name='category'),
+    path('tag/<slug:tag_slug>/', async_views.TagPostList.as_view(), name='tag'),
+    path('person-autocomplete/', async_views.PersonAutocomplete.as_view(), name='person-autocomplete'),
+    path('api/person/', async_views.person_list, name='person-list'),
+    path('api/person/<int:pk>/', async_views.person_detail, name='person-detail'),
+]
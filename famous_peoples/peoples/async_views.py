@@ -0,0 +1,234 @@
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage
+from django.http import Http404, HttpResponse, JsonResponse
+from django.template.response import TemplateResponse
+from django.utils.cache import patch_vary_headers
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+import peoples.models as m
+from peoples import autocomplete, records, utils
+from peoples.api_views import PersonViewSet
+from peoples.filters import PersonFilter
+from peoples.pagination import PersonPagination
+from peoples.renderers import FastJSONRenderer
+from peoples.serializers import PersonFieldset
+from peoples.templatetags.peoples_tags import asidebar
+
+
+# Асинхронные версии самых нагруженных страниц на чтение. Под ASGI их подключает peoples.middleware.AsyncUrlconf
+# (famous_peoples/asgi_urls.py), под WSGI остаются синхронные представления из peoples/views.py.
+# Ключи кэша и шаблоны общие, поэтому обе версии читают и прогревают одни и те же записи
+
+
+async def resolve_user(request):
+    # шаблоны обращаются к request.user синхронно, поэтому пользователь и сессия загружаются заранее
+    request.user = await request.auser()
+
+
+class AsyncPersonList(View):
+    """Аналог ListView + DataMixin + KeysetPaginationMixin со страницами из AsyncCachedPages"""
+    template_name = 'peoples/index.html'
+    paginate_by = 3
+    allow_empty = False
+    title = None
+
+    def get_pages(self):
+        """Страницы списка; по умолчанию - все опубликованные личности"""
+        return utils.AsyncCachedPages(utils.ALL_CACHE_KEY, m.Person.published.for_list(), codec=records.PEOPLE)
+
+    async def get_extra_context(self, posts):
+        return {'title': self.title}
+
+    async def get(self, request, **kwargs):
+        await resolve_user(request)
+        pages = await self.get_pages().aprepare()
+        cursor = request.GET.get('cursor')
+        try:
+            if cursor is not None:
+                page = await pages.akeyset_page(cursor, self.paginate_by)
+                paginator = None
+                if not page.object_list and not self.allow_empty:
+                    raise Http404('Пустая страница')
+            else:
+                page = utils.link_keyset(await pages.apage(request.GET.get('page') or 1, self.paginate_by,
+                                                           self.allow_empty))
+                paginator = page.paginator
+        except (ValueError, InvalidPage):
+            raise Http404('Неверная страница')
+
+        posts = page.object_list
+        context = {
+            'paginator': paginator, 'page_obj': page, 'is_paginated': page.has_other_pages(),
+            'object_list': posts, 'posts': posts, 'menu': utils.menu,
+        }
+        context.update(await self.get_extra_context(posts))
+        context.update(await asidebar(context.get('cat_selected')))
+        return TemplateResponse(request, self.template_name, context)
+
+
+class Peoples(AsyncPersonList):
+    paginate_by = 5
+    allow_empty = True
+    title = 'Все личности'
+
+
+class Men(AsyncPersonList):
+    title = 'Мужчины'
+
+    def get_pages(self):
+        return utils.AsyncCachedPages(utils.GENDER_CACHE_KEYS['M'], m.Person.published.filter(gender='M').for_list(),
+                                      codec=records.PEOPLE)
+
+
+class Women(AsyncPersonList):
+    title = 'Женщины'
+
+    def get_pages(self):
+        return utils.AsyncCachedPages(utils.GENDER_CACHE_KEYS['F'], m.Person.published.filter(gender='F').for_list(),
+                                      codec=records.PEOPLE)
+
+
+class Category(AsyncPersonList):
+    def get_pages(self):
+        slug = self.kwargs['cat_slug']
+        return utils.AsyncCachedPages(utils.category_cache_key(slug),
+                                      m.Person.published.filter(cat__slug=slug).for_list(), codec=records.PEOPLE)
+
+    async def get_extra_context(self, posts):
+        cat = posts[0].cat
+        return {'title': 'Категория - ' + cat.name, 'cat_selected': cat.id}
+
+
+class TagPostList(AsyncPersonList):
+    def get_pages(self):
+        slug = self.kwargs['tag_slug']
+        return utils.AsyncCachedPages(utils.tag_cache_key(slug), m.Person.published.filter(tag__slug=slug).for_list(),
+                                      codec=records.PEOPLE)
+
+    async def get_extra_context(self, posts):
+        tag = await m.TagPost.objects.aget(slug=self.kwargs['tag_slug'])
+        return {'title': 'Тег: ' + tag.tag}
+
+
+class ShowPost(View):
+    template_name = 'peoples/post.html'
+
+    async def get(self, request, post_slug):
+        await resolve_user(request)
+
+        async def compute():
+            try:
+                return await m.Person.published.for_detail().aget(slug=post_slug)
+            except m.Person.DoesNotExist:
+                raise Http404('Личность не найдена')
+
+        post = await utils.acached_versioned(utils.detail_cache_key(post_slug), (), compute,
+                                             utils.DETAIL_CACHE_TIMEOUT)
+        context = {'post': post, 'object': post, 'title': post, 'menu': utils.menu, **await asidebar()}
+        return TemplateResponse(request, self.template_name, context)
+
+
+class PersonAutocomplete(View):
+    """Ответ в формате Select2QuerySetView из django-autocomplete-light"""
+    paginate_by = 10
+    genders = dict(m.Person.Gender.choices)
+
+    async def get(self, request):
+        rows = await autocomplete.asuggest(request.GET.get('q', ''))
+        try:
+            number = int(request.GET.get('page') or 1)
+        except ValueError:
+            raise Http404('Неверная страница')
+        start = (number - 1) * self.paginate_by
+        if number < 1 or start and start >= len(rows):
+            raise Http404('Неверная страница')
+
+        results = []
+        for row in rows[start:start + self.paginate_by]:
+            label = f"{row['title']} ({self.genders.get(row['gender'], row['gender'])})"
+            results.append({'id': str(row['id']), 'text': label, 'selected_text': label})
+        return JsonResponse({'results': results, 'pagination': {'more': start + self.paginate_by < len(rows)}})
+
+
+# API: GET в JSON обслуживается здесь, остальное (браузерный API, запись) - синхронным PersonViewSet
+drf_person_list = PersonViewSet.as_view({'get': 'list', 'post': 'create'})
+drf_person_detail = PersonViewSet.as_view({'get': 'retrieve', 'put': 'update', 'patch': 'partial_update'})
+
+
+def wants_json(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    fmt = request.GET.get('format')
+    return fmt == 'json' or fmt is None and 'text/html' not in request.headers.get('Accept', '')
+
+
+def render_json(data, status=200):
+    # тот же рендерер, что у PersonViewSet, поэтому тело ответа совпадает с синхронным API байт в байт
+    response = HttpResponse(FastJSONRenderer().render(data), content_type='application/json', status=status)
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+@csrf_exempt
+async def person_list(request):
+    if not wants_json(request):
+        return await sync_to_async(drf_person_list)(request)
+
+    try:
+        fieldset = PersonFieldset.from_query(request.GET)
+        filters = PersonFilter(request.GET)
+    except ValidationError as e:
+        return render_json(e.detail, status=400)
+    drf_request = Request(request)
+    pagination = PersonPagination()
+    # queryset и ключ - как у PersonViewSet.list
+    pages = await utils.AsyncCachedPages(utils.API_LIST_CACHE_KEY,
+                                         filters.apply(fieldset.prepare(PersonViewSet.queryset)),
+                                         serialize=fieldset.data, key_parts=(*filters.key_parts, *fieldset.key_parts),
+                                         codec=records.DICTS).aprepare()
+    page_size = pagination.get_page_size(drf_request)
+
+    if (cursor := request.GET.get(pagination.keyset.cursor_query_param)) is not None:
+        keyset = pagination.keyset
+        try:
+            keyset.page = await pages.akeyset_page(cursor, keyset.get_page_size(drf_request))
+        except ValueError:
+            return render_json({'detail': 'Неверный курсор'}, status=404)
+        keyset.request = drf_request
+        return render_json({'next': keyset.get_link(keyset.page.next_cursor),
+                            'previous': keyset.get_link(keyset.page.previous_cursor),
+                            'results': list(keyset.page)})
+
+    try:
+        pagination.page = await pages.apage(request.GET.get(pagination.page_query_param) or 1, page_size)
+    except InvalidPage:
+        return render_json({'detail': str(PageNumberPagination.invalid_page_message)}, status=404)
+    pagination.request = drf_request
+    return render_json({'count': pagination.page.paginator.count, 'next': pagination.get_next_link(),
+                        'previous': pagination.get_previous_link(), 'results': list(pagination.page)})
+
+
+@csrf_exempt
+async def person_detail(request, pk):
+    if not wants_json(request):
+        return await sync_to_async(drf_person_detail)(request, pk=pk)
+
+    try:
+        fieldset = PersonFieldset.from_query(request.GET)
+    except ValidationError as e:
+        return render_json(e.detail, status=400)
+
+    async def compute():
+        return fieldset.data([await fieldset.prepare(PersonViewSet.queryset).aget(pk=pk)])[0]
+
+    # ключ тот же, что у PersonViewSet.retrieve
+    try:
+        parts = await utils.aapi_person_key_parts(fieldset)
+        data = await utils.acached_versioned(utils.api_person_cache_key(pk), parts, compute, utils.DETAIL_CACHE_TIMEOUT)
+    except m.Person.DoesNotExist:
+        # сообщение get_object_or_404, которое DRF превращает в NotFound
+        return render_json({'detail': f'No {m.Person._meta.object_name} matches the given query.'}, status=404)
+    return render_json(data)
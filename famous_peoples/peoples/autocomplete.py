@@ -0,0 +1,114 @@
+import bisect
+import hashlib
+
+from django.db import connections
+
+import peoples.models as m
+from peoples import utils
+
+
+# Подсказки для виджета выбора партнера (PersonAutocomplete). Предлагаются только личности без партнера,
+# из БД читаются только id, title и gender. Сначала идут названия, начинающиеся с запроса, затем - содержащие его
+# (с MIN_SUBSTRING_LENGTH символов, раньше триграммный индекс не помогает).
+# PostgreSQL: индексы по UPPER(title) из миграции 0007 - btree для префикса и GIN pg_trgm для подстроки.
+# Остальные СУБД: отсортированный список названий в памяти процесса, префикс ищется бинарным поиском
+
+LIMIT = 50
+MIN_SUBSTRING_LENGTH = 3
+CACHE_TIMEOUT = 60 * 10
+FIELDS = ('id', 'title', 'gender')
+
+
+def normalize(query):
+    return ' '.join(query.split()).upper()
+
+
+def candidates():
+    return m.Person.objects.filter(companion__isnull=True).values(*FIELDS)
+
+
+class SortedTitles:
+    """Личности без партнера, отсортированные по названию в верхнем регистре"""
+
+    def __init__(self, rows):
+        self.rows = sorted(rows, key=lambda row: (row['title'].upper(), row['id']))
+        self.keys = [row['title'].upper() for row in self.rows]
+
+    def suggest(self, query, limit=LIMIT):
+        start = bisect.bisect_left(self.keys, query)
+        end = bisect.bisect_left(self.keys, query + '\U0010ffff', lo=start)
+        results = self.rows[start:min(end, start + limit)]
+        if len(results) < limit and len(query) >= MIN_SUBSTRING_LENGTH:
+            results += [row for key, row in zip(self.keys, self.rows) if query in key and not key.startswith(query)
+                        ][:limit - len(results)]
+        return results
+
+
+_titles = (None, None)
+
+
+def sorted_titles():
+    """Список перестраивается, когда меняется версия пространства имен подсказок"""
+    global _titles
+    version, titles = _titles
+    current = utils.get_cache_version(utils.AUTOCOMPLETE_CACHE_KEY)
+    if titles is None or version != current:
+        titles = SortedTitles(candidates().iterator())
+        _titles = (current, titles)
+    return titles
+
+
+def query_database(query, limit=LIMIT):
+    rows = candidates()
+    results = list(rows.filter(title__istartswith=query).order_by('title', 'id')[:limit])
+    if len(results) < limit and len(query) >= MIN_SUBSTRING_LENGTH:
+        substring = rows.filter(title__icontains=query).exclude(title__istartswith=query).order_by('title', 'id')
+        results += substring[:limit - len(results)]
+    return results
+
+
+def suggest(query):
+    """До LIMIT подсказок {'id', 'title', 'gender'}; результат кэшируется для каждого набранного префикса"""
+    query = normalize(query)
+    if connections[m.Person.objects.db].vendor == 'postgresql':
+        def compute():
+            return query_database(query)
+    else:
+        def compute():
+            return sorted_titles().suggest(query)
+
+    key = utils.versioned_key(utils.AUTOCOMPLETE_CACHE_KEY, hashlib.md5(query.encode()).hexdigest())
+    return utils.cached(key, compute, CACHE_TIMEOUT)
+
+
+async def asorted_titles():
+    global _titles
+    version, titles = _titles
+    current = await utils.aget_cache_version(utils.AUTOCOMPLETE_CACHE_KEY)
+    if titles is None or version != current:
+        titles = SortedTitles([row async for row in candidates()])
+        _titles = (current, titles)
+    return titles
+
+
+async def aquery_database(query, limit=LIMIT):
+    rows = candidates()
+    results = [row async for row in rows.filter(title__istartswith=query).order_by('title', 'id')[:limit]]
+    if len(results) < limit and len(query) >= MIN_SUBSTRING_LENGTH:
+        substring = rows.filter(title__icontains=query).exclude(title__istartswith=query).order_by('title', 'id')
+        results += [row async for row in substring[:limit - len(results)]]
+    return results
+
+
+async def asuggest(query):
+    """suggest() для асинхронного представления"""
+    query = normalize(query)
+    if connections[m.Person.objects.db].vendor == 'postgresql':
+        async def compute():
+            return await aquery_database(query)
+    else:
+        async def compute():
+            return (await asorted_titles()).suggest(query)
+
+    key = await utils.aversioned_key(utils.AUTOCOMPLETE_CACHE_KEY, hashlib.md5(query.encode()).hexdigest())
+    return await utils.acached(key, compute, CACHE_TIMEOUT)
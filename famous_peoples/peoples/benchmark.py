@@ -0,0 +1,327 @@
+import asyncio
+import itertools
+import pickle
+import platform
+import random
+import statistics
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings, setup_databases, teardown_databases
+from django.urls import reverse
+
+import peoples.models as m
+from peoples import records, transfer
+
+
+# Замеры задержки страниц внутри процесса, без сети: запросы идут через тот же WSGIHandler/ASGIHandler и
+# middleware, что и под gunicorn/Daphne, поэтому видно время Django, БД и кэша, но не сервера и сокетов.
+# Команды: benchmark_asgi (WSGI против ASGI), benchmark (все маршруты на холодном, теплом и сброшенном кэше)
+# benchmark_cache (размер и распаковка срезов списков в прежнем и компактном формате кэша)
+# и benchmark_serializers (PersonSerializer против плана полей).
+# Сценарии пишут в базу и очищают кэш, поэтому по умолчанию замеры идут на временной базе и LocMemCache
+# (backends); рабочие база и кэш - только по явному флагу команды
+
+SEED_PREFIX = 'bench'
+# личностей на временной базе, если --seed не задан
+DEFAULT_SEED = 1000
+SCENARIOS = ('cold', 'warm', 'invalidated')
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'}}
+WORDS = ('поэт', 'писатель', 'актер', 'актриса', 'певец', 'художник', 'ученый', 'режиссер', 'роман', 'театр',
+         'кино', 'музыка', 'премия', 'война', 'история', 'физика', 'стихи', 'сцена', 'Москва', 'Петербург')
+NAMES = ('Александр', 'Анна', 'Борис', 'Вера', 'Григорий', 'Дарья', 'Евгений', 'Елена', 'Иван', 'Мария', 'Сергей')
+SURNAMES = ('Пушкин', 'Ахматова', 'Толстой', 'Цветаева', 'Чехов', 'Гончарова', 'Блок', 'Есенин', 'Орлова', 'Бунин')
+
+
+def environment(**overrides):
+    """
+    Настройки на время замеров: тестовые клиенты ходят на хост testserver, а DEBUG выключен,
+    чтобы connection.queries не копил запросы и не искажал результат
+    """
+    return override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], DEBUG=False, **overrides)
+
+
+@contextmanager
+def backends(configured_database=False, configured_cache=False):
+    """
+    environment() на время замеров и их данных: по умолчанию временная база (как у тестов: test_<имя>
+    или sqlite в памяти, удаляется после прогона) и LocMemCache вместо настроенного кэша
+    """
+    with environment(**({} if configured_cache else {'CACHES': LOCMEM_CACHES})):
+        if configured_database:
+            yield
+            return
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={DEFAULT_DB_ALIAS})
+        try:
+            yield
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+
+def summarize(latencies, errors, elapsed):
+    """Пропускная способность и перцентили задержки в миллисекундах"""
+    latencies = sorted(latencies)
+    result = {'requests': len(latencies), 'errors': errors, 'rps': round(len(latencies) / elapsed, 1) if elapsed else 0}
+    if len(latencies) > 1:
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+        result.update(p50=cuts[49], p95=cuts[94], p99=cuts[98])
+    elif latencies:
+        result.update(p50=latencies[0], p95=latencies[0], p99=latencies[0])
+    for key in ('p50', 'p95', 'p99'):
+        if key in result:
+            result[key] = round(result[key] * 1000, 2)
+    return result
+
+
+def hot_urls():
+    """Горячие маршруты на чтение для первой опубликованной личности"""
+    person = m.Person.published.select_related('cat').order_by('pk').first()
+    urls = [reverse('peoples'), reverse('men'), reverse('women'), reverse('person-list')]
+    if person:
+        urls += [reverse('post', kwargs={'post_slug': person.slug}),
+                 reverse('category', kwargs={'cat_slug': person.cat.slug}),
+                 reverse('person-detail', kwargs={'pk': person.pk}),
+                 f"{reverse('person-autocomplete')}?q={person.title[:2]}"]
+    return urls
+
+
+def run_wsgi(urls, total, concurrency):
+    """total запросов по кругу urls из concurrency потоков - модель WSGI-сервера с пулом потоков"""
+    def worker(n):
+        client = Client()
+        latencies, errors = [], 0
+        try:
+            for i in range(n, total, concurrency):
+                start = time.perf_counter()
+                response = client.get(urls[i % len(urls)])
+                latencies.append(time.perf_counter() - start)
+                errors += response.status_code >= 400
+        finally:
+            connections.close_all()
+        return latencies, errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return summarize([x for latencies, _ in results for x in latencies], sum(e for _, e in results), elapsed)
+
+
+def run_asgi(urls, total, concurrency):
+    """Те же запросы через ASGIHandler: concurrency корутин в одном цикле событий - модель процесса Daphne"""
+    async def worker(client, n, latencies):
+        errors = 0
+        for i in range(n, total, concurrency):
+            start = time.perf_counter()
+            response = await client.get(urls[i % len(urls)])
+            latencies.append(time.perf_counter() - start)
+            errors += response.status_code >= 400
+        return errors
+
+    async def main():
+        client = AsyncClient()
+        latencies = []
+        started = time.perf_counter()
+        errors = await asyncio.gather(*(worker(client, n, latencies) for n in range(concurrency)))
+        return summarize(latencies, sum(errors), time.perf_counter() - started)
+
+    try:
+        return asyncio.run(main())
+    finally:
+        connections.close_all()
+
+
+def seed_records(people, categories=20, tags=200, seed=0):
+    """Воспроизводимый набор записей в формате peoples.transfer: 90% опубликованы, у каждой до трех тегов"""
+    rnd = random.Random(seed)
+    for i in range(people):
+        yield {
+            'slug': f'{SEED_PREFIX}-{i}', 'title': f'{rnd.choice(NAMES)} {rnd.choice(SURNAMES)} {i}',
+            'content': ' '.join(rnd.choices(WORDS, k=40)),
+            'is_published': m.Person.Status.DRAFT if rnd.random() < 0.1 else m.Person.Status.PUBLISHED,
+            'gender': rnd.choice(m.Person.Gender.values), 'cat': f'{SEED_PREFIX}-cat-{rnd.randrange(categories)}',
+            'tags': [f'{SEED_PREFIX}-tag-{n}' for n in rnd.sample(range(tags), rnd.randint(0, 3))],
+        }
+
+
+def seed(people, **kwargs):
+    """
+    Доводит число сгенерированных личностей до people через transfer.Importer (bulk_create частями,
+    пересчет счетчиков и сброс кэша). Набор детерминирован, поэтому догружается только недостающий хвост
+    """
+    existing = m.Person.objects.filter(slug__startswith=f'{SEED_PREFIX}-').count()
+    if existing >= people:
+        return {'created': 0, 'updated': 0, 'skipped': 0, 'linked': 0, 'seconds': 0}
+    return transfer.Importer().run(itertools.islice(seed_records(people, **kwargs), existing, None))
+
+
+def routes():
+    """
+    (имя, url, нужен ли вход) для каждого GET-маршрута peoples/urls.py и API. Параметры берутся
+    у первой опубликованной личности с тегом. DELETE api/category-delete/ не замеряется - он меняет данные
+    """
+    person = (m.Person.published.filter(tag__isnull=False).select_related('cat').prefetch_related('tag')
+              .order_by('pk').first())
+    if person is None:
+        raise ValueError('Нет опубликованных личностей с тегами, сначала заполните базу')
+    word = person.title.split()[0]
+    return [
+        ('home', reverse('home'), False),
+        ('peoples', reverse('peoples'), False),
+        ('peoples-page-2', f"{reverse('peoples')}?page=2", False),
+        ('men', reverse('men'), False),
+        ('women', reverse('women'), False),
+        ('about', reverse('about'), False),
+        ('post', reverse('post', kwargs={'post_slug': person.slug}), False),
+        ('add_page', reverse('add_page'), True),
+        ('contact', reverse('contact'), False),
+        ('category', reverse('category', kwargs={'cat_slug': person.cat.slug}), False),
+        ('tag', reverse('tag', kwargs={'tag_slug': person.tag.all()[0].slug}), False),
+        ('search', f"{reverse('search')}?q={word}", False),
+        ('edit_page', reverse('edit_page', kwargs={'slug': person.slug}), True),
+        ('person-autocomplete', f"{reverse('person-autocomplete')}?q={word[:3]}", False),
+        ('api-root', reverse('api-root'), False),
+        ('person-list', reverse('person-list'), False),
+        ('person-list-page-2', f"{reverse('person-list')}?page=2", False),
+        ('person-detail', reverse('person-detail', kwargs={'pk': person.pk}), False),
+        ('person-search', f"{reverse('person-search')}?q={word}", False),
+    ], person
+
+
+def measure(client, url, requests, before=None):
+    """Последовательные запросы одного клиента; before() вызывается перед каждым и в замер не входит"""
+    latencies, errors, elapsed = [], 0, 0
+    for _ in range(requests):
+        if before:
+            before()
+        start = time.perf_counter()
+        response = client.get(url, headers={'accept': 'application/json'} if '/api/' in url else None)
+        latencies.append(time.perf_counter() - start)
+        elapsed += latencies[-1]
+        errors += response.status_code >= 400
+    return summarize(latencies, errors, elapsed)
+
+
+def run_suite(requests=100, scenarios=SCENARIOS, only=None, log=None):
+    """
+    Каждый маршрут в каждом сценарии:
+    cold - кэш очищается перед каждым запросом;
+    warm - один запрос на прогрев, дальше чтение из кэша;
+    invalidated - перед каждым запросом личность с замеряемых страниц сохраняется,
+    и сигналы сбрасывают ее пространства имен, как после правки в админке
+    """
+    route_list, person = routes()
+    user = get_user_model().objects.get_or_create(username=f'{SEED_PREFIX}-user')[0]
+    anonymous, logged_in = Client(), Client()
+    logged_in.force_login(user)
+    before = {'cold': cache.clear, 'warm': None, 'invalidated': person.save}
+
+    results = {}
+    for scenario in scenarios:
+        results[scenario] = {}
+        for name, url, login in route_list:
+            if only and name not in only:
+                continue
+            client = logged_in if login else anonymous
+            if scenario == 'warm':
+                client.get(url)
+            results[scenario][name] = measure(client, url, requests, before[scenario])
+            if log:
+                log(scenario, name, results[scenario][name])
+    return results
+
+
+def metadata():
+    """Окружение прогона, чтобы результаты разных коммитов можно было сравнивать"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=settings.BASE_DIR).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit, 'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(), 'django': django.get_version(),
+        'database': connections['default'].vendor, 'cache': settings.CACHES['default']['BACKEND'],
+        'people': m.Person.objects.count(), 'published': m.Person.published.count(),
+    }
+
+
+def compare(old, new, metric='p95'):
+    """(сценарий, маршрут, было, стало, изменение в %) для маршрутов, замеренных в обоих прогонах"""
+    rows = []
+    for scenario, routes_ in new['results'].items():
+        for name, result in routes_.items():
+            before = old.get('results', {}).get(scenario, {}).get(name, {}).get(metric)
+            if before is not None and metric in result:
+                change = (result[metric] - before) / before * 100 if before else 0
+                rows.append((scenario, name, before, result[metric], round(change, 1)))
+    return rows
+
+
+def cache_formats(per_page=5, api_page_size=20, repeat=200):
+    """
+    Срез страницы списка и страницы API в кэше: байт после pickle (как в RedisCache) и время чтения
+    в микросекундах - распаковка pickle и, для компактного формата, восстановление записей
+    """
+    from peoples.serializers import PersonSerializer
+
+    people = list(m.Person.published.for_list()[:per_page])
+    api_rows = PersonSerializer(m.Person.objects.all()[:api_page_size], many=True).data
+    cases = (
+        ('list', 'pickle', people, records.OBJECTS),
+        ('list', records.PEOPLE.name, records.PEOPLE.pack(people), records.PEOPLE),
+        ('api', 'pickle', api_rows, records.OBJECTS),
+        ('api', records.DICTS.name, records.DICTS.pack(api_rows), records.DICTS),
+    )
+    results = []
+    for name, fmt, value, codec in cases:
+        # запись utils.cached: (значение, время истечения, длительность вычисления)
+        payload = pickle.dumps((value, 0.0, 0.0), pickle.HIGHEST_PROTOCOL)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            codec.unpack(pickle.loads(payload)[0])
+            timings.append(time.perf_counter() - start)
+        results.append({'list': name, 'format': fmt, 'rows': len(people if name == 'list' else api_rows),
+                        'bytes': len(payload), 'load_us': round(statistics.median(timings) * 1_000_000, 1)})
+    return results
+
+
+def serializer_throughput(rows=1000, repeat=5):
+    """
+    Строк в секунду от запроса к БД до тела ответа: PersonSerializer + JSONRenderer против
+    serializers.PERSON_PLAN + FastJSONRenderer; 'identical' - совпали ли тела
+    """
+    from rest_framework.renderers import JSONRenderer
+    from peoples.renderers import FastJSONRenderer
+    from peoples.serializers import PERSON_PLAN, PersonSerializer
+
+    def drf():
+        return JSONRenderer().render(PersonSerializer(m.Person.objects.all()[:rows], many=True).data)
+
+    def plan():
+        return FastJSONRenderer().render(PERSON_PLAN.data(m.Person.objects.all()[:rows]))
+
+    results = {}
+    bodies = []
+    for name, run in (('drf', drf), ('plan', plan)):
+        bodies.append(run())
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+        count = min(rows, m.Person.objects.count())
+        results[name] = {'rows': count, 'rows_per_second': round(count / statistics.median(timings)),
+                         'bytes': len(bodies[-1])}
+    results['identical'] = bodies[0] == bodies[1]
+    return results
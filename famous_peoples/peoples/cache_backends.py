@@ -0,0 +1,259 @@
+import json
+import logging
+import os
+import pickle
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+
+
+# Двухуровневый кэш: LRU в памяти процесса перед общим кэшем (Redis). LOCATION - псевдоним общего кэша в CACHES.
+# Локально хранятся только ключи из OPTIONS['LOCAL_KEYS'] - версии пространств имен и записи под версионными
+# ключами, которые после записи не меняются. Запись через этот бэкенд (set, incr, delete...) сначала идет в Redis,
+# затем ключ удаляется из локальных копий всех процессов сообщением в канал pub/sub CHANNEL.
+# Пока процесс не подписан на канал (Redis недоступен), локальный уровень не используется.
+# Локальная копия живет не дольше LOCAL_TIMEOUT секунд, это предел устаревания при потерянном сообщении
+
+CHANNEL = 'peoples_cache_invalidation'
+RESUBSCRIBE_INTERVAL = 5
+
+logger = logging.getLogger(__name__)
+_missing = object()
+
+
+class LocalTier:
+    """
+    LRU с TTL на процесс. Значения хранятся в pickle, как в LocMemCache, чтобы запросы не делили изменяемые объекты.
+    generation растет при каждой инвалидации: значение, прочитанное из Redis до нее, локально не сохраняется
+    """
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.generation = 0
+        self.stats = dict.fromkeys(('hits', 'misses', 'evictions', 'invalidations'), 0)
+        # подписка на канал инвалидации: (pid, поток redis-py или None - без Redis)
+        self.subscription = None
+        self.retry_at = 0
+        self.sender = uuid.uuid4().hex
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > self.clock():
+                self.entries.move_to_end(key)
+                self.stats['hits'] += 1
+                payload = entry[1]
+            else:
+                if entry is not None:
+                    del self.entries[key]
+                self.stats['misses'] += 1
+                return _missing
+        return pickle.loads(payload)
+
+    def set(self, key, value, generation):
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.entries[key] = (self.clock() + self.timeout, payload)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def discard(self, keys):
+        with self.lock:
+            self.generation += 1
+            for key in keys:
+                if self.entries.pop(key, None) is not None:
+                    self.stats['invalidations'] += 1
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.stats['invalidations'] += len(self.entries)
+            self.entries.clear()
+
+    def handle_message(self, message):
+        """Сообщение канала: [отправитель, список ключей или None - очистить все]"""
+        sender, keys = json.loads(message['data'])
+        if sender == self.sender:
+            return
+        if keys is None:
+            self.clear()
+        else:
+            self.discard(keys)
+
+
+# уровни процесса по LOCATION: экземпляры бэкенда создаются на каждый поток, а локальная память одна
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, server, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.remote_alias = server
+        local_keys = options.get('LOCAL_KEYS')
+        self.local_keys = re.compile(local_keys) if local_keys else None
+        with _tiers_lock:
+            self.tier = _tiers.setdefault(server, LocalTier(self._max_entries, options.get('LOCAL_TIMEOUT', 10)))
+
+    @property
+    def remote(self):
+        return caches[self.remote_alias]
+
+    def is_local(self, key):
+        return self.local_keys is None or self.local_keys.fullmatch(key) is not None
+
+    def local_key(self, key, version):
+        return self.make_and_validate_key(key, version=version)
+
+    def subscribed(self):
+        """Подписан ли процесс на инвалидацию; подписка создается лениво и заново после fork"""
+        tier = self.tier
+        pid = os.getpid()
+        if tier.subscription is not None and tier.subscription[0] == pid:
+            return True
+        remote = self.remote
+        if not isinstance(remote, RedisCache):
+            # кэш в памяти процесса общий только с этим процессом, сообщать некому; для остальных канала нет
+            if isinstance(remote, LocMemCache):
+                tier.subscription = (pid, None)
+                return True
+            return False
+        if tier.clock() < tier.retry_at:
+            return False
+
+        with _tiers_lock:
+            if tier.subscription is not None and tier.subscription[0] == pid:
+                return True
+            # копии, унаследованные от родителя или оставшиеся с прошлой подписки, могли устареть
+            tier.clear()
+            tier.sender = uuid.uuid4().hex
+            try:
+                pubsub = remote._cache.get_client(write=False).pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(**{CHANNEL: tier.handle_message})
+                thread = pubsub.run_in_thread(sleep_time=1, daemon=True,
+                                              exception_handler=lambda e, ps, th: self.unsubscribe(th, e))
+            except Exception as e:
+                logger.warning('Нет подписки на инвалидацию локального кэша: %s', e)
+                tier.retry_at = tier.clock() + RESUBSCRIBE_INTERVAL
+                return False
+            tier.subscription = (pid, thread)
+        return True
+
+    def unsubscribe(self, thread, error):
+        logger.warning('Подписка на инвалидацию локального кэша прервана: %s', error)
+        thread.stop()
+        tier = self.tier
+        tier.subscription = None
+        tier.retry_at = tier.clock() + RESUBSCRIBE_INTERVAL
+        tier.clear()
+
+    def changed(self, keys, version=None):
+        """Удаляет ключи из локальных копий этого и остальных процессов; keys=None - все"""
+        if keys is None:
+            local = None
+            self.tier.clear()
+        else:
+            local = [self.local_key(key, version) for key in keys if self.is_local(key)]
+            if not local:
+                return
+            self.tier.discard(local)
+        remote = self.remote
+        if isinstance(remote, RedisCache):
+            message = json.dumps([self.tier.sender, local])
+            try:
+                remote._cache.get_client(write=True).publish(CHANNEL, message)
+            except Exception as e:
+                # без сообщения копии других процессов доживут LOCAL_TIMEOUT
+                logger.warning('Не удалось разослать инвалидацию локального кэша: %s', e)
+
+    def local_stats(self):
+        tier = self.tier
+        with tier.lock:
+            return {**tier.stats, 'entries': len(tier.entries)}
+
+    def get(self, key, default=None, version=None):
+        if not self.is_local(key) or not self.subscribed():
+            return self.remote.get(key, default, version)
+        local_key = self.local_key(key, version)
+        if (value := self.tier.get(local_key)) is not _missing:
+            return value
+        generation = self.tier.generation
+        value = self.remote.get(key, _missing, version)
+        if value is _missing:
+            return default
+        self.tier.set(local_key, value, generation)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = {}
+        use_local = self.subscribed()
+        if use_local:
+            for key in keys:
+                if self.is_local(key) and (value := self.tier.get(self.local_key(key, version))) is not _missing:
+                    found[key] = value
+        generation = self.tier.generation
+        fetched = self.remote.get_many([key for key in keys if key not in found], version)
+        if use_local:
+            for key, value in fetched.items():
+                if self.is_local(key):
+                    self.tier.set(self.local_key(key, version), value, generation)
+        return {**found, **fetched}
+
+    def has_key(self, key, version=None):
+        return self.get(key, _missing, version) is not _missing
+
+    # таймаут по умолчанию (DEFAULT_TIMEOUT) передается дальше - берется TIMEOUT общего кэша
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.remote.set(key, value, timeout, version)
+        self.changed([key], version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.remote.add(key, value, timeout, version)
+        if added:
+            self.changed([key], version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.remote.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        deleted = self.remote.delete(key, version)
+        self.changed([key], version)
+        return deleted
+
+    def incr(self, key, delta=1, version=None):
+        value = self.remote.incr(key, delta, version)
+        self.changed([key], version)
+        return value
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.remote.set_many(data, timeout, version)
+        self.changed(list(data), version)
+        return failed
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.remote.delete_many(keys, version)
+        self.changed(keys, version)
+
+    def clear(self):
+        self.remote.clear()
+        self.changed(None)
@@ -0,0 +1,108 @@
+from collections import Counter, defaultdict
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import pre_save, post_save, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+import peoples.models as m
+from peoples.signals import pre_queryset_update, post_queryset_update
+
+
+# Category.posts_count и TagPost.posts_count - число опубликованных постов. Изменения применяются
+# F-выражениями в той же транзакции, что и запись личности, поэтому параллельные сохранения не теряют приращения
+
+def adjust(model, deltas):
+    """deltas - {pk: изменение счетчика}; записи с одинаковым изменением обновляются одним запросом"""
+    by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(pk)
+    for delta, pks in by_delta.items():
+        model.objects.filter(pk__in=pks).update(posts_count=F('posts_count') + delta)
+
+
+def apply_published(pks, sign):
+    """Добавляет (sign=1) или вычитает (sign=-1) вклад опубликованных личностей из pks в счетчики"""
+    rows = m.Person.objects.filter(pk__in=pks, is_published=m.Person.Status.PUBLISHED)
+    cats = Counter(rows.select_for_update().values_list('cat_id', flat=True))
+    tags = Counter(m.Person.tag.through.objects.filter(person__in=rows).values_list('tagpost_id', flat=True))
+    adjust(m.Category, {pk: sign * count for pk, count in cats.items()})
+    adjust(m.TagPost, {pk: sign * count for pk, count in tags.items()})
+
+
+def rebuild():
+    """Пересчитывает все счетчики с нуля"""
+    published = m.Person.Status.PUBLISHED
+    cat_counts = m.Person.objects.filter(cat=OuterRef('pk'), is_published=published).order_by().values('cat')
+    m.Category.objects.update(posts_count=Coalesce(Subquery(cat_counts.annotate(c=Count('pk')).values('c')), 0))
+    tag_counts = m.Person.tag.through.objects.filter(tagpost=OuterRef('pk'), person__is_published=published)
+    tag_counts = tag_counts.order_by().values('tagpost')
+    m.TagPost.objects.update(posts_count=Coalesce(Subquery(tag_counts.annotate(c=Count('pk')).values('c')), 0))
+
+
+@receiver(pre_save, sender=m.Person)
+def person_pre_save(sender, instance, **kwargs):
+    # (cat_id, is_published) до сохранения
+    instance._previous_state = None
+    if not instance._state.adding:
+        rows = m.Person.objects.select_for_update().filter(pk=instance.pk)
+        instance._previous_state = rows.values_list('cat_id', 'is_published').first()
+
+
+@receiver(post_save, sender=m.Person)
+def person_post_save(sender, instance, created, **kwargs):
+    published = m.Person.Status.PUBLISHED
+    old_cat, was_published = instance._previous_state or (None, None)
+    was_published = was_published == published
+    is_published = instance.is_published == published
+
+    cats = Counter()
+    if was_published and (not is_published or old_cat != instance.cat_id):
+        cats[old_cat] -= 1
+    if is_published and (not was_published or old_cat != instance.cat_id):
+        cats[instance.cat_id] += 1
+    adjust(m.Category, cats)
+
+    if was_published != is_published and not created:
+        sign = 1 if is_published else -1
+        adjust(m.TagPost, dict.fromkeys(instance.tag.values_list('pk', flat=True), sign))
+
+
+@receiver(pre_delete, sender=m.Person)
+def person_pre_delete(sender, instance, **kwargs):
+    apply_published([instance.pk], -1)
+
+
+@receiver(pre_queryset_update, sender=m.Person)
+def person_pre_queryset_update(sender, pks, fields, **kwargs):
+    if fields & {'cat', 'cat_id', 'is_published'}:
+        apply_published(pks, -1)
+
+
+@receiver(post_queryset_update, sender=m.Person)
+def person_post_queryset_update(sender, pks, fields, **kwargs):
+    if fields & {'cat', 'cat_id', 'is_published'}:
+        apply_published(pks, 1)
+
+
+@receiver(m2m_changed, sender=m.Person.tag.through)
+def person_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # post_remove получает и pk, которых не было в связи, поэтому удаление считается заранее по фактическим связям
+    if action not in ('post_add', 'pre_remove', 'pre_clear'):
+        return
+    sign = 1 if action == 'post_add' else -1
+
+    if reverse:
+        # instance - тег, pk_set - личности
+        persons = m.Person.published.filter(tag=instance)
+        if action == 'post_add':
+            persons = m.Person.published.filter(pk__in=pk_set)
+        elif action == 'pre_remove':
+            persons = persons.filter(pk__in=pk_set)
+        adjust(m.TagPost, {instance.pk: sign * persons.count()})
+    elif instance.is_published == m.Person.Status.PUBLISHED:
+        tag_pks = pk_set if action == 'post_add' else instance.tag.values_list('pk', flat=True)
+        if action == 'pre_remove':
+            tag_pks = tag_pks.filter(pk__in=pk_set)
+        adjust(m.TagPost, dict.fromkeys(tag_pks, sign))
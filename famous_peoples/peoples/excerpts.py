@@ -0,0 +1,43 @@
+from html import unescape
+
+from django.template.defaultfilters import linebreaks_filter, truncatewords
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+
+# Превью личности для списков хранится в Person.excerpt/excerpt_html и пересчитывается при сохранении,
+# поэтому списки не загружают content и не прогоняют его через linebreaks|truncatewords на каждом рендеринге.
+# После изменения EXCERPT_WORDS превью пересчитывает команда rebuild_excerpts
+
+EXCERPT_WORDS = 40
+FIELDS = ('excerpt', 'excerpt_html')
+
+
+def make_excerpts(content):
+    """
+    (текст, HTML). HTML совпадает с тем, что выводил {{ content|linebreaks|truncatewords:40 }}
+    в блоке autoescape off шаблона index.html
+    """
+    content = content or ''
+    html = truncatewords(linebreaks_filter(content, autoescape=False), EXCERPT_WORDS)
+    text = Truncator(' '.join(unescape(strip_tags(content)).split())).words(EXCERPT_WORDS)
+    return text, html
+
+
+def fill(person):
+    person.excerpt, person.excerpt_html = make_excerpts(person.content)
+
+
+def backfill(queryset, batch_size=2000):
+    """Пересчитывает превью частями по batch_size; возвращает число измененных записей"""
+    changed, batch = 0, []
+    for person in queryset.only('pk', 'content', *FIELDS).order_by('pk').iterator(chunk_size=batch_size):
+        if make_excerpts(person.content) != (person.excerpt, person.excerpt_html):
+            fill(person)
+            batch.append(person)
+        if len(batch) >= batch_size:
+            changed += queryset.model.objects.bulk_update(batch, FIELDS)
+            batch = []
+    if batch:
+        changed += queryset.model.objects.bulk_update(batch, FIELDS)
+    return changed
@@ -0,0 +1,111 @@
+from datetime import datetime, time
+
+from django.core.validators import slug_re
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+import peoples.models as m
+from peoples import records
+from peoples.pagination import KeysetPagination
+
+
+# Фильтры и сортировка списка /api/person/. Каждое сочетание - отдельная запись кэша: нормализованные значения
+# входят в ключ (PersonFilter.key_parts), поэтому одинаковые запросы с разным порядком параметров читают одно и то же.
+# Частые сочетания обслуживают составные индексы Person.Meta.indexes: (is_published, gender, -time_create, -id)
+# и (cat, is_published, -time_create, -id)
+
+BOOLEANS = {'1': True, 'true': True, '0': False, 'false': False}
+
+
+class PersonFilter:
+    """
+    ?gender=M|F, ?cat=<slug категории>, ?tag=<slug тега>, ?published=true|false, ?has_companion=true|false,
+    ?created_after= и ?created_before= (дата или дата и время ISO 8601; after включительно, before - нет)
+    и ?ordering= из ORDERINGS. Курсор (?cursor=) работает только с сортировкой по умолчанию
+    """
+    DEFAULT_ORDERING = '-time_create'
+    ORDERINGS = {
+        '-time_create': ('-time_create', '-id'),
+        'time_create': ('time_create', 'id'),
+        'title': ('title', 'id'),
+        '-title': ('-title', '-id'),
+    }
+
+    def __init__(self, params):
+        self.errors = {}
+        # (параметр, условие для filter(), значение для ключа кэша) в постоянном порядке, не в порядке запроса
+        self.conditions = []
+
+        if gender := self.value(params, 'gender'):
+            if gender in m.Person.Gender.values:
+                self.conditions.append(('gender', {'gender': gender}, gender))
+            else:
+                self.errors['gender'] = f'Допустимые значения: {", ".join(m.Person.Gender.values)}'
+        for param, lookup in (('cat', 'cat__slug'), ('tag', 'tag__slug')):
+            if slug := self.value(params, param):
+                if slug_re.fullmatch(slug):
+                    self.conditions.append((param, {lookup: slug}, slug))
+                else:
+                    self.errors[param] = 'Неверный slug'
+        if (published := self.boolean(params, 'published')) is not None:
+            status = m.Person.Status.PUBLISHED if published else m.Person.Status.DRAFT
+            self.conditions.append(('published', {'is_published': status}, int(published)))
+        if (has_companion := self.boolean(params, 'has_companion')) is not None:
+            self.conditions.append(('has_companion', {'companion__isnull': not has_companion}, int(has_companion)))
+        for param, lookup in (('created_after', 'time_create__gte'), ('created_before', 'time_create__lt')):
+            if (moment := self.moment(params, param)) is not None:
+                self.conditions.append((param, {lookup: moment}, records.to_micros(moment)))
+
+        self.ordering = self.value(params, 'ordering') or self.DEFAULT_ORDERING
+        if self.ordering not in self.ORDERINGS:
+            self.errors['ordering'] = f'Допустимые значения: {", ".join(self.ORDERINGS)}'
+        elif self.ordering != self.DEFAULT_ORDERING and KeysetPagination.cursor_query_param in params:
+            self.errors['ordering'] = f'Курсор работает только с сортировкой {self.DEFAULT_ORDERING}'
+
+        if self.errors:
+            raise ValidationError(self.errors)
+
+    @staticmethod
+    def value(params, param):
+        return params.get(param, '').strip()
+
+    def boolean(self, params, param):
+        if not (value := self.value(params, param)):
+            return None
+        if (result := BOOLEANS.get(value.lower())) is None:
+            self.errors[param] = f'Допустимые значения: {", ".join(BOOLEANS)}'
+        return result
+
+    def moment(self, params, param):
+        if not (value := self.value(params, param)):
+            return None
+        try:
+            moment = parse_datetime(value)
+            if moment is None and (day := parse_date(value)) is not None:
+                moment = datetime.combine(day, time.min)
+        except ValueError:
+            moment = None
+        if moment is None:
+            self.errors[param] = 'Дата в формате ISO 8601'
+            return None
+        return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+    @property
+    def filter_key_parts(self):
+        return tuple(part for param, _, key in self.conditions for part in (param, key))
+
+    @property
+    def key_parts(self):
+        """Часть ключа кэша; без фильтров и с сортировкой по умолчанию пусто - ключи совпадают с обычными"""
+        parts = self.filter_key_parts
+        if self.ordering != self.DEFAULT_ORDERING:
+            parts += ('o', self.ordering)
+        return parts
+
+    def filter(self, queryset):
+        for _, condition, _ in self.conditions:
+            queryset = queryset.filter(**condition)
+        return queryset
+
+    def apply(self, queryset):
+        return self.filter(queryset).order_by(*self.ORDERINGS[self.ordering])
@@ -0,0 +1,209 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+import peoples.models as m
+from peoples import utils
+from peoples.signals import pre_queryset_update, post_queryset_update
+
+
+def invalidate(namespaces):
+    """Поднимает версии пространств имен после коммита, чтобы читатель не успел закэшировать старые данные"""
+    namespaces = set(namespaces)
+    if namespaces:
+        transaction.on_commit(lambda: utils.bump_cache_versions(namespaces))
+
+
+def person_rows(pks):
+    return list(m.Person.objects.filter(pk__in=pks).values_list('pk', 'slug', 'gender', 'is_published', 'cat__slug',
+                                                                 'companion', 'companion__slug',
+                                                                 'companion__is_published', 'cat'))
+
+
+def person_cache_namespaces(pks, rows=None):
+    """
+    Пространства имен кэша, в которые попадают личности с указанными pk в их текущем состоянии в БД;
+    rows - уже прочитанные person_rows(pks)
+    """
+    if rows is None:
+        rows = person_rows(pks)
+    if not rows:
+        return set()
+
+    tags = defaultdict(list)
+    for person_id, tag_slug in m.Person.tag.through.objects.filter(person_id__in=pks).values_list('person_id',
+                                                                                                 'tagpost__slug'):
+        tags[person_id].append(tag_slug)
+
+    # подсказки автодополнения включают и черновики
+    namespaces = {utils.API_LIST_CACHE_KEY, utils.AUTOCOMPLETE_CACHE_KEY}
+    for pk, slug, gender, is_published, cat_slug, companion, companion_slug, companion_is_published, _ in rows:
+        namespaces.add(utils.api_person_cache_key(pk))
+        # API партнера с ?expand=companion выводит заголовок и slug личности
+        if companion is not None:
+            namespaces.add(utils.api_person_cache_key(companion))
+        if is_published != m.Person.Status.PUBLISHED:
+            continue
+        # страница партнера ссылается на личность по заголовку и slug
+        if companion_is_published == m.Person.Status.PUBLISHED:
+            namespaces.add(utils.detail_cache_key(companion_slug))
+        namespaces.update((utils.ALL_CACHE_KEY, utils.SEARCH_CACHE_KEY, utils.GENDER_CACHE_KEYS[gender],
+                           utils.category_cache_key(cat_slug), utils.detail_cache_key(slug)))
+        namespaces.update(utils.tag_cache_key(tag_slug) for tag_slug in tags[pk])
+    return namespaces
+
+
+# ответы API, где выводятся названия категорий и тегов (?expand=cat,tags): списки и страницы всех личностей
+RELATIONS_CACHE_NAMESPACES = (utils.API_LIST_CACHE_KEY, utils.API_RELATIONS_CACHE_KEY)
+
+
+def category_cache_namespaces(pk):
+    """Страница категории, сайдбар и списки, где выводится название категории у опубликованных личностей"""
+    slugs = m.Category.objects.filter(pk=pk).values_list('slug', flat=True)
+    namespaces = {utils.category_cache_key(slug) for slug in slugs}
+    namespaces.update(RELATIONS_CACHE_NAMESPACES)
+    namespaces.add(utils.SIDEBAR_CATEGORIES_CACHE_KEY)
+    genders = set(m.Person.published.filter(cat_id=pk).order_by().values_list('gender', flat=True).distinct())
+    if genders:
+        namespaces.update((utils.ALL_CACHE_KEY, utils.SEARCH_CACHE_KEY))
+        namespaces.update(utils.GENDER_CACHE_KEYS[gender] for gender in genders)
+        tag_slugs = m.TagPost.objects.filter(tags__cat_id=pk, tags__is_published=m.Person.Status.PUBLISHED)
+        namespaces.update(utils.tag_cache_key(slug) for slug in tag_slugs.values_list('slug', flat=True).distinct())
+    return namespaces
+
+
+def tag_cache_namespaces(pk):
+    """Страница тега, сайдбар и страницы опубликованных личностей, где выводится тег"""
+    namespaces = {utils.tag_cache_key(slug) for slug in m.TagPost.objects.filter(pk=pk).values_list('slug', flat=True)}
+    namespaces.update(RELATIONS_CACHE_NAMESPACES)
+    namespaces.add(utils.SIDEBAR_TAGS_CACHE_KEY)
+    slugs = list(m.Person.published.filter(tag=pk).values_list('slug', flat=True))
+    namespaces.update(utils.detail_cache_key(slug) for slug in slugs)
+    if slugs:
+        namespaces.add(utils.SEARCH_CACHE_KEY)
+    return namespaces
+
+
+def api_cache_namespaces(persons):
+    """
+    Ответы API, где личности из persons выводятся с развернутыми связями (?expand=): списки, поиск и
+    страницы каждой личности. Пусто, если личностей нет
+    """
+    rows = list(persons.order_by().values_list('pk', 'is_published'))
+    if not rows:
+        return set()
+    namespaces = {utils.API_LIST_CACHE_KEY}
+    namespaces.update(utils.api_person_cache_key(pk) for pk, _ in rows)
+    if any(is_published == m.Person.Status.PUBLISHED for _, is_published in rows):
+        namespaces.add(utils.SEARCH_CACHE_KEY)
+    return namespaces
+
+
+def sidebar_cache_namespaces(old_state, new_state, has_tags):
+    """
+    Счетчики сайдбара меняются, только если опубликованная личность сменила категорию или статус.
+    Состояние - (cat_id, is_published) или None, если записи нет; has_tags() вызывается только при смене статуса
+    """
+    published = m.Person.Status.PUBLISHED
+    was_published = old_state is not None and old_state[1] == published
+    is_published = new_state is not None and new_state[1] == published
+    if old_state == new_state or not (was_published or is_published):
+        return set()
+
+    namespaces = {utils.SIDEBAR_CATEGORIES_CACHE_KEY}
+    if was_published != is_published and has_tags():
+        namespaces.add(utils.SIDEBAR_TAGS_CACHE_KEY)
+    return namespaces
+
+
+@receiver(pre_save, sender=m.Person)
+def person_pre_save(sender, instance, **kwargs):
+    # (cat_id, is_published) до сохранения - для сайдбара в person_post_save; читается тем же запросом
+    instance._cache_previous_state = None
+    if not instance._state.adding:
+        rows = person_rows([instance.pk])
+        instance._cache_previous_state = next(((cat, is_published) for _, _, _, is_published, *_, cat in rows), None)
+        invalidate(person_cache_namespaces([instance.pk], rows))
+
+
+@receiver(post_save, sender=m.Person)
+def person_post_save(sender, instance, created, **kwargs):
+    namespaces = person_cache_namespaces([instance.pk])
+    namespaces |= sidebar_cache_namespaces(instance._cache_previous_state, (instance.cat_id, instance.is_published),
+                                           lambda: not created and instance.tag.exists())
+    invalidate(namespaces)
+
+
+@receiver(pre_delete, sender=m.Person)
+def person_pre_delete(sender, instance, **kwargs):
+    # у партнера companion обнулится через SET_NULL без сигналов, а его страница ссылается на удаляемую личность
+    partners = m.Person.objects.filter(companion=instance).values_list('pk', flat=True)
+    namespaces = person_cache_namespaces([instance.pk, *partners])
+    namespaces |= sidebar_cache_namespaces((instance.cat_id, instance.is_published), None, instance.tag.exists)
+    invalidate(namespaces)
+
+
+@receiver(pre_queryset_update, sender=m.Person)
+@receiver(post_queryset_update, sender=m.Person)
+def person_queryset_update(sender, pks, fields, **kwargs):
+    namespaces = person_cache_namespaces(pks)
+    # до и после обновления: если среди записей есть опубликованные, их счетчики в сайдбаре могли измениться
+    if fields & {'cat', 'cat_id', 'is_published'} and utils.ALL_CACHE_KEY in namespaces:
+        namespaces.add(utils.SIDEBAR_CATEGORIES_CACHE_KEY)
+        if 'is_published' in fields and m.Person.tag.through.objects.filter(person_id__in=pks).exists():
+            namespaces.add(utils.SIDEBAR_TAGS_CACHE_KEY)
+    invalidate(namespaces)
+
+
+@receiver(m2m_changed, sender=m.Person.tag.through)
+def person_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if reverse:
+        # instance - тег, pk_set - личности
+        persons = m.Person.objects.filter(tag=instance) if action == 'pre_clear' else \
+            m.Person.objects.filter(pk__in=pk_set)
+        namespaces = api_cache_namespaces(persons)
+        slugs = list(persons.filter(is_published=m.Person.Status.PUBLISHED).values_list('slug', flat=True))
+        if slugs:
+            namespaces.update((utils.tag_cache_key(instance.slug), utils.SIDEBAR_TAGS_CACHE_KEY,
+                               *map(utils.detail_cache_key, slugs)))
+        invalidate(namespaces)
+    else:
+        # теги черновиков тоже видны в API с ?expand=tags
+        namespaces = api_cache_namespaces(m.Person.objects.filter(pk=instance.pk))
+        if instance.is_published == m.Person.Status.PUBLISHED:
+            tags = instance.tag.all() if action == 'pre_clear' else m.TagPost.objects.filter(pk__in=pk_set)
+            namespaces.update((utils.detail_cache_key(instance.slug), utils.SIDEBAR_TAGS_CACHE_KEY,
+                               *map(utils.tag_cache_key, tags.values_list('slug', flat=True))))
+        invalidate(namespaces)
+
+
+# Изменение категории или тега: полный набор пространств имен считается один раз до сохранения (со старым slug),
+# после сохранения добавляется только страница под новым slug - личности при сохранении не меняются
+
+@receiver(pre_save, sender=m.Category)
+@receiver(pre_delete, sender=m.Category)
+def category_changed(sender, instance, **kwargs):
+    if not instance._state.adding:
+        invalidate(category_cache_namespaces(instance.pk))
+
+
+@receiver(post_save, sender=m.Category)
+def category_post_save(sender, instance, **kwargs):
+    invalidate((utils.category_cache_key(instance.slug), utils.SIDEBAR_CATEGORIES_CACHE_KEY))
+
+
+@receiver(pre_save, sender=m.TagPost)
+@receiver(pre_delete, sender=m.TagPost)
+def tag_changed(sender, instance, **kwargs):
+    if not instance._state.adding:
+        invalidate(tag_cache_namespaces(instance.pk))
+
+
+@receiver(post_save, sender=m.TagPost)
+def tag_post_save(sender, instance, **kwargs):
+    invalidate((utils.tag_cache_key(instance.slug), utils.SIDEBAR_TAGS_CACHE_KEY))
@@ -0,0 +1,52 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from peoples import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Задержка и пропускная способность всех маршрутов на холодном, теплом и сброшенном кэше. '
+            'Пример: benchmark --seed 100000 --output bench.json --compare prev.json')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, metavar='N',
+                            help='Сначала догрузить сгенерированные личности до N (10000, 100000, 1000000); '
+                                 f'на временной базе по умолчанию {benchmark.DEFAULT_SEED}')
+        parser.add_argument('--requests', type=int, default=100, help='Запросов на маршрут в каждом сценарии')
+        parser.add_argument('--scenario', action='append', choices=benchmark.SCENARIOS, dest='scenarios')
+        parser.add_argument('--route', action='append', dest='routes', help='Имя маршрута (можно несколько раз)')
+        parser.add_argument('--configured-database', action='store_true',
+                            help='Настроенная база вместо временной: --seed и сценарий invalidated пишут в нее')
+        parser.add_argument('--configured-cache', action='store_true',
+                            help='Настроенный кэш (Redis) вместо LocMemCache: сценарий cold очищает его целиком')
+        parser.add_argument('--output', help='Записать результаты в JSON')
+        parser.add_argument('--compare', help='JSON предыдущего прогона: вывести изменение p95')
+
+    def handle(self, seed=None, requests=100, scenarios=None, routes=None, configured_database=False,
+               configured_cache=False, output=None, compare=None, **options):
+        if seed is None and not configured_database:
+            seed = benchmark.DEFAULT_SEED
+
+        with benchmark.backends(configured_database, configured_cache):
+            if seed:
+                stats = benchmark.seed(seed)
+                self.stdout.write(f"Заполнение: создано {stats['created']} за {stats['seconds']} с")
+            try:
+                results = benchmark.run_suite(requests, scenarios or benchmark.SCENARIOS, routes, self.log)
+            except ValueError as e:
+                raise CommandError(e)
+            report = {'meta': {**benchmark.metadata(), 'requests': requests}, 'results': results}
+
+        if output:
+            with open(output, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        if compare:
+            with open(compare, encoding='utf-8') as f:
+                previous = json.load(f)
+            for scenario, name, before, after, change in benchmark.compare(previous, report):
+                style = self.style.ERROR if change > 10 else self.style.SUCCESS if change < -10 else str
+                self.stdout.write(style(f'{scenario:<12}{name:<22}p95 {before:>9} -> {after:>9} мс ({change:+}%)'))
+
+    def log(self, scenario, name, result):
+        self.stdout.write(f"{scenario:<12}{name:<22}" + '  '.join(
+            f'{key}={result[key]}' for key in ('rps', 'p50', 'p95', 'p99', 'errors') if key in result))
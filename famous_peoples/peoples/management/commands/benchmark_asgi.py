@@ -0,0 +1,36 @@
+import json
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from peoples import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает синхронные представления (WSGI) и асинхронные (ASGI) на горячих маршрутах'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', dest='urls', help='Маршрут (можно несколько раз)')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--cold', action='store_true', help='Очищать кэш перед каждым прогоном')
+        parser.add_argument('--configured-cache', action='store_true',
+                            help='Настроенный кэш (Redis) вместо LocMemCache: --cold очищает его целиком')
+        parser.add_argument('--json', dest='output', help='Записать результаты в файл')
+
+    def handle(self, urls=None, requests=500, concurrency=20, cold=False, configured_cache=False, output=None,
+               **options):
+        urls = urls or benchmark.hot_urls()
+        results = {'urls': urls, 'requests': requests, 'concurrency': concurrency, 'cold': cold}
+        with benchmark.environment(**({} if configured_cache else {'CACHES': benchmark.LOCMEM_CACHES})):
+            for name, run in (('wsgi', benchmark.run_wsgi), ('asgi', benchmark.run_asgi)):
+                if cold:
+                    cache.clear()
+                else:
+                    # прогрев, чтобы оба прогона читали одинаково заполненный кэш
+                    run(urls, len(urls), 1)
+                results[name] = run(urls, requests, concurrency)
+                self.stdout.write(f'{name}: ' + ', '.join(f'{key}={value}' for key, value in results[name].items()))
+
+        if output:
+            with open(output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,28 @@
+import json
+
+from django.core.management.base import BaseCommand
+from peoples import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Размер и время чтения срезов списков в кэше: pickle моделей и данных DRF против peoples/records.py'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--per-page', type=int, default=5, help='Личностей на странице списка')
+        parser.add_argument('--api-page-size', type=int, default=20, help='Личностей на странице API')
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--json', dest='output', help='Записать результаты в файл')
+
+    def handle(self, per_page=5, api_page_size=20, repeat=200, output=None, **options):
+        results = benchmark.cache_formats(per_page, api_page_size, repeat)
+        baseline = {}
+        for result in results:
+            before = baseline.setdefault(result['list'], result)
+            ratio = (f"  (в {before['bytes'] / result['bytes']:.1f} раза меньше, "
+                     f"чтение в {before['load_us'] / result['load_us']:.1f} раза быстрее)" if before is not result else '')
+            self.stdout.write(f"{result['list']:<6}{result['format']:<8}{result['rows']:>4} записей  "
+                              f"{result['bytes']:>8} байт  {result['load_us']:>8} мкс{ratio}")
+
+        if output:
+            with open(output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,32 @@
+import json
+
+from django.core.management.base import BaseCommand
+from peoples import benchmark, renderers
+
+
+class Command(BaseCommand):
+    help = 'Строк в секунду для /api/person/: PersonSerializer + JSONRenderer против плана полей и orjson'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--json', dest='output', help='Записать результаты в файл')
+
+    def handle(self, rows=1000, repeat=5, output=None, **options):
+        if renderers.orjson is None:
+            self.stderr.write(self.style.WARNING('orjson не установлен (requirements.txt): измеряется JSONEncoder DRF'))
+        results = benchmark.serializer_throughput(rows, repeat)
+        results['orjson'] = renderers.orjson is not None
+        for name in ('drf', 'plan'):
+            result = results[name]
+            self.stdout.write(f"{name:<6}{result['rows']:>8} строк  {result['rows_per_second']:>10} строк/с  "
+                              f"{result['bytes']:>10} байт")
+        speedup = results['plan']['rows_per_second'] / results['drf']['rows_per_second']
+        if results['identical']:
+            self.stdout.write(self.style.SUCCESS(f'ускорение в {speedup:.1f} раза, тела совпадают'))
+        else:
+            self.stdout.write(self.style.ERROR(f'ускорение в {speedup:.1f} раза, но тела различаются'))
+
+        if output:
+            with open(output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,35 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+from peoples import transfer
+from peoples.models import Person
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка личностей в NDJSON или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help='Файл .ndjson/.jsonl/.csv или "-" для stdout')
+        parser.add_argument('--format', choices=('ndjson', 'csv'), help='По умолчанию - по расширению файла')
+        parser.add_argument('--chunk-size', type=int, default=transfer.CHUNK_SIZE)
+        parser.add_argument('--published', action='store_true', help='Только опубликованные')
+
+    def handle(self, path='-', format=None, chunk_size=transfer.CHUNK_SIZE, published=False, **options):
+        fmt = format or ('csv' if path.endswith('.csv') else 'ndjson')
+        queryset = Person.published.all() if published else Person.objects.all()
+        started = time.monotonic()
+        count = 0
+
+        def records():
+            nonlocal count
+            for count, record in enumerate(transfer.export_records(queryset, chunk_size), 1):
+                yield record
+
+        if path == '-':
+            transfer.write_records(self.stdout, records(), fmt)
+        else:
+            with open(path, 'w', encoding='utf-8', newline='') as stream:
+                transfer.write_records(stream, records(), fmt)
+            seconds = time.monotonic() - started
+            self.stderr.write(f'Выгружено {count} записей за {seconds:.2f} с')
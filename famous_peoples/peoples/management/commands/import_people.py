@@ -0,0 +1,47 @@
+import contextlib
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from peoples import transfer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class Command(BaseCommand):
+    help = 'Потоковый импорт личностей из NDJSON или CSV (обновляет существующие записи по slug)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл .ndjson/.jsonl/.csv или "-" для stdin')
+        parser.add_argument('--format', choices=('ndjson', 'csv'), help='По умолчанию - по расширению файла')
+        parser.add_argument('--chunk-size', type=int, default=transfer.CHUNK_SIZE)
+
+    def handle(self, path, format=None, chunk_size=transfer.CHUNK_SIZE, **options):
+        fmt = format or ('csv' if path.endswith('.csv') else 'ndjson')
+        importer = transfer.Importer(chunk_size=chunk_size)
+        try:
+            # stdin команда не открывала и не закрывает
+            source = contextlib.nullcontext(sys.stdin) if path == '-' else open(path, encoding='utf-8', newline='')
+        except OSError as e:
+            raise CommandError(e)
+
+        with source as stream:
+            try:
+                stats = importer.run(transfer.read_records(stream, fmt))
+            except transfer.FormatError as e:
+                raise CommandError(f'Импорт отменен, {e}')
+
+        for error in importer.errors[:20]:
+            self.stderr.write(f'Пропущено: {error}')
+        rows = stats['created'] + stats['updated']
+        rate = rows / stats['seconds'] if stats['seconds'] else rows
+        memory = ''
+        if resource:
+            # ru_maxrss в килобайтах на Linux
+            memory = f', пик памяти {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024} МБ'
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано {stats['created']}, обновлено {stats['updated']}, пропущено {stats['skipped']}, "
+            f"связано партнеров {stats['linked']} за {stats['seconds']} с ({rate:.0f} записей/с{memory})"
+        ))
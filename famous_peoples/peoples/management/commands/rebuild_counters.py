@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from peoples import counters, utils
+from peoples.models import Category, TagPost
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики опубликованных постов у категорий и тегов'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            counters.rebuild()
+            transaction.on_commit(lambda: utils.bump_cache_versions([utils.SIDEBAR_CATEGORIES_CACHE_KEY,
+                                                                      utils.SIDEBAR_TAGS_CACHE_KEY]))
+        self.stdout.write(self.style.SUCCESS(
+            f'Категорий: {Category.objects.count()}, тегов: {TagPost.objects.count()} - счетчики пересчитаны'
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from peoples import excerpts, transfer, utils
+from peoples.models import Person
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сохраненные превью личностей (например, после изменения EXCERPT_WORDS)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, batch_size=2000, **options):
+        # каждая часть записывается отдельным запросом, без одной длинной транзакции на всю таблицу
+        changed = excerpts.backfill(Person.objects.all(), batch_size)
+        if changed:
+            # превью выводят списки, а они лежат в кэше
+            utils.reset_cache_versions(transfer.catalogue_cache_namespaces())
+        self.stdout.write(self.style.SUCCESS(f'Обновлено превью: {changed} из {Person.objects.count()}'))
@@ -0,0 +1,43 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from peoples import thumbnails
+from peoples.models import Person
+
+
+class Command(BaseCommand):
+    help = 'Строит уменьшенные копии фото личностей в пуле процессов (например, после импорта или изменения WIDTHS)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=None, help='По умолчанию - число ядер')
+        parser.add_argument('--missing', action='store_true', help='Только личности без копий текущего фото')
+        parser.add_argument('--chunk-size', type=int, default=200)
+
+    def chunks(self, missing, chunk_size):
+        # части читаются по pk целиком, без открытого курсора: соединение закрывается перед каждым пулом
+        last = 0
+        while True:
+            rows = list(Person.objects.exclude(photo='').exclude(photo__isnull=True).filter(pk__gt=last)
+                        .order_by('pk').values_list('pk', 'photo', 'thumbnails')[:chunk_size])
+            if not rows:
+                return
+            last = rows[-1][0]
+            if missing:
+                rows = [row for row in rows if thumbnails.is_stale(row[1], row[2])]
+            if rows:
+                yield rows
+
+    def handle(self, processes=None, missing=False, chunk_size=200, **options):
+        changed = 0
+        for rows in self.chunks(missing, chunk_size):
+            # дочерние процессы не должны наследовать соединения с БД
+            connections.close_all()
+            with ProcessPoolExecutor(processes) as pool:
+                results = list(pool.map(thumbnails.safe_generate, [photo for _, photo, _ in rows]))
+            people = [Person(pk=pk, thumbnails=data) for (pk, _, _), data in zip(rows, results)]
+            # bulk_update идет через PersonQuerySet.update, кэш сбрасывают сигналы peoples/invalidation.py
+            Person.objects.bulk_update(people, ['thumbnails'])
+            changed += len(people)
+            self.stdout.write(f'Обработано фото: {changed}')
+        self.stdout.write(self.style.SUCCESS(f'Обновлено миниатюр: {changed}'))
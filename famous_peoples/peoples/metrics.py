@@ -0,0 +1,270 @@
+import functools
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.cache import cache
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends import django as django_backend
+from django.urls import URLPattern
+
+
+# Метрики запросов без DEBUG и debug_toolbar. Instrumentation (peoples/middleware.py) создает RequestMetrics
+# в contextvar, а хуки ниже дописывают в него запросы к БД, попадания в кэш, рендеринг шаблонов и сериализацию.
+# Contextvar виден и в потоках sync_to_async, поэтому асинхронные представления учитываются так же.
+# По завершении запроса итоги уходят в заголовок Server-Timing и в счетчики процесса; раз в FLUSH_INTERVAL
+# секунд счетчики прибавляются (incr) к общим ключам в кэше, откуда их читает /metrics/ для Prometheus
+
+FLUSH_INTERVAL = 10
+KEY_PREFIX = 'peoples_metrics'
+TIMERS = ('db', 'render', 'serialize')
+# верхние границы корзин гистограммы длительности запросов, секунды
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+# события локального уровня кэша (peoples/cache_backends.TwoTierCache.local_stats)
+LOCAL_CACHE_EVENTS = ('hits', 'misses', 'evictions', 'invalidations')
+# ключи отдельных категорий, тегов и личностей считаются вместе, иначе меток будет столько же, сколько записей
+PER_OBJECT_NAMESPACE = re.compile(r'(peoples_category|peoples_tag|peoples_detail)_.+|(api_person)_\d+')
+
+current = ContextVar('peoples_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.durations = dict.fromkeys(TIMERS, 0.0)
+        # пространство имен -> [попадания, промахи]
+        self.cache = defaultdict(lambda: [0, 0])
+        self.active = set()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        hits = sum(hit for hit, _ in self.cache.values())
+        misses = sum(miss for _, miss in self.cache.values())
+        return ', '.join([
+            f'db;dur={self.durations["db"] * 1000:.2f};desc="{self.queries} queries"',
+            f'cache;desc="{hits} hits, {misses} misses"',
+            f'render;dur={self.durations["render"] * 1000:.2f}',
+            f'serialize;dur={self.durations["serialize"] * 1000:.2f}',
+            f'total;dur={self.elapsed() * 1000:.2f}',
+        ])
+
+
+@contextmanager
+def timer(name):
+    """Время блока в метрике name текущего запроса; вложенные блоки с тем же именем не считаются дважды"""
+    metrics = current.get()
+    if metrics is None or name in metrics.active:
+        yield
+        return
+    metrics.active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.durations[name] += time.perf_counter() - start
+        metrics.active.discard(name)
+
+
+def cache_namespace(key):
+    namespace = key.split(':', 1)[0]
+    if match := PER_OBJECT_NAMESPACE.fullmatch(namespace):
+        return match[1] or match[2]
+    return namespace
+
+
+def record_cache(key, hit):
+    """Вызывается из utils.cached/acached и кэша страниц для ключей peoples_* и api_person_*"""
+    metrics = current.get()
+    if metrics is not None and key.startswith(('peoples_', 'api_person_')):
+        metrics.cache[cache_namespace(key)][0 if hit else 1] += 1
+
+
+def query_wrapper(execute, sql, params, many, context):
+    metrics = current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.durations['db'] += time.perf_counter() - start
+        metrics.queries += 1
+
+
+@receiver(connection_created)
+def install_query_wrapper(sender, connection, **kwargs):
+    # обертка ставится на каждое соединение, а не в middleware: асинхронный ORM работает в других потоках,
+    # со своими соединениями, которые middleware не видит
+    if query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_wrapper)
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        with timer('render'):
+            return super().render(context, request)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Бэкенд шаблонов с замером рендеринга; включения и inclusion-теги входят во время внешнего шаблона"""
+
+    def from_string(self, template_code):
+        return Template(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
+
+
+@functools.cache
+def route_names():
+    """Имена маршрутов peoples/urls.py и API - значения метки route; маршруты не меняются, считаются один раз"""
+    from peoples import urls
+    patterns = [*urls.urlpatterns, *urls.router.urls]
+    return tuple(dict.fromkeys(p.name for p in patterns if isinstance(p, URLPattern) and p.name))
+
+
+@functools.cache
+def known_routes():
+    return frozenset(route_names())
+
+
+def route_label(request):
+    match = request.resolver_match
+    return match.url_name if match and match.url_name in known_routes() else 'other'
+
+
+def status_label(status_code):
+    return f'{status_code // 100}xx'
+
+
+def bucket_index(seconds):
+    return next((i for i, bound in enumerate(BUCKETS) if seconds <= bound), len(BUCKETS))
+
+
+def key(*parts):
+    return ':'.join((KEY_PREFIX, *parts))
+
+
+def micros(seconds):
+    return round(seconds * 1_000_000)
+
+
+class Aggregate:
+    """Счетчики процесса, которые еще не прибавлены к общим в кэше"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = defaultdict(int)
+        self.flushed = time.monotonic()
+        # счетчики локального кэша процесса на момент прошлого сброса
+        self.local_seen = {}
+
+    def add(self, metrics, route, status_code):
+        elapsed = metrics.elapsed()
+        with self.lock:
+            values = self.values
+            values[key('requests', route, status_label(status_code))] += 1
+            values[key('duration_bucket', route, str(bucket_index(elapsed)))] += 1
+            values[key('duration', route)] += micros(elapsed)
+            values[key('queries', route)] += metrics.queries
+            for name in TIMERS:
+                values[key(name, route)] += micros(metrics.durations[name])
+            for namespace, (hits, misses) in metrics.cache.items():
+                values[key('cache_hits', namespace)] += hits
+                values[key('cache_misses', namespace)] += misses
+
+    def due(self):
+        return time.monotonic() - self.flushed >= FLUSH_INTERVAL
+
+    def flush(self):
+        local_stats = getattr(cache, 'local_stats', None)
+        with self.lock:
+            values, self.values = self.values, defaultdict(int)
+            self.flushed = time.monotonic()
+            if local_stats is not None:
+                stats = local_stats()
+                for event in LOCAL_CACHE_EVENTS:
+                    values[key('local_cache', event)] += stats[event] - self.local_seen.get(event, 0)
+                self.local_seen = stats
+        for name, delta in values.items():
+            if not delta:
+                continue
+            try:
+                cache.incr(name, delta)
+            except ValueError:
+                # ключа еще нет; если его успел создать другой процесс, add вернет False
+                if not cache.add(name, delta, None):
+                    cache.incr(name, delta)
+
+
+aggregate = Aggregate()
+
+
+def cache_namespaces():
+    from peoples import utils
+    return [utils.ALL_CACHE_KEY, *utils.GENDER_CACHE_KEYS.values(), utils.API_LIST_CACHE_KEY,
+            utils.SIDEBAR_CATEGORIES_CACHE_KEY, utils.SIDEBAR_TAGS_CACHE_KEY, utils.SEARCH_CACHE_KEY,
+            utils.AUTOCOMPLETE_CACHE_KEY, 'peoples_category', 'peoples_tag', 'peoples_detail', 'api_person',
+            'peoples_page']
+
+
+def exposition():
+    """Общие счетчики из кэша в текстовом формате Prometheus; маршруты без запросов пропускаются"""
+    routes = [*route_names(), 'other']
+    statuses = [status_label(code) for code in (200, 300, 400, 500)]
+    namespaces = cache_namespaces()
+    names = [key('requests', route, status) for route in routes for status in statuses]
+    names += [key('duration_bucket', route, str(i)) for route in routes for i in range(len(BUCKETS) + 1)]
+    names += [key(name, route) for route in routes for name in ('duration', 'queries', *TIMERS)]
+    names += [key(name, namespace) for namespace in namespaces for name in ('cache_hits', 'cache_misses')]
+    names += [key('local_cache', event) for event in LOCAL_CACHE_EVENTS]
+    values = cache.get_many(names)
+
+    def value(*parts):
+        return values.get(key(*parts), 0)
+
+    lines = []
+
+    def family(name, kind, help_text):
+        lines.extend((f'# HELP {name} {help_text}', f'# TYPE {name} {kind}'))
+
+    active = [route for route in routes if any(value('requests', route, status) for status in statuses)]
+
+    family('peoples_http_requests_total', 'counter', 'Запросы по маршруту и классу статуса')
+    lines += [f'peoples_http_requests_total{{route="{route}",status="{status}"}} {value("requests", route, status)}'
+              for route in active for status in statuses if value('requests', route, status)]
+
+    family('peoples_http_request_duration_seconds', 'histogram', 'Время обработки запроса')
+    for route in active:
+        total = 0
+        for i, bound in enumerate((*BUCKETS, '+Inf')):
+            total += value('duration_bucket', route, str(i))
+            lines.append(f'peoples_http_request_duration_seconds_bucket{{route="{route}",le="{bound}"}} {total}')
+        lines.append(f'peoples_http_request_duration_seconds_sum{{route="{route}"}} {value("duration", route) / 1e6}')
+        lines.append(f'peoples_http_request_duration_seconds_count{{route="{route}"}} {total}')
+
+    family('peoples_db_queries_total', 'counter', 'Запросы к БД')
+    lines += [f'peoples_db_queries_total{{route="{route}"}} {value("queries", route)}' for route in active]
+    for name, metric, help_text in (('db', 'peoples_db_query_seconds_total', 'Время запросов к БД'),
+                                    ('render', 'peoples_template_render_seconds_total', 'Время рендеринга шаблонов'),
+                                    ('serialize', 'peoples_serializer_seconds_total', 'Время сериализации DRF')):
+        family(metric, 'counter', help_text)
+        lines += [f'{metric}{{route="{route}"}} {value(name, route) / 1e6}' for route in active]
+
+    family('peoples_cache_requests_total', 'counter', 'Чтения через utils.cached по пространствам имен')
+    for namespace in namespaces:
+        for result, name in (('hit', 'cache_hits'), ('miss', 'cache_misses')):
+            if count := value(name, namespace):
+                lines.append(f'peoples_cache_requests_total{{namespace="{namespace}",result="{result}"}} {count}')
+
+    family('peoples_local_cache_events_total', 'counter', 'Локальный уровень кэша всех процессов')
+    lines += [f'peoples_local_cache_events_total{{event="{event}"}} {value("local_cache", event)}'
+              for event in LOCAL_CACHE_EVENTS if value('local_cache', event)]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,102 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from peoples import metrics, page_cache
+
+
+class AsyncUrlconf:
+    """Запросам, пришедшим через ASGI (Daphne), подставляет URLconf с асинхронными представлениями"""
+    sync_capable = True
+    async_capable = True
+    urlconf = 'famous_peoples.asgi_urls'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if isinstance(request, ASGIRequest):
+            request.urlconf = self.urlconf
+        return await self.get_response(request)
+
+
+class Instrumentation:
+    """
+    Метрики запроса (peoples/metrics.py): заголовок Server-Timing и счетчики для /metrics/.
+    Стоит первым в MIDDLEWARE, чтобы общее время включало остальные middleware
+    """
+    sync_capable = True
+    async_capable = True
+    # сам экспорт метрик не учитывается
+    skip_routes = ('metrics',)
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = metrics.current.set(metrics.RequestMetrics())
+        try:
+            response = self.get_response(request)
+            if self.finish(request, response):
+                metrics.aggregate.flush()
+        finally:
+            metrics.current.reset(token)
+        return response
+
+    async def __acall__(self, request):
+        token = metrics.current.set(metrics.RequestMetrics())
+        try:
+            response = await self.get_response(request)
+            if self.finish(request, response):
+                await sync_to_async(metrics.aggregate.flush)()
+        finally:
+            metrics.current.reset(token)
+        return response
+
+    def finish(self, request, response):
+        """Дописывает Server-Timing и счетчики процесса; True, если пора сбросить их в кэш"""
+        request_metrics = metrics.current.get()
+        route = metrics.route_label(request)
+        if route in self.skip_routes:
+            return False
+        timing = request_metrics.server_timing()
+        response['Server-Timing'] = f"{response['Server-Timing']}, {timing}" if response.has_header(
+            'Server-Timing') else timing
+        metrics.aggregate.add(request_metrics, route, response.status_code)
+        return metrics.aggregate.due()
+
+
+class PageCache:
+    """Кэш готовых страниц с ETag/Last-Modified и условными GET (peoples/page_cache.py)"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return page_cache.conditional(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return page_cache.conditional(request, await self.get_response(request))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        return page_cache.lookup(request, request.resolver_match.url_name, view_kwargs)
+
+    def process_template_response(self, request, response):
+        if getattr(request, 'page_cache', None):
+            page_cache.prepare(request, response)
+        return response
@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-17 10:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('peoples', '0003_alter_person_author'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='person',
+            options={'ordering': ['-time_create', '-id'], 'verbose_name': 'Известная личность', 'verbose_name_plural': 'Известные личности'},
+        ),
+        migrations.RemoveIndex(
+            model_name='person',
+            name='peoples_per_time_cr_aa5d1a_idx',
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['-time_create', '-id'], name='peoples_per_time_cr_1060e7_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-17 10:17
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_posts_count(apps, schema_editor):
+    Person = apps.get_model('peoples', 'Person')
+    Category = apps.get_model('peoples', 'Category')
+    TagPost = apps.get_model('peoples', 'TagPost')
+    Through = Person.tag.through
+
+    cat_counts = Person.objects.filter(cat=OuterRef('pk'), is_published=1).order_by().values('cat')
+    Category.objects.update(posts_count=Coalesce(Subquery(cat_counts.annotate(c=Count('pk')).values('c')), 0))
+    tag_counts = Through.objects.filter(tagpost=OuterRef('pk'), person__is_published=1).order_by().values('tagpost')
+    TagPost.objects.update(posts_count=Coalesce(Subquery(tag_counts.annotate(c=Count('pk')).values('c')), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('peoples', '0004_person_keyset_ordering'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='posts_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='Опубликованных постов'),
+        ),
+        migrations.AddField(
+            model_name='tagpost',
+            name='posts_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='Опубликованных постов'),
+        ),
+        migrations.RunPython(fill_posts_count, migrations.RunPython.noop),
+    ]
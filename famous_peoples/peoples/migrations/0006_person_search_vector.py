@@ -0,0 +1,59 @@
+# Generated by Django 5.2 on 2026-10-17 10:20
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# Вектор пересчитывает триггер, поэтому он актуален и после QuerySet.update() и bulk_create().
+# Заголовок весит больше описания (метки A и B для SearchRank)
+VECTOR = ("setweight(to_tsvector('russian', coalesce({row}.title, '')), 'A') || "
+          "setweight(to_tsvector('russian', coalesce({row}.content, '')), 'B')")
+
+CREATE_SQL = [
+    f'''
+    CREATE FUNCTION peoples_person_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := {VECTOR.format(row="NEW")};
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    '''
+    CREATE TRIGGER peoples_person_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, content ON peoples_person
+    FOR EACH ROW EXECUTE FUNCTION peoples_person_search_vector_update()
+    ''',
+    f'UPDATE peoples_person SET search_vector = {VECTOR.format(row="peoples_person")}',
+    'CREATE INDEX peoples_person_search_vector_gin ON peoples_person USING gin (search_vector)',
+]
+
+DROP_SQL = [
+    'DROP INDEX IF EXISTS peoples_person_search_vector_gin',
+    'DROP TRIGGER IF EXISTS peoples_person_search_vector_trigger ON peoples_person',
+    'DROP FUNCTION IF EXISTS peoples_person_search_vector_update()',
+]
+
+
+def run_on_postgresql(statements):
+    # на других СУБД поиск работает через обратный индекс в памяти (peoples/search.py)
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            for sql in statements:
+                schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('peoples', '0005_posts_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(run_on_postgresql(CREATE_SQL), run_on_postgresql(DROP_SQL)),
+    ]
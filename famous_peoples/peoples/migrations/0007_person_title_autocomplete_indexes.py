@@ -0,0 +1,36 @@
+from django.db import migrations
+
+
+# Выражение совпадает с тем, что Django строит для title__istartswith и title__icontains на PostgreSQL
+TITLE = 'UPPER(title::text)'
+
+CREATE_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    f'CREATE INDEX peoples_person_title_prefix ON peoples_person ({TITLE} text_pattern_ops)',
+    f'CREATE INDEX peoples_person_title_trgm ON peoples_person USING gin ({TITLE} gin_trgm_ops)',
+]
+
+DROP_SQL = [
+    'DROP INDEX IF EXISTS peoples_person_title_trgm',
+    'DROP INDEX IF EXISTS peoples_person_title_prefix',
+]
+
+
+def run_on_postgresql(statements):
+    # на других СУБД подсказки ищутся по списку в памяти (peoples/autocomplete.py)
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            for sql in statements:
+                schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('peoples', '0006_person_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_postgresql(CREATE_SQL), run_on_postgresql(DROP_SQL)),
+    ]
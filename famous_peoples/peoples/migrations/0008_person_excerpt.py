@@ -0,0 +1,51 @@
+# Generated by Django 5.2 on 2026-10-17 11:03
+
+from html import unescape
+
+from django.db import migrations, models
+from django.template.defaultfilters import linebreaks_filter, truncatewords
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+# копия peoples/excerpts.py на момент миграции: последующие изменения модуля ее не затрагивают
+EXCERPT_WORDS = 40
+BATCH_SIZE = 2000
+
+
+def make_excerpts(content):
+    html = truncatewords(linebreaks_filter(content, autoescape=False), EXCERPT_WORDS)
+    text = Truncator(' '.join(unescape(strip_tags(content)).split())).words(EXCERPT_WORDS)
+    return text, html
+
+
+def fill_excerpts(apps, schema_editor):
+    Person = apps.get_model('peoples', 'Person')
+    batch = []
+    for person in Person.objects.only('pk', 'content').order_by('pk').iterator(chunk_size=BATCH_SIZE):
+        person.excerpt, person.excerpt_html = make_excerpts(person.content or '')
+        batch.append(person)
+        if len(batch) >= BATCH_SIZE:
+            Person.objects.bulk_update(batch, ['excerpt', 'excerpt_html'])
+            batch = []
+    Person.objects.bulk_update(batch, ['excerpt', 'excerpt_html'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('peoples', '0007_person_title_autocomplete_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='excerpt',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Превью'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='excerpt_html',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
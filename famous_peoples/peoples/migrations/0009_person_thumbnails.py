@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 11:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('peoples', '0008_person_excerpt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='thumbnails',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
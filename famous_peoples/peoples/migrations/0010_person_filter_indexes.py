@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-17 11:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('peoples', '0009_person_thumbnails'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['is_published', 'gender', '-time_create', '-id'], name='peoples_per_is_publ_1dc0d8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['cat', 'is_published', '-time_create', '-id'], name='peoples_per_cat_id_176962_idx'),
+        ),
+    ]
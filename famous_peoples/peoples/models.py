@@ -1,10 +1,76 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
 from django.urls import reverse
-
-
-class PublishedModel(models.Manager):
+from peoples import excerpts
+from peoples.signals import pre_queryset_update, post_queryset_update
+
+
+# значение поля, которое не загружалось из БД
+UNKNOWN = object()
+
+
+class PersonQuerySet(models.QuerySet):
+    # Поля, которые выводит список (peoples/index.html), - остальные колонки не читаются
+    # вместо content списки читают готовое превью (peoples/excerpts.py)
+    LIST_FIELDS = ('title', 'slug', 'excerpt_html', 'photo', 'thumbnails', 'gender', 'time_create', 'time_update',
+                   'cat__name', 'cat__slug', 'author__username')
+
+    def for_list(self):
+        return self.select_related('cat', 'author').only(*self.LIST_FIELDS)
+
+    def for_detail(self):
+        return self.select_related('companion').prefetch_related('tag').defer('search_vector', *excerpts.FIELDS)
+
+    def link_companions(self, pairs):
+        """
+        Связывает пары симметрично: pairs - {pk: pk партнера или None}. Прежние партнеры участников остаются
+        без пары. Меняется только колонка companion, строки блокируются до конца транзакции
+        """
+        pairs = dict(pairs)
+        final = {}
+        for pk, companion in pairs.items():
+            if companion == pk:
+                raise ValueError(f'Личность {pk} не может быть своим партнером')
+            for a, b in ((pk, companion), (companion, pk)):
+                if a is not None and final.setdefault(a, b) != b:
+                    raise ValueError(f'Для личности {a} указано несколько партнеров')
+        final.pop(None, None)
+
+        with transaction.atomic():
+            rows = (self.model.objects.select_for_update()
+                    .filter(models.Q(pk__in=final) | models.Q(companion__in=final))
+                    .values_list('pk', 'companion_id'))
+            current = dict(rows)
+            # у тех, кто ссылается на участника, но не остается с ним в паре, партнер обнуляется
+            for pk, companion in current.items():
+                if pk not in final and companion in final and final[companion] != pk:
+                    final[pk] = None
+
+            changed = {pk: companion for pk, companion in final.items()
+                       if pk in current and current[pk] != companion}
+            if changed:
+                # сначала обнуление: иначе обмен партнерами нарушит уникальность companion посреди UPDATE
+                self.model.objects.filter(pk__in=changed).update(companion=None)
+                linked = {pk: companion for pk, companion in changed.items() if companion is not None}
+                if linked:
+                    self.model.objects.filter(pk__in=linked).update(companion=models.Case(
+                        *(models.When(pk=pk, then=models.Value(companion)) for pk, companion in linked.items())
+                    ))
+        return len(changed)
+
+    def update(self, **kwargs):
+        # счетчики постов (peoples/counters.py) пересчитываются в той же транзакции
+        with transaction.atomic():
+            pks = list(self.values_list('pk', flat=True))
+            pre_queryset_update.send(sender=self.model, pks=pks, fields=set(kwargs))
+            rows = super().update(**kwargs)
+            post_queryset_update.send(sender=self.model, pks=pks, fields=set(kwargs))
+        return rows
+
+
+class PublishedModel(models.Manager.from_queryset(PersonQuerySet)):
     def get_queryset(self):
         return super().get_queryset().filter(is_published=self.model.Status.PUBLISHED)
 
@@ -21,10 +87,14 @@ class Person(models.Model):
     title = models.CharField(max_length=255, verbose_name="Заголовок")
     slug = models.SlugField(max_length=255, db_index=True, unique=True)
     content = models.TextField(blank=True, verbose_name='Описание')
+    excerpt = models.TextField(blank=True, default='', editable=False, verbose_name='Превью')
+    excerpt_html = models.TextField(blank=True, default='', editable=False)
     time_create = models.DateTimeField(auto_now_add=True, verbose_name='Дата и время создания')
     time_update = models.DateTimeField(auto_now=True)
     is_published = models.IntegerField(choices=Status.choices, default=Status.PUBLISHED, verbose_name='Статус')
     photo = models.ImageField(upload_to="photos/%Y/%m/%d/", default=None, blank=True, null=True, verbose_name='Фото')
+    # пути уменьшенных копий фото (peoples/thumbnails.py)
+    thumbnails = models.JSONField(default=dict, blank=True, editable=False)
     gender = models.CharField(choices=Gender.choices, verbose_name='Пол')
     companion = models.OneToOneField('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='partner',
                                      verbose_name='Партнер')
@@ -32,16 +102,21 @@ class Person(models.Model):
     tag = models.ManyToManyField('TagPost', blank=True, related_name='tags')
     author = models.ForeignKey(get_user_model(), on_delete=models.SET_NULL, related_name='posts', null=True,
                                default=None, blank=True)
-    objects = models.Manager()
+    # заполняет триггер PostgreSQL из title и content (миграция 0006), в коде поле только читается поиском
+    search_vector = SearchVectorField(null=True, editable=False)
+    objects = PersonQuerySet.as_manager()
     published = PublishedModel()
 
 
     class Meta:
         verbose_name = "Известная личность"
         verbose_name_plural = "Известные личности"
-        ordering = ['-time_create']
+        ordering = ['-time_create', '-id']
         indexes = [
-            models.Index(fields=['-time_create'])
+            models.Index(fields=['-time_create', '-id']),
+            # фильтры API (peoples/filters.py) и списки по полу и категории в порядке ленты
+            models.Index(fields=['is_published', 'gender', '-time_create', '-id']),
+            models.Index(fields=['cat', 'is_published', '-time_create', '-id']),
         ]
 
     def __str__(self):
@@ -57,26 +132,77 @@ class Person(models.Model):
     def get_absolute_url(self):
         return reverse('post', kwargs={'post_slug': self.slug})
 
+    def photo_thumbnails(self):
+        """{ширина: путь} готовых копий текущего фото"""
+        if not self.photo or (self.thumbnails or {}).get('source') != self.photo.name:
+            return {}
+        return {int(width): name for width, name in self.thumbnails.get('sizes', {}).items()}
+
+    def photo_url(self, width):
+        """URL самой узкой копии не уже width (или самой широкой из готовых); пока копий нет - оригинал"""
+        sizes = self.photo_thumbnails()
+        if not sizes:
+            return self.photo.url
+        fitting = [size for size in sizes if size >= width]
+        return self.photo.storage.url(sizes[min(fitting) if fitting else max(sizes)])
+
+    @property
+    def photo_srcset(self):
+        return ', '.join(f'{self.photo.storage.url(name)} {width}w'
+                         for width, name in sorted(self.photo_thumbnails().items()))
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # партнер, который сейчас записан в БД; если поле отложено (only/defer), значение неизвестно
+        if 'companion_id' in instance.__dict__:
+            instance._loaded_companion_id = instance.companion_id
+        return instance
+
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-
-        if self.companion:
-            partner = self.companion
-            if partner.companion != self:
-                partner.companion = self
-                partner.save()
-        else:
-            try:
-                old_partner = Person.objects.get(companion=self)
-                old_partner.companion = None
-                old_partner.save()
-            except Person.DoesNotExist:
-                pass
+        adding = self._state.adding
+        update_fields = kwargs.get('update_fields')
+        # превью пересчитывается, если сохраняется загруженное описание
+        if 'content' in self.__dict__ and (update_fields is None or 'content' in update_fields):
+            excerpts.fill(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = update_fields = {*update_fields, *excerpts.FIELDS}
+        companion_saved = update_fields is None or {'companion', 'companion_id'} & set(update_fields)
+        loaded = self.__dict__.get('_loaded_companion_id', UNKNOWN)
+        link = companion_saved and loaded != self.companion_id and not (adding and self.companion_id is None)
+        # счетчики постов (peoples/counters.py) пересчитываются в той же транзакции
+        with transaction.atomic():
+            if link:
+                # новый партнер пишется только через link_companions: строка сохраняется с прежним значением
+                # (NULL, если оно неизвестно), иначе занятый чужой парой companion_id нарушит уникальность
+                self._save_without_companion(None if loaded is UNKNOWN else loaded, *args, **kwargs)
+                Person.objects.link_companions({self.pk: self.companion_id})
+            else:
+                super().save(*args, **kwargs)
+
+        if companion_saved:
+            self._loaded_companion_id = self.companion_id
+            if self.companion_id and Person.companion.is_cached(self):
+                self.companion.companion = self
+                self.companion._loaded_companion_id = self.pk
+
+    def _save_without_companion(self, written, *args, **kwargs):
+        field = Person.companion.field
+        companion_id, companion = self.companion_id, field.get_cached_value(self, None)
+        self.companion_id = written
+        try:
+            super().save(*args, **kwargs)
+        finally:
+            self.companion_id = companion_id
+            if companion is not None:
+                field.set_cached_value(self, companion)
 
 
 class Category(models.Model):
     name = models.CharField(max_length=100, db_index=True, verbose_name='Категория')
     slug = models.SlugField(max_length=255, unique=True, db_index=True)
+    posts_count = models.PositiveIntegerField(default=0, db_index=True, editable=False,
+                                              verbose_name='Опубликованных постов')
 
     def get_absolute_url(self):
         return reverse('category', kwargs={'cat_slug': self.slug})
@@ -92,6 +218,8 @@ class Category(models.Model):
 class TagPost(models.Model):
     tag = models.CharField(max_length=100, db_index=True)
     slug = models.SlugField(max_length=255, unique=True, db_index=True)
+    posts_count = models.PositiveIntegerField(default=0, db_index=True, editable=False,
+                                              verbose_name='Опубликованных постов')
 
     def get_absolute_url(self):
         return reverse('tag', kwargs={'tag_slug': self.slug})
@@ -0,0 +1,154 @@
+import hashlib
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, urlencode
+
+from peoples import metrics, utils, views
+
+
+# Кэш готовых страниц (middleware PageCache). Ключ - вариант пользователя, путь с параметрами, которые читает
+# представление (QUERY_PARAMS; остальные не плодят копий страницы), и версии
+# пространств имен, из которых собрана страница, включая сайдбар: после изменения данных peoples/invalidation.py
+# поднимает версию, и ключ меняется сам. ETag и Last-Modified строятся по max(time_update) выведенных личностей,
+# поэтому If-None-Match/If-Modified-Since отвечают 304 без представления и шаблона.
+# Анонимы получают одну общую копию; у вошедших в шапке имя и CSRF-токен формы выхода, поэтому у них своя копия
+# на пару "пользователь + CSRF-cookie"
+
+KEY_PREFIX = 'peoples_page'
+SIDEBAR_NAMESPACES = (utils.SIDEBAR_CATEGORIES_CACHE_KEY, utils.SIDEBAR_TAGS_CACHE_KEY)
+
+# имя маршрута -> пространства имен страницы по аргументам из URL
+PAGES = {
+    'peoples': lambda kwargs: [utils.ALL_CACHE_KEY],
+    'men': lambda kwargs: [utils.GENDER_CACHE_KEYS['M']],
+    'women': lambda kwargs: [utils.GENDER_CACHE_KEYS['F']],
+    'category': lambda kwargs: [utils.category_cache_key(kwargs['cat_slug'])],
+    'tag': lambda kwargs: [utils.tag_cache_key(kwargs['tag_slug'])],
+    'post': lambda kwargs: [utils.detail_cache_key(kwargs['post_slug'])],
+    'search': lambda kwargs: [utils.SEARCH_CACHE_KEY],
+}
+
+# имя маршрута -> параметры запроса, от которых зависит страница, в порядке ключа
+LIST_PARAMS = ('cursor', 'page')
+QUERY_PARAMS = {
+    'peoples': LIST_PARAMS,
+    'men': LIST_PARAMS,
+    'women': LIST_PARAMS,
+    'category': LIST_PARAMS,
+    'tag': LIST_PARAMS,
+    'post': (),
+    'search': ('page', 'q'),
+}
+
+
+def require(found):
+    if not found:
+        raise Http404('Пустая страница')
+
+
+# имя маршрута -> проверка, что по slug из URL есть что выводить (его пространство имен идет первым в PAGES);
+# иначе Http404 сразу из middleware. Проверка - то же кэшированное чтение, что в представлении: оно само создает
+# счетчик версии, только если данные нашлись, и представление потом берет их из кэша без лишнего запроса к БД
+CHECKS = {
+    'category': lambda kwargs: require(views.Category.pages(kwargs['cat_slug']).exists()),
+    'tag': lambda kwargs: require(views.TagPostList.pages(kwargs['tag_slug']).exists()),
+    'post': lambda kwargs: views.ShowPost.cached_post(kwargs['post_slug']),
+}
+
+
+def variant(request):
+    """Часть ключа для пользователя; None - страницу не кэшировать"""
+    if not request.user.is_authenticated:
+        return 'anon'
+    csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+    if not csrf_cookie:
+        # токен на странице будет выписан под новую cookie, которой у запроса еще нет
+        return None
+    return f'user{request.user.pk}-{hashlib.md5(csrf_cookie.encode()).hexdigest()[:12]}'
+
+
+def page_key(request, namespaces, variant, params=(), check=None):
+    namespaces = (*namespaces, *SIDEBAR_NAMESPACES)
+    # версии читаются одним запросом к кэшу; недостающие создает get_cache_version. Пространство имен объекта
+    # из URL - только после check(), чтобы случайные slug не копили счетчики в кэше
+    found = cache.get_many([f'{namespace}:version' for namespace in namespaces])
+    if check is not None and f'{namespaces[0]}:version' not in found:
+        check()
+    versions = '.'.join(str(found.get(f'{namespace}:version') or utils.get_cache_version(namespace))
+                        for namespace in namespaces)
+    # значение параметра - последнее, как его видит request.GET.get() в представлении
+    query = urlencode([(param, request.GET[param]) for param in params if param in request.GET])
+    path = hashlib.md5(f'{request.path}?{query}'.encode()).hexdigest()
+    return f'{KEY_PREFIX}:{variant}:{path}:{versions}'
+
+
+def last_modified(context):
+    """max(time_update) личностей страницы; у моделей поле читается только если загружено, без лишних запросов"""
+    objects = list(context.get('posts') or ())
+    if context.get('post') is not None:
+        objects.append(context['post'])
+    stamps = [obj.__dict__.get('time_update') if hasattr(obj, '__dict__') else getattr(obj, 'time_update', None)
+              for obj in objects]
+    stamps = [stamp for stamp in stamps if isinstance(stamp, datetime)]
+    return max(stamps) if stamps else None
+
+
+def validators(key, modified):
+    """(ETag, Last-Modified как timestamp)"""
+    timestamp = int(modified.timestamp()) if modified else None
+    return f'"{hashlib.md5(f"{key}:{timestamp}".encode()).hexdigest()}"', timestamp
+
+
+def patch_headers(response, etag, timestamp, private):
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    # браузер хранит копию, но каждый раз сверяет ее условным запросом
+    if private:
+        patch_cache_control(response, no_cache=True, private=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    patch_vary_headers(response, ['Cookie'])
+
+
+def lookup(request, name, kwargs):
+    """Ответ из кэша (304 или 200) или None; ключ для сохранения запоминается в request"""
+    if request.method not in ('GET', 'HEAD') or name not in PAGES or (user_variant := variant(request)) is None:
+        return None
+    check = (lambda: CHECKS[name](kwargs)) if name in CHECKS else None
+    key = page_key(request, PAGES[name](kwargs), user_variant, QUERY_PARAMS[name], check)
+    entry = cache.get(key)
+    metrics.record_cache(key, hit=entry is not None)
+    if entry is None:
+        request.page_cache = (key, user_variant != 'anon')
+        return None
+
+    content, content_type, etag, timestamp = entry
+    response = HttpResponse(content, content_type=content_type)
+    patch_headers(response, etag, timestamp, private=user_variant != 'anon')
+    return get_conditional_response(request, etag=etag, last_modified=timestamp, response=response)
+
+
+def prepare(request, response):
+    """Для TemplateResponse до рендеринга: валидаторы по контексту и сохранение после рендеринга"""
+    key, private = request.page_cache
+    etag, timestamp = request.page_validators = validators(key, last_modified(response.context_data or {}))
+    patch_headers(response, etag, timestamp, private)
+
+    def store(rendered):
+        if rendered.status_code == 200 and not rendered.cookies:
+            cache.set(key, (rendered.content, rendered['Content-Type'], etag, timestamp), utils.CACHE_TIMEOUT)
+
+    response.add_post_render_callback(store)
+
+
+def conditional(request, response):
+    """304 и для только что собранной страницы: копия в кэше могла быть вытеснена, а у браузера она есть"""
+    if response.status_code != 200 or (state := getattr(request, 'page_validators', None)) is None:
+        return response
+    etag, timestamp = state
+    return get_conditional_response(request, etag=etag, last_modified=timestamp, response=response)
@@ -0,0 +1,83 @@
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from peoples import utils
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset-пагинация по (time_create, id) для /api/person/?cursor=
+
+    Пустой курсор - первая страница, ссылки next/previous содержат курсоры соседних страниц.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(page_size, self.max_page_size) if page_size > 0 else self.page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (cursor := request.query_params.get(self.cursor_query_param)) is None:
+            return None
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        try:
+            if isinstance(queryset, utils.CachedPages):
+                self.page = queryset.keyset_page(cursor, page_size)
+            else:
+                self.page = utils.keyset_page(queryset, cursor, page_size)
+        except ValueError:
+            raise NotFound('Неверный курсор')
+        return list(self.page)
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_link(self.page.next_cursor),
+            'previous': self.get_link(self.page.previous_cursor),
+            'results': data,
+        })
+
+
+class PersonPagination(PageNumberPagination):
+    """
+    Пагинация /api/person/: по номеру страницы (?page=, ?page_size=), а с параметром ?cursor= - по курсору
+    """
+    page_size = KeysetPagination.page_size
+    page_size_query_param = KeysetPagination.page_size_query_param
+    max_page_size = KeysetPagination.max_page_size
+
+    def __init__(self):
+        self.keyset = KeysetPagination()
+        self.use_cursor = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = self.keyset.cursor_query_param in request.query_params
+        if self.use_cursor:
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.use_cursor:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+
+class SearchPagination(PageNumberPagination):
+    """Пагинация результатов поиска: только по номеру страницы, курсор по дате не сохраняет порядок релевантности"""
+    page_size = KeysetPagination.page_size
+    page_size_query_param = KeysetPagination.page_size_query_param
+    max_page_size = KeysetPagination.max_page_size
@@ -0,0 +1,212 @@
+import pickle
+import zlib
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+
+from django.contrib.auth import get_user_model
+from django.db.models import Model
+
+import peoples.models as m
+
+
+# Компактный формат срезов списков в кэше (utils.CachedPages). Вместо pickle моделей (_state, кэш связанных
+# объектов, служебные поля) в кэш кладется кортеж значений на запись, даты - целыми микросекундами,
+# а сериализованные страницы API - один кортеж ключей и кортежи значений. Больше COMPRESS_MIN_SIZE байт
+# запись сжимается zlib. При чтении кортежи превращаются в легкие объекты только для чтения (PersonRecord)
+# или обратно в словари с тем же порядком ключей, поэтому JSON API совпадает байт в байт.
+# Формат входит в ключ кэша (Codec.name): после его изменения старые записи просто перестают читаться
+
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_LEVEL = 6
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def to_micros(value):
+    return None if value is None else (value - EPOCH) // timedelta(microseconds=1)
+
+
+def from_micros(value):
+    return None if value is None else EPOCH + timedelta(microseconds=value)
+
+
+def dump(rows):
+    payload = pickle.dumps(rows, pickle.HIGHEST_PROTOCOL)
+    if len(payload) >= COMPRESS_MIN_SIZE:
+        return True, zlib.compress(payload, COMPRESS_LEVEL)
+    return False, payload
+
+
+def load(packed):
+    compressed, payload = packed
+    return pickle.loads(zlib.decompress(payload) if compressed else payload)
+
+
+class Related:
+    """Категория или автор в записи списка: только выводимые поля; равен модели с тем же pk"""
+    __slots__ = ('model', 'pk', 'fields')
+
+    def __init__(self, model, pk, **fields):
+        self.model = model
+        self.pk = pk
+        self.fields = fields
+
+    def __getattr__(self, name):
+        try:
+            return self.fields[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    @property
+    def id(self):
+        return self.pk
+
+    def __eq__(self, other):
+        if isinstance(other, (Related, Model)):
+            other_model = other.model if isinstance(other, Related) else type(other)
+            return self.model._meta.concrete_model is other_model._meta.concrete_model and self.pk == other.pk
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.pk)
+
+
+def field(index):
+    return property(lambda record: record.row[index])
+
+
+class PersonRecord:
+    """
+    Личность в списке: поля PersonQuerySet.LIST_FIELDS поверх кортежа из кэша, без модели.
+    Категория, автор и даты собираются при обращении; сравнивается с Person по pk
+    """
+    __slots__ = ('row', )
+    _meta = m.Person._meta
+
+    # порядок значений в кортеже PeopleCodec
+    pk = field(0)
+    title = field(1)
+    slug = field(2)
+    excerpt_html = field(3)
+    gender = field(6)
+
+    def __init__(self, row):
+        object.__setattr__(self, 'row', row)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} только для чтения')
+
+    id = field(0)
+
+    @property
+    def photo(self):
+        field = self._meta.get_field('photo')
+        return field.attr_class(None, field, self.row[4] or None)
+
+    @property
+    def thumbnails(self):
+        return self.row[5] or {}
+
+    @property
+    def time_create(self):
+        return from_micros(self.row[7])
+
+    @property
+    def time_update(self):
+        return from_micros(self.row[8])
+
+    @property
+    def cat(self):
+        return Related(m.Category, self.row[9], name=self.row[10], slug=self.row[11])
+
+    @property
+    def author(self):
+        author_id, username = self.row[12:14]
+        return Related(get_user_model(), author_id, username=username) if author_id is not None else None
+
+    @property
+    def tag(self):
+        # теги в кэш не входят; редкому читателю - запрос через менеджер
+        return m.Person(pk=self.pk).tag
+
+    def get_gender_display(self):
+        return m.Person.Gender(self.gender).label
+
+    get_absolute_url = m.Person.get_absolute_url
+    photo_thumbnails = m.Person.photo_thumbnails
+    photo_url = m.Person.photo_url
+    photo_srcset = m.Person.photo_srcset
+
+    def __eq__(self, other):
+        if isinstance(other, (PersonRecord, Model)):
+            return other._meta.concrete_model is m.Person and self.pk == other.pk
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def __str__(self):
+        return self.title
+
+    def __repr__(self):
+        return f'<{type(self).__name__}: {self.pk} {self.title}>'
+
+
+class Codec(ABC):
+    """Упаковка среза для кэша и обратно; name входит в ключ"""
+    name = None
+
+    @abstractmethod
+    def pack(self, rows):
+        ...
+
+    @abstractmethod
+    def unpack(self, packed):
+        ...
+
+
+class ObjectsCodec(Codec):
+    """Срез как есть, обычным pickle кэша"""
+    name = 'o'
+
+    def pack(self, rows):
+        return rows
+
+    def unpack(self, packed):
+        return packed
+
+
+class PeopleCodec(Codec):
+    """Личности из PersonQuerySet.for_list() <-> PersonRecord"""
+    name = 'p1'
+
+    def pack(self, people):
+        return dump([(p.pk, p.title, p.slug, p.excerpt_html, p.photo.name or '', p.thumbnails or None, p.gender,
+                      to_micros(p.time_create), to_micros(p.time_update), p.cat_id, p.cat.name, p.cat.slug,
+                      p.author_id, p.author.username if p.author_id else None)
+                     for p in people])
+
+    def unpack(self, packed):
+        return list(map(PersonRecord, load(packed)))
+
+
+class DictsCodec(Codec):
+    """Данные сериализатора (many=True) <-> список словарей с тем же порядком ключей"""
+    name = 'd1'
+
+    def pack(self, rows):
+        keys = tuple(rows[0]) if rows else ()
+        if all(tuple(row) == keys for row in rows):
+            return dump((keys, [tuple(row.values()) for row in rows]))
+        # разные наборы ключей - словари как есть
+        return dump((None, [dict(row) for row in rows]))
+
+    def unpack(self, packed):
+        keys, rows = load(packed)
+        if keys is None:
+            return rows
+        return [dict(zip(keys, values)) for values in rows]
+
+
+OBJECTS = ObjectsCodec()
+PEOPLE = PeopleCodec()
+DICTS = DictsCodec()
@@ -0,0 +1,42 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# JSON через orjson (requirements.txt); без него - через JSONEncoder DRF. Вывод совпадает
+# с json.dumps(ensure_ascii=False, separators=(',', ':')) для строк, чисел без дробной части, словарей и списков;
+# даты передаются в JSONEncoder DRF. Дробные числа orjson форматирует иначе (1e+16 против 1e16), поэтому рендерер
+# ставится только на ответы без них
+
+if orjson is not None:
+    OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+_encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def dumps(data):
+    """Компактный JSON в байтах, без экранирования U+2028/U+2029 (как JSONEncoder DRF)"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, default=_encoder.default, option=OPTIONS)
+        except TypeError:
+            pass
+    return _encoder.encode(data).encode()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer с orjson для ответов без отступов; тело совпадает с JSONRenderer байт в байт"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_encoder.default, option=OPTIONS)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
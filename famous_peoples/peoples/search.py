@@ -0,0 +1,87 @@
+import hashlib
+import math
+import re
+from collections import defaultdict
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import Case, F, When
+from django.utils.html import strip_tags
+
+import peoples.models as m
+from peoples import utils
+from peoples.stemmer import stem
+
+
+# Полнотекстовый поиск по заголовку и описанию личностей.
+# PostgreSQL: колонка Person.search_vector, которую заполняет триггер (миграция 0006), и GIN-индекс по ней.
+# Остальные СУБД (SQLite в тестах): обратный индекс в памяти процесса с тем же русским стеммером и весами
+
+SEARCH_CONFIG = 'russian'
+# веса SearchRank по умолчанию для меток A (заголовок) и B (описание)
+TITLE_WEIGHT = 1.0
+CONTENT_WEIGHT = 0.4
+WORD = re.compile(r'\w+')
+
+
+def terms(text):
+    return [stem(word) for word in WORD.findall(strip_tags(text or '').lower())]
+
+
+class InvertedIndex:
+    """Словарь "основа слова -> {pk: вес}" по опубликованным личностям"""
+
+    def __init__(self, rows):
+        self.postings = defaultdict(dict)
+        self.size = 0
+        for pk, title, content in rows:
+            self.size += 1
+            for weight, text in ((TITLE_WEIGHT, title), (CONTENT_WEIGHT, content)):
+                for term in terms(text):
+                    posting = self.postings[term]
+                    posting[pk] = posting.get(pk, 0) + weight
+
+    def search(self, query):
+        """pk личностей, в которых есть все слова запроса, по убыванию TF-IDF"""
+        postings = [self.postings.get(term) for term in set(terms(query))]
+        if not postings or not all(postings):
+            return []
+        postings.sort(key=len)
+        scores = {}
+        for pk in postings[0]:
+            if all(pk in posting for posting in postings[1:]):
+                scores[pk] = sum(posting[pk] * math.log(1 + self.size / len(posting)) for posting in postings)
+        return sorted(scores, key=lambda pk: (-scores[pk], -pk))
+
+
+_index = (None, None)
+
+
+def fallback_index():
+    """Индекс перестраивается, когда меняется версия пространства имен поиска"""
+    global _index
+    version, index = _index
+    current = utils.get_cache_version(utils.SEARCH_CACHE_KEY)
+    if index is None or version != current:
+        index = InvertedIndex(m.Person.published.values_list('pk', 'title', 'content').iterator())
+        _index = (current, index)
+    return index
+
+
+def search(queryset, query):
+    """Фильтрует queryset по запросу и сортирует по релевантности"""
+    if connections[queryset.db].vendor == 'postgresql':
+        query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+        return (queryset.filter(search_vector=query)
+                .annotate(rank=SearchRank(F('search_vector'), query))
+                .order_by('-rank', '-time_create', '-id'))
+
+    pks = fallback_index().search(query)
+    if not pks:
+        return queryset.none()
+    return queryset.filter(pk__in=pks).order_by(Case(*(When(pk=pk, then=n) for n, pk in enumerate(pks))))
+
+
+def query_key(query):
+    """Часть ключа кэша для запроса: без лишних пробелов и регистра, фиксированной длины"""
+    return hashlib.md5(' '.join(query.lower().split()).encode()).hexdigest()
@@ -1,16 +1,236 @@
+from itertools import islice
+from operator import attrgetter
+
+from django.db.models import Prefetch, QuerySet
 from rest_framework import serializers
-from .models import Category, Person
+from peoples import metrics
+from .models import Category, Person, TagPost
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    @property
+    def data(self):
+        with metrics.timer('serialize'):
+            return super().data
+
 
+class TimedSerializer(serializers.ModelSerializer):
+    """Время .data попадает в метрику serialize текущего запроса (peoples/metrics.py)"""
 
-class CategorySerializer(serializers.ModelSerializer):
+    @property
+    def data(self):
+        with metrics.timer('serialize'):
+            return super().data
+
+
+class CategorySerializer(TimedSerializer):
     class Meta:
         model = Category
         fields = ['name', 'slug']
+        list_serializer_class = TimedListSerializer
 
 
-class PersonSerializer(serializers.ModelSerializer):
+class PersonSerializer(TimedSerializer):
     author = serializers.HiddenField(default=serializers.CurrentUserDefault())
 
     class Meta:
         model = Person
-        fields = ['title', 'slug', 'content', 'gender', 'cat', 'author']
\ No newline at end of file
+        fields = ['title', 'slug', 'content', 'gender', 'cat', 'author']
+        list_serializer_class = TimedListSerializer
+
+class FieldPlan:
+    """
+    Чтение без полей DRF: колонки для values_list() и порядок ключей, заранее посчитанные по сериализатору.
+    Годится для полей, чье to_representation не меняет значение из БД (строки, выбор, числа, pk связей);
+    результат совпадает с serializer.data. Для других полей и своего to_representation - TypeError
+    """
+    # to_representation этих классов возвращает значение колонки как есть (None сериализатор не трогает)
+    IDENTITY_FIELDS = (serializers.CharField, serializers.SlugField, serializers.ChoiceField, serializers.IntegerField,
+                       serializers.BooleanField, serializers.PrimaryKeyRelatedField)
+
+    def __init__(self, serializer_class):
+        serializer = serializer_class()
+        if type(serializer).to_representation is not serializers.Serializer.to_representation:
+            raise TypeError(f'{serializer_class.__name__}: свой to_representation')
+        opts = serializer.Meta.model._meta
+        self.keys, self.columns = [], []
+        for field in serializer._readable_fields:
+            if type(field) not in self.IDENTITY_FIELDS or len(field.source_attrs) != 1:
+                raise TypeError(f'{serializer_class.__name__}.{field.field_name}: {type(field).__name__}')
+            if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is not None:
+                raise TypeError(f'{serializer_class.__name__}.{field.field_name}: pk_field')
+            self.keys.append(field.field_name)
+            # для связей - колонка с pk (cat_id), объект не нужен
+            self.columns.append(opts.get_field(field.source_attrs[0]).attname)
+        self.getter = attrgetter(*self.columns)
+        if len(self.columns) == 1:
+            getter = self.getter
+            self.getter = lambda obj: (getter(obj), )
+
+    def represent(self, rows):
+        """Словари из кортежей values_list(*columns)"""
+        keys = self.keys
+        with metrics.timer('serialize'):
+            return [dict(zip(keys, row)) for row in rows]
+
+    def data(self, objects):
+        """То же, что serializer_class(objects, many=True).data; queryset читается через values_list"""
+        if isinstance(objects, QuerySet):
+            return self.represent(list(objects.values_list(*self.columns)))
+        getter = self.getter
+        return self.represent([getter(obj) for obj in objects])
+
+    def iterator(self, queryset, chunk_size):
+        keys = self.keys
+        for row in queryset.values_list(*self.columns).iterator(chunk_size=chunk_size):
+            yield dict(zip(keys, row))
+
+
+PERSON_PLAN = FieldPlan(PersonSerializer)
+CATEGORY_PLAN = FieldPlan(CategorySerializer)
+
+
+class PersonFieldset:
+    """
+    ?fields= и ?expand= у /api/person/: подмножество полей PersonSerializer (в порядке сериализатора) и связи,
+    развернутые в объекты. Развернутая связь выводится и без упоминания в fields: cat и companion - через JOIN
+    в том же запросе, теги - одним запросом на страницу. По выборке строятся колонки values_list(),
+    only()/select_related()/prefetch_related() для чтения объектов и часть ключа кэша
+    """
+    # связь: (поле модели, выводимые поля связанного объекта); теги всегда последние - добавляются к готовым строкам
+    EXPANSIONS = {
+        'cat': ('cat', ('id', 'name', 'slug')),
+        'companion': ('companion', ('id', 'title', 'slug')),
+        'tags': ('tag', ('id', 'tag', 'slug')),
+    }
+    # поля, которые читает keyset-пагинация (peoples/utils.py)
+    ORDERING_FIELDS = ('time_create', )
+
+    def __init__(self, fields=None, expand=()):
+        plan = PERSON_PLAN
+        errors = {}
+        if unknown := set(fields or ()) - set(plan.keys):
+            errors['fields'] = f'Неизвестные поля: {", ".join(sorted(unknown))}'
+        if unknown := set(expand) - set(self.EXPANSIONS):
+            errors['expand'] = f'Неизвестные связи: {", ".join(sorted(unknown))}'
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        self.fields = [key for key in plan.keys if fields is None or key in fields]
+        self.expand = [name for name in self.EXPANSIONS if name in expand]
+        self.tags = 'tags' in self.expand
+        # ответ зависит от названий категорий и тегов (utils.API_RELATIONS_CACHE_KEY)
+        self.related = self.tags or 'cat' in self.expand
+        column_of = dict(zip(plan.keys, plan.columns))
+
+        # layout: (ключ, индекс колонки, поля объекта или None); колонки - для values_list, attrs - для объектов
+        self.layout, self.columns, self.attrs = [], [], []
+        self.only, self.select_related = set(self.ORDERING_FIELDS), []
+        keys = self.fields + [name for name in self.expand if name not in self.fields and name != 'tags']
+        for key in keys:
+            if key not in self.expand:
+                self.layout.append((key, len(self.columns), None))
+                self.columns.append(column_of[key])
+                self.attrs.append(column_of[key])
+                self.only.add(column_of[key])
+                continue
+            relation, related_fields = self.EXPANSIONS[key]
+            self.layout.append((key, len(self.columns), related_fields))
+            self.columns.extend(f'{relation}__{name}' for name in related_fields)
+            self.attrs.extend((relation, name) for name in related_fields)
+            self.only.update(f'{relation}__{name}' for name in related_fields)
+            self.select_related.append(relation)
+        if self.tags:
+            # pk нужен, чтобы приложить теги к строке
+            self.pk_index = len(self.columns)
+            self.columns.append('pk')
+            self.attrs.append('pk')
+        self.keys = [key for key, _, _ in self.layout]
+        self.flat = not self.tags and all(nested is None for _, _, nested in self.layout)
+
+    @classmethod
+    def from_query(cls, params):
+        """Выборка из параметров запроса; пустой fields - все поля"""
+        def names(param):
+            return [name for name in (part.strip() for part in params.get(param, '').split(',')) if name]
+
+        return cls(names('fields') or None, names('expand'))
+
+    @property
+    def key_parts(self):
+        """Часть ключа кэша; для полного набора полей без связей пусто - ключи совпадают с обычными"""
+        parts = []
+        if self.fields != PERSON_PLAN.keys:
+            parts += ['f', '.'.join(self.fields)]
+        if self.expand:
+            parts += ['x', '.'.join(self.expand)]
+        return tuple(parts)
+
+    def prepare(self, queryset):
+        """queryset для чтения объектов: только нужные колонки, связи - JOIN и prefetch"""
+        queryset = queryset.only(*self.only)
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.tags:
+            tags = TagPost.objects.only(*self.EXPANSIONS['tags'][1]).order_by('pk')
+            queryset = queryset.prefetch_related(Prefetch('tag', queryset=tags))
+        return queryset
+
+    def values(self, queryset):
+        # values_list() сам отбрасывает only() и select_related(), а prefetch для кортежей не работает
+        return queryset.prefetch_related(None).values_list(*self.columns)
+
+    def load_tags(self, pks):
+        """{pk личности: [теги]} одним запросом к промежуточной таблице"""
+        names = self.EXPANSIONS['tags'][1]
+        tags = {pk: [] for pk in pks}
+        rows = (Person.tag.through.objects.filter(person_id__in=pks).order_by('person_id', 'tagpost_id')
+                .values_list('person_id', *(f'tagpost__{name}' for name in names)))
+        for person_id, *values in rows:
+            tags[person_id].append(dict(zip(names, values)))
+        return tags
+
+    def build(self, rows, tags=None):
+        if self.flat:
+            keys = self.keys
+            return [dict(zip(keys, row)) for row in rows]
+        data = []
+        for row in rows:
+            item = {}
+            for key, index, nested in self.layout:
+                if nested is None:
+                    item[key] = row[index]
+                else:
+                    # у связи без объекта (companion) все колонки пустые
+                    item[key] = dict(zip(nested, row[index:index + len(nested)])) if row[index] is not None else None
+            if tags is not None:
+                item['tags'] = tags[row[self.pk_index]]
+            data.append(item)
+        return data
+
+    def row(self, obj):
+        values = []
+        for attr in self.attrs:
+            if isinstance(attr, tuple):
+                related = getattr(obj, attr[0])
+                values.append(None if related is None else getattr(related, attr[1]))
+            else:
+                values.append(getattr(obj, attr))
+        return values
+
+    def data(self, objects):
+        """Как FieldPlan.data: queryset читается через values_list, объекты (после prepare()) - по атрибутам"""
+        if isinstance(objects, QuerySet):
+            rows = list(self.values(objects))
+            tags = self.load_tags([row[self.pk_index] for row in rows]) if self.tags else None
+        else:
+            rows = [self.row(obj) for obj in objects]
+            tags = {obj.pk: [{name: getattr(tag, name) for name in self.EXPANSIONS['tags'][1]}
+                             for tag in obj.tag.all()] for obj in objects} if self.tags else None
+        with metrics.timer('serialize'):
+            return self.build(rows, tags)
+
+    def iterator(self, queryset, chunk_size):
+        rows = self.values(queryset).iterator(chunk_size=chunk_size)
+        while chunk := list(islice(rows, chunk_size)):
+            yield from self.build(chunk, self.load_tags([row[self.pk_index] for row in chunk]) if self.tags else None)
@@ -0,0 +1,7 @@
+from django.dispatch import Signal
+
+
+# QuerySet.update() не вызывает pre_save/post_save, поэтому PersonQuerySet отправляет свои сигналы.
+# Аргументы: sender - модель, pks - список pk затронутых записей, fields - имена изменяемых полей
+pre_queryset_update = Signal()
+post_queryset_update = Signal()
@@ -0,0 +1,97 @@
+import re
+
+
+# Стеммер Портера для русского языка (алгоритм Snowball, как словарь russian_stem в PostgreSQL).
+# Нужен запасному поисковому индексу (peoples/search.py), чтобы "поэта", "поэтом" и "поэты" находились по "поэт"
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = (('в', 'вши', 'вшись'), ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'))
+REFLEXIVE = ((), ('ся', 'сь'))
+ADJECTIVE = ((), ('ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом', 'его', 'ого',
+                  'ему', 'ому', 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею'))
+PARTICIPLE = (('ем', 'нн', 'вш', 'ющ', 'щ'), ('ивш', 'ывш', 'ующ'))
+VERB = (('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет', 'ют', 'ны', 'ть', 'ешь', 'нно'),
+        ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило',
+         'ыло', 'ено', 'ят', 'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'))
+NOUN = ((), ('а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и', 'ией', 'ей', 'ой', 'ий', 'й',
+             'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья',
+             'я'))
+DERIVATIONAL = ('ость', 'ост')
+SUPERLATIVE = ('ейше', 'ейш')
+
+CYRILLIC = re.compile('[а-я]+')
+
+
+def _after_vowel_consonant(word, start=0):
+    """Начало области после первой пары "гласная, согласная" (R1/R2 в терминах Snowball)"""
+    for i in range(start + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _remove(rv, group):
+    """
+    Отрезает самое длинное окончание из группы. Окончания первой половины группы должны идти после "а" или "я".
+    Возвращает None, если подходящего окончания нет
+    """
+    preceded, plain = group
+    for suffix in sorted(preceded + plain, key=len, reverse=True):
+        if rv.endswith(suffix):
+            stem = rv[:-len(suffix)]
+            if suffix in plain:
+                return stem
+            return stem if stem.endswith(('а', 'я')) else None
+    return None
+
+
+def _remove_adjectival(rv):
+    stem = _remove(rv, ADJECTIVE)
+    if stem is None:
+        return None
+    participle = _remove(stem, PARTICIPLE)
+    return stem if participle is None else participle
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    if not CYRILLIC.fullmatch(word):
+        return word
+
+    rv_start = next((i + 1 for i, char in enumerate(word) if char in VOWELS), len(word))
+    prefix, rv = word[:rv_start], word[rv_start:]
+    # R2 в координатах RV
+    r2 = _after_vowel_consonant(word, _after_vowel_consonant(word)) - rv_start
+
+    # шаг 1
+    result = _remove(rv, PERFECTIVE_GERUND)
+    if result is None:
+        reflexive = _remove(rv, REFLEXIVE)
+        rv = rv if reflexive is None else reflexive
+        for remove in (_remove_adjectival, lambda s: _remove(s, VERB), lambda s: _remove(s, NOUN)):
+            if (result := remove(rv)) is not None:
+                break
+    rv = rv if result is None else result
+
+    # шаг 2
+    if rv.endswith('и'):
+        rv = rv[:-1]
+
+    # шаг 3
+    for suffix in DERIVATIONAL:
+        if rv.endswith(suffix) and len(rv) - len(suffix) >= r2:
+            rv = rv[:-len(suffix)]
+            break
+
+    # шаг 4
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    elif superlative := next((s for s in SUPERLATIVE if rv.endswith(s)), None):
+        rv = rv[:-len(superlative)]
+        if rv.endswith('нн'):
+            rv = rv[:-1]
+    elif rv.endswith('ь'):
+        rv = rv[:-1]
+
+    return prefix + rv
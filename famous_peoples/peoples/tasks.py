@@ -0,0 +1,20 @@
+from celery import shared_task
+from django.core.files.storage import default_storage
+
+import peoples.models as m
+from peoples import thumbnails
+
+
+@shared_task(ignore_result=True)
+def generate_thumbnails(pk):
+    """Строит копии текущего фото личности и записывает их пути; копии прежнего фото удаляются"""
+    row = m.Person.objects.filter(pk=pk).values_list('photo', 'thumbnails').first()
+    if row is None:
+        return
+    photo, old = row
+    data = thumbnails.safe_generate(photo) if photo else {}
+    # пока строились копии, фото могли заменить - тогда результат устарел, его запишет следующая задача
+    if not m.Person.objects.filter(pk=pk, photo=photo).update(thumbnails=data):
+        return
+    for name in set((old or {}).get('sizes', {}).values()) - set(data.get('sizes', {}).values()):
+        default_storage.delete(name)
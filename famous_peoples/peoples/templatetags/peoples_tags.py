@@ -1,19 +1,78 @@
 from django import template
-from django.db.models import Count
+from django.template.loader import render_to_string
+from django.utils.http import urlencode
+from django.utils.safestring import mark_safe
+from peoples import page_cache, utils
 from peoples.models import Category, TagPost
 
 
 register = template.Library()
 
-
-@register.inclusion_tag('peoples/list_categories.html')
+# Сайдбар выводится на каждой странице, поэтому и список, и готовый HTML лежат в кэше. Списки берутся
+# по денормализованным счетчикам posts_count (peoples/counters.py). Версии
+# пространств имен поднимает peoples/invalidation.py, только когда меняются категория, теги или статус постов.
+# Асинхронные представления (peoples/async_views.py) готовят HTML заранее через asidebar() и передают его
+# в контекст (base.html выводит его вместо тегов), потому что шаблон рендерится синхронно и ходить из него в БД нельзя
+@register.simple_tag
 def show_categories(cat_selected_id=0):
-    cats = Category.objects.annotate(total=Count('posts')).filter(total__gt=0)
-    return {'cats': cats, 'cat_selected': cat_selected_id}
+    cat_selected_id = cat_selected_id or 0
+    key = utils.versioned_key(utils.SIDEBAR_CATEGORIES_CACHE_KEY)
+
+    def render():
+        cats = utils.cached(f'{key}:data', lambda: list(Category.objects.filter(posts_count__gt=0)))
+        return render_to_string('peoples/list_categories.html', {'cats': cats, 'cat_selected': cat_selected_id})
 
+    return mark_safe(utils.cached(f'{key}:html:{cat_selected_id}', render))
 
-@register.inclusion_tag('peoples/list_tags.html')
+
+@register.simple_tag
 def show_all_tags():
-    return {'tags': TagPost.objects.annotate(total=Count('tags')).filter(total__gt=0)}
+    key = utils.versioned_key(utils.SIDEBAR_TAGS_CACHE_KEY)
+
+    def render():
+        tags = TagPost.objects.filter(posts_count__gt=0)
+        return render_to_string('peoples/list_tags.html', {'tags': list(tags)})
+
+    return mark_safe(utils.cached(f'{key}:html', render))
+
+
+@register.simple_tag(takes_context=True)
+def page_query(context, **params):
+    """
+    Строка запроса ссылки пагинации: params поверх параметров текущей страницы, кроме page и cursor. Переносятся
+    только параметры из ключа страницы в кэше (page_cache.QUERY_PARAMS): с прочими страница общая, и ссылки в ней тоже
+    """
+    request = context['request']
+    match = request.resolver_match
+    kept = page_cache.QUERY_PARAMS.get(match.url_name if match else None, ())
+    query = {name: request.GET[name] for name in kept if name in request.GET and name not in ('page', 'cursor')}
+    return urlencode({**query, **params})
+
+
+@register.filter
+def photo_url(person, width):
+    """{{ p|photo_url:160 }} - копия фото под ширину width (Person.photo_url)"""
+    return person.photo_url(int(width))
+
+
+async def asidebar(cat_selected_id=0):
+    """Контекст сайдбара для асинхронных представлений: те же ключи кэша, что у show_categories и show_all_tags"""
+    cat_selected_id = cat_selected_id or 0
+    categories_key = await utils.aversioned_key(utils.SIDEBAR_CATEGORIES_CACHE_KEY)
+    tags_key = await utils.aversioned_key(utils.SIDEBAR_TAGS_CACHE_KEY)
+
+    async def categories():
+        async def data():
+            return [cat async for cat in Category.objects.filter(posts_count__gt=0)]
+
+        cats = await utils.acached(f'{categories_key}:data', data)
+        return render_to_string('peoples/list_categories.html', {'cats': cats, 'cat_selected': cat_selected_id})
 
+    async def tags():
+        tags = [tag async for tag in TagPost.objects.filter(posts_count__gt=0)]
+        return render_to_string('peoples/list_tags.html', {'tags': tags})
 
+    return {
+        'sidebar_categories': mark_safe(await utils.acached(f'{categories_key}:html:{cat_selected_id}', categories)),
+        'sidebar_tags': mark_safe(await utils.acached(f'{tags_key}:html', tags)),
+    }
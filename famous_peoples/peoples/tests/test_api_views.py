@@ -1,3 +1,5 @@
+import json
+
 import pytest
 from django.contrib.auth import get_user_model
 from django.urls import reverse
@@ -5,9 +7,12 @@ from rest_framework import status
 from rest_framework.status import HTTP_403_FORBIDDEN, HTTP_201_CREATED
 from rest_framework.test import APIClient
 from peoples.models import Person, Category
+from rest_framework.utils.encoders import JSONEncoder
+from peoples.pagination import KeysetPagination
+from peoples.serializers import PersonSerializer
 from django.core.cache import cache
 from .test_models import user
-from .test_views import category, published_person
+from .test_views import category, tag, published_person
 
 
 @pytest.fixture
@@ -76,8 +81,8 @@ def test_person_list(api_client, published_person):
     response = api_client.get(reverse('person-list'))
     assert Person.objects.count() == 1
     assert response.status_code == status.HTTP_200_OK
-    assert len(response.data) >= 1
-    assert any(p['title'] == 'Уильям Мортон' for p in response.data)
+    assert response.data['count'] == 1
+    assert any(p['title'] == 'Уильям Мортон' for p in response.data['results'])
 
 
 @pytest.mark.django_db
@@ -154,6 +159,28 @@ def test_person_read(api_client, published_person):
     assert response.data['title'] == published_person.title
 
 
+@pytest.mark.django_db
+def test_person_read_non_canonical_pk(api_client, published_person, django_capture_on_commit_callbacks):
+    """Другое написание pk читает ту же запись кэша, и изменение личности ее сбрасывает"""
+    cache.clear()
+    url = f"{reverse('person-list')}0{published_person.pk}/"
+    assert api_client.get(url).data['title'] == published_person.title
+    with django_capture_on_commit_callbacks(execute=True):
+        published_person.title = 'Новый заголовок'
+        published_person.save()
+    assert api_client.get(url).data['title'] == 'Новый заголовок'
+    assert api_client.get(f"{reverse('person-list')}abc/").status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('pk', ['+{pk}', '%20{pk}', '{pk}_0'])
+def test_person_read_non_digit_pk(api_client, published_person, pk):
+    """pk с знаком, пробелом или подчеркиванием не принимается, хотя int() его разобрал бы"""
+    cache.clear()
+    url = f"{reverse('person-list')}{pk.format(pk=published_person.pk)}/"
+    assert api_client.get(url).status_code == status.HTTP_404_NOT_FOUND
+
+
 @pytest.mark.django_db
 def test_person_update_unauth(api_client, published_person):
     """PUT неавторизованный пользователь не может полностью обновить личность"""
@@ -229,4 +256,127 @@ def test_person_category_update_auth(api_client_as_user, published_person, categ
     published_person.refresh_from_db()
     assert response.status_code == status.HTTP_200_OK
     assert response.data['name'] == 'Комики'
-    assert response.data['slug'] == 'komiki'
\ No newline at end of file
+    assert response.data['slug'] == 'komiki'
+
+@pytest.mark.django_db
+def test_person_list_cursor(api_client, published_person, monkeypatch):
+    """GET список личностей по курсору"""
+    cache.clear()
+    monkeypatch.setattr(KeysetPagination, 'page_size', 1)
+    Person.objects.create(title='Вторая', slug='second', gender=Person.Gender.FEMALE, cat=published_person.cat)
+
+    response = api_client.get(reverse('person-list'), {'cursor': ''})
+    assert response.status_code == status.HTTP_200_OK
+    assert [p['slug'] for p in response.data['results']] == ['second']
+    assert response.data['previous'] is None
+
+    response = api_client.get(response.data['next'])
+    assert [p['slug'] for p in response.data['results']] == [published_person.slug]
+    assert response.data['next'] is None
+
+
+@pytest.mark.django_db
+def test_person_list_pages(api_client, published_person):
+    """GET список личностей по номеру страницы"""
+    cache.clear()
+    Person.objects.create(title='Вторая', slug='second', gender=Person.Gender.FEMALE, cat=published_person.cat)
+
+    response = api_client.get(reverse('person-list'), {'page_size': 1, 'page': 2})
+    assert response.data['count'] == 2
+    assert [p['slug'] for p in response.data['results']] == [published_person.slug]
+    assert response.data['next'] is None
+
+    response = api_client.get(reverse('person-list'), {'page': 3, 'page_size': 1})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_person_export(api_client, published_person):
+    """Потоковая выгрузка в NDJSON и JSON-массив"""
+    Person.objects.create(title='Вторая', slug='second', gender=Person.Gender.FEMALE, cat=published_person.cat)
+
+    response = api_client.get(reverse('person-export'))
+    assert response['Content-Type'] == 'application/x-ndjson'
+    lines = b''.join(response.streaming_content).decode().splitlines()
+    assert [json.loads(line)['slug'] for line in lines] == ['second', published_person.slug]
+
+    response = api_client.get(reverse('person-export'), {'style': 'json'})
+    body = b''.join(response.streaming_content)
+    data = json.loads(body)
+    assert [p['slug'] for p in data] == ['second', published_person.slug]
+    assert data[1]['cat'] == published_person.cat.id
+    # тело совпадает с выгрузкой через PersonSerializer и JSONEncoder DRF
+    encode = JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    assert body.decode() == encode(PersonSerializer(Person.objects.all(), many=True).data)
+
+
+@pytest.fixture
+def partners(published_person, tag):
+    partner = Person.objects.create(title='Вторая', slug='second', gender=Person.Gender.FEMALE,
+                                    cat=published_person.cat)
+    Person.objects.link_companions({published_person.pk: partner.pk})
+    published_person.tag.add(tag)
+    return published_person, partner
+
+
+@pytest.mark.django_db
+def test_person_sparse_fields(api_client, partners, django_assert_num_queries):
+    """?fields= оставляет только перечисленные поля в порядке сериализатора, отдельно в кэше"""
+    cache.clear()
+    response = api_client.get(reverse('person-list'), {'fields': 'slug,title'})
+    assert response.data['results'] == [{'title': 'Вторая', 'slug': 'second'},
+                                        {'title': partners[0].title, 'slug': partners[0].slug}]
+    with django_assert_num_queries(0):
+        assert api_client.get(reverse('person-list'), {'fields': 'slug,title'}).data == response.data
+    assert list(api_client.get(reverse('person-list')).data['results'][0]) == ['title', 'slug', 'content', 'gender',
+                                                                               'cat']
+
+    response = api_client.get(reverse('person-detail', kwargs={'pk': partners[0].pk}), {'fields': 'gender'})
+    assert response.data == {'gender': 'M'}
+    response = api_client.get(reverse('person-list'), {'cursor': '', 'fields': 'slug'})
+    assert response.data['results'] == [{'slug': 'second'}, {'slug': partners[0].slug}]
+
+
+@pytest.mark.django_db
+def test_person_expand(api_client, partners, tag, django_assert_num_queries):
+    """?expand= разворачивает связи: категория и партнер - в том же запросе, теги - одним запросом"""
+    cache.clear()
+    person, partner = partners
+    cat = {'id': person.cat.id, 'name': person.cat.name, 'slug': person.cat.slug}
+    expected = [
+        {'slug': 'second', 'cat': cat, 'companion': {'id': person.pk, 'title': person.title, 'slug': person.slug},
+         'tags': []},
+        {'slug': person.slug, 'cat': cat, 'companion': {'id': partner.pk, 'title': 'Вторая', 'slug': 'second'},
+         'tags': [{'id': tag.pk, 'tag': tag.tag, 'slug': tag.slug}]},
+    ]
+    params = {'fields': 'slug', 'expand': 'tags,companion,cat'}
+    # количество, страница, теги
+    with django_assert_num_queries(3):
+        assert api_client.get(reverse('person-list'), params).data['results'] == expected
+    # по курсору количество не считается; страница - объекты через select_related и prefetch_related
+    with django_assert_num_queries(2):
+        assert api_client.get(reverse('person-list'), {**params, 'cursor': ''}).data['results'] == expected
+    with django_assert_num_queries(2):
+        response = api_client.get(reverse('person-detail', kwargs={'pk': person.pk}), params)
+    assert response.data == expected[1]
+
+    Person.objects.link_companions({person.pk: None})
+    response = api_client.get(reverse('person-detail', kwargs={'pk': person.pk}), {'expand': 'companion'})
+    assert response.data['companion'] is None and response.data['cat'] == person.cat.id
+
+
+@pytest.mark.django_db
+def test_person_fields_validation(api_client, published_person):
+    response = api_client.get(reverse('person-list'), {'fields': 'title,author,photo', 'expand': 'author'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.data == {'fields': 'Неизвестные поля: author, photo', 'expand': 'Неизвестные связи: author'}
+    response = api_client.get(reverse('person-detail', kwargs={'pk': published_person.pk}), {'expand': 'x'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_person_export_fields(api_client, partners, tag):
+    response = api_client.get(reverse('person-export'), {'fields': 'slug', 'expand': 'tags'})
+    lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+    assert lines == [{'slug': 'second', 'tags': []},
+                     {'slug': partners[0].slug, 'tags': [{'id': tag.pk, 'tag': tag.tag, 'slug': tag.slug}]}]
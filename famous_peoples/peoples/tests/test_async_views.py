@@ -0,0 +1,105 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import AsyncClient
+from django.urls import reverse
+from peoples import utils
+from .test_models import user
+from .test_views import client, category
+from .test_query_budget import catalogue
+
+
+@pytest.fixture
+def async_get():
+    """Запрос через ASGI-обработчик: peoples.middleware.AsyncUrlconf направляет его в peoples/async_views.py"""
+    async_client = AsyncClient()
+    return lambda url, **kwargs: async_to_sync(async_client.get)(url, **kwargs)
+
+
+PAGES = [
+    ('peoples', {}), ('men', {}), ('women', {}), ('category', {'cat_slug': 'istoriya'}), ('tag', {'tag_slug': 'tag'}),
+    ('post', {'post_slug': 'person-0'}),
+]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('name, kwargs', PAGES)
+def test_async_pages_match_sync(client, async_get, catalogue, name, kwargs):
+    """Асинхронная страница отдает те же данные, что синхронная, и читает их из общего кэша"""
+    url = reverse(name, kwargs=kwargs)
+    cache.clear()
+    response = async_get(url)
+    assert response.status_code == 200
+    assert response.resolver_match.func.view_class.__module__ == 'peoples.async_views'
+
+    cache.clear()
+    expected = client.get(url)
+    for key in ('posts', 'post', 'title'):
+        if key in expected.context:
+            assert response.context[key] == expected.context[key]
+    assert response.context['sidebar_categories'] in expected.content.decode()
+
+
+@pytest.mark.django_db
+def test_async_page_warm_cache(async_get, catalogue, django_assert_num_queries):
+    """С прогретым кэшем асинхронная страница не обращается к БД"""
+    url = reverse('peoples')
+    async_get(url)
+    with django_assert_num_queries(0):
+        assert async_get(url).status_code == 200
+
+
+@pytest.mark.django_db
+def test_async_page_links_into_keyset(client, async_get, catalogue, monkeypatch):
+    """Асинхронный список тоже ведет с KEYSET_FROM_PAGE-й страницы дальше по курсору"""
+    monkeypatch.setattr(utils, 'KEYSET_FROM_PAGE', 1)
+    cache.clear()
+    cursor = async_get(reverse('peoples')).context['page_obj'].next_cursor
+    cache.clear()
+    assert cursor == client.get(reverse('peoples'), {'utm_source': 'a'}).context['page_obj'].next_cursor
+    assert list(async_get(reverse('peoples'), data={'cursor': cursor}).context['posts']) == catalogue[:1]
+
+@pytest.mark.django_db
+def test_async_page_not_found(async_get, catalogue):
+    assert async_get(reverse('post', kwargs={'post_slug': 'missing'})).status_code == 404
+    assert async_get(reverse('category', kwargs={'cat_slug': 'missing'})).status_code == 404
+    assert async_get(reverse('peoples'), data={'page': 100}).status_code == 404
+    assert async_get(reverse('peoples'), data={'cursor': 'broken'}).status_code == 404
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('name, kwargs, data', [
+    ('person-list', {}, {}),
+    ('person-list', {}, {'page': 2, 'page_size': 4}),
+    ('person-list', {}, {'cursor': ''}),
+    ('person-detail', {'pk': 'first'}, {}),
+    ('person-detail', {'pk': 0}, {}),
+    ('person-list', {}, {'fields': 'title,cat', 'expand': 'cat,tags,companion'}),
+    ('person-list', {}, {'cursor': '', 'fields': 'slug', 'expand': 'tags'}),
+    ('person-list', {}, {'fields': 'author'}),
+    ('person-list', {}, {'gender': 'M', 'cat': 'istoriya', 'tag': 'tag', 'ordering': 'title'}),
+    ('person-list', {}, {'cursor': '', 'has_companion': 'false', 'published': '0'}),
+    ('person-list', {}, {'cursor': '', 'ordering': 'title'}),
+    ('person-detail', {'pk': 'first'}, {'fields': 'slug', 'expand': 'companion'}),
+    ('person-detail', {'pk': 'first'}, {'expand': 'author'}),
+    ('person-autocomplete', {}, {'q': 'личность'}),
+])
+def test_async_api_matches_sync(client, async_get, catalogue, name, kwargs, data):
+    """JSON асинхронного API и автодополнения совпадает с синхронным байт в байт"""
+    if kwargs.get('pk') == 'first':
+        kwargs = {'pk': catalogue[0].pk}
+    url = reverse(name, kwargs=kwargs)
+    cache.clear()
+    response = async_get(url, data=data)
+    cache.clear()
+    expected = client.get(url, data=data)
+    assert response.status_code == expected.status_code
+    assert response.content == expected.content
+
+
+@pytest.mark.django_db
+def test_async_api_browsable_falls_back_to_drf(async_get, catalogue):
+    """Браузерный API по-прежнему отдает DRF"""
+    response = async_get(reverse('person-list'), headers={'accept': 'text/html'})
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith('text/html')
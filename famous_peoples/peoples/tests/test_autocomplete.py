@@ -0,0 +1,61 @@
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from peoples import autocomplete
+from peoples.models import Person
+from .test_models import user
+from .test_views import client, category
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.fixture
+def persons(category, user):
+    def create(title, gender=Person.Gender.MALE, **kwargs):
+        return Person.objects.create(title=title, slug=f'person-{Person.objects.count()}', gender=gender,
+                                     cat=category, author=user, **kwargs)
+
+    return {
+        'pushkin': create('Александр Пушкин'),
+        'pushkina': create('Пушкина Наталья', gender=Person.Gender.FEMALE),
+        'paired': create('Пушкин-партнер', companion=create('Партнерша', gender=Person.Gender.FEMALE)),
+        'draft': create('Пушкарь', is_published=Person.Status.DRAFT),
+    }
+
+
+def titles(query):
+    return [row['title'] for row in autocomplete.suggest(query)]
+
+
+@pytest.mark.django_db
+def test_suggest_prefix_then_substring(persons):
+    """Сначала совпадения по началу названия, затем по подстроке; личности с партнером не предлагаются"""
+    assert titles('пуш') == ['Пушкарь', 'Пушкина Наталья', 'Александр Пушкин']
+    assert titles('  ПУШКИН ') == ['Пушкина Наталья', 'Александр Пушкин']
+    # короткий запрос ищется только по началу названия
+    assert titles('ал') == ['Александр Пушкин']
+    assert set(autocomplete.suggest('ал')[0]) == {'id', 'title', 'gender'}
+
+
+@pytest.mark.django_db
+def test_suggest_is_cached_and_invalidated(persons, django_assert_num_queries, django_capture_on_commit_callbacks):
+    """Повторный запрос не ходит в БД, а изменение личности обновляет подсказки"""
+    titles('пуш')
+    with django_assert_num_queries(0):
+        titles('пуш')
+
+    with django_capture_on_commit_callbacks(execute=True):
+        persons['pushkina'].companion = persons['draft']
+        persons['pushkina'].save()
+    assert titles('пуш') == ['Александр Пушкин']
+
+
+@pytest.mark.django_db
+def test_autocomplete_view(client, persons):
+    """Виджет получает id и подпись "Название (пол)" """
+    response = client.get(reverse('person-autocomplete'), {'q': 'наталья'})
+    assert response.json()['results'] == [{'id': str(persons['pushkina'].pk), 'text': 'Пушкина Наталья (Женщина)',
+                                           'selected_text': 'Пушкина Наталья (Женщина)'}]
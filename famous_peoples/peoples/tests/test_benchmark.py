@@ -0,0 +1,66 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from peoples import benchmark
+from peoples.models import Category, Person, TagPost
+
+
+@pytest.fixture
+def seeded(django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        benchmark.seed(40, categories=3, tags=5)
+
+
+@pytest.mark.django_db
+def test_seed_is_reproducible(seeded, django_capture_on_commit_callbacks):
+    """Повторное заполнение догружает только недостающие записи, набор не меняется"""
+    titles = list(Person.objects.order_by('slug').values_list('slug', 'title', 'cat__slug'))
+    assert len(titles) == 40
+    assert Category.objects.count() == 3 and TagPost.objects.count() == 5
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert benchmark.seed(40, categories=3, tags=5)['created'] == 0
+        assert benchmark.seed(50, categories=3, tags=5)['created'] == 10
+    assert list(Person.objects.filter(slug__in=[slug for slug, *_ in titles]).order_by('slug')
+                .values_list('slug', 'title', 'cat__slug')) == titles
+
+
+@pytest.mark.django_db
+def test_suite_covers_routes(seeded):
+    """Каждый маршрут замеряется во всех сценариях и отвечает без ошибок"""
+    names = [name for name, _, _ in benchmark.routes()[0]]
+    with benchmark.environment():
+        results = benchmark.run_suite(requests=2)
+
+    assert list(results) == list(benchmark.SCENARIOS)
+    for scenario in results.values():
+        assert list(scenario) == names
+        for result in scenario.values():
+            assert result['requests'] == 2 and result['errors'] == 0
+            assert result['p50'] <= result['p95'] <= result['p99']
+
+
+@pytest.mark.django_db
+def test_benchmark_command(seeded, tmp_path):
+    """Команда пишет JSON с окружением прогона и сравнивает p95 с предыдущим файлом"""
+    output = tmp_path / 'bench.json'
+    # тестовая база уже временная; кэш по умолчанию - LocMemCache
+    call_command('benchmark', requests=2, scenarios=['warm'], routes=['post', 'person-list'], configured_database=True,
+                 output=str(output), stdout=StringIO())
+    report = json.loads(output.read_text(encoding='utf-8'))
+    assert report['meta']['people'] == 40
+    assert report['meta']['cache'].endswith('LocMemCache')
+    assert list(report['results']['warm']) == ['post', 'person-list']
+
+    rows = benchmark.compare(report, report)
+    assert [(scenario, name, change) for scenario, name, _, _, change in rows] == [
+        ('warm', 'post', 0), ('warm', 'person-list', 0)]
+
+
+@pytest.mark.django_db
+def test_benchmark_serializers_command(seeded):
+    out = StringIO()
+    call_command('benchmark_serializers', rows=20, repeat=1, stdout=out)
+    assert 'тела совпадают' in out.getvalue()
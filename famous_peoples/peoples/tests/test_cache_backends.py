@@ -0,0 +1,120 @@
+import json
+
+import pytest
+from django.core.cache import caches
+from peoples import cache_backends, metrics
+
+
+@pytest.fixture
+def two_tier(settings, monkeypatch):
+    monkeypatch.setattr(cache_backends, '_tiers', {})
+    settings.CACHES = {
+        **settings.CACHES,
+        'two_tier': {
+            'BACKEND': 'peoples.cache_backends.TwoTierCache',
+            'LOCATION': 'remote',
+            'OPTIONS': {'MAX_ENTRIES': 3, 'LOCAL_TIMEOUT': 10, 'LOCAL_KEYS': r'hot:.*(?<!:lock)'},
+        },
+        'remote': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'two-tier-remote'},
+    }
+    cache = caches['two_tier']
+    yield cache
+    cache.clear()
+
+
+def test_hot_key_served_locally(two_tier):
+    two_tier.set('hot:a', [1, 2])
+    assert two_tier.get('hot:a') == [1, 2]
+    # запись мимо двухуровневого кэша не видна, пока не истечет локальная копия: Redis не читается
+    caches['remote'].set('hot:a', 'changed')
+    value = two_tier.get('hot:a')
+    assert value == [1, 2]
+    # копия распаковывается заново, запросы не делят объект
+    value.append(3)
+    assert two_tier.get('hot:a') == [1, 2]
+    assert two_tier.local_stats() == {'hits': 2, 'misses': 1, 'evictions': 0, 'invalidations': 0, 'entries': 1}
+
+
+def test_writes_invalidate_local_copy(two_tier):
+    two_tier.set('hot:counter', 1)
+    assert two_tier.get('hot:counter') == 1
+    two_tier.incr('hot:counter')
+    assert two_tier.get('hot:counter') == 2
+    two_tier.set_many({'hot:counter': 5})
+    assert two_tier.get_many(['hot:counter', 'hot:missing']) == {'hot:counter': 5}
+    two_tier.delete_many(['hot:counter'])
+    assert two_tier.get('hot:counter') is None
+    assert two_tier.add('hot:counter', 7) and two_tier.get('hot:counter') == 7
+    two_tier.delete('hot:counter')
+    assert not two_tier.has_key('hot:counter')
+
+
+def test_other_keys_bypass_local_tier(two_tier):
+    two_tier.set('hot:a:lock', 1)
+    two_tier.set('cold', 1)
+    assert two_tier.get('hot:a:lock') == 1 and two_tier.get('cold') == 1
+    caches['remote'].set('cold', 2)
+    assert two_tier.get('cold') == 2
+    assert two_tier.local_stats()['entries'] == 0
+
+
+def test_lru_and_ttl(two_tier):
+    now = [0]
+    two_tier.tier.clock = lambda: now[0]
+    for name in 'abcd':
+        two_tier.set(f'hot:{name}', name)
+        two_tier.get(f'hot:{name}')
+    two_tier.get('hot:b')
+    two_tier.set('hot:e', 'e')
+    two_tier.get('hot:e')
+    # вытесняются самые давно прочитанные: a, затем c
+    assert list(two_tier.tier.entries) == [two_tier.local_key(key, None) for key in ('hot:d', 'hot:b', 'hot:e')]
+    assert two_tier.local_stats()['evictions'] == 2
+
+    caches['remote'].set('hot:e', 'new')
+    assert two_tier.get('hot:e') == 'e'
+    now[0] = 11
+    assert two_tier.get('hot:e') == 'new'
+
+
+def test_read_during_invalidation_not_stored(two_tier, monkeypatch):
+    """Значение, прочитанное до пришедшей инвалидации, не попадает в локальный уровень"""
+    two_tier.set('hot:a', 'old')
+    remote_get = caches['remote'].get
+
+    def racing_get(*args, **kwargs):
+        value = remote_get(*args, **kwargs)
+        two_tier.tier.handle_message({'data': json.dumps(['other', [two_tier.local_key('hot:a', None)]])})
+        return value
+
+    monkeypatch.setattr(caches['remote'], 'get', racing_get)
+    assert two_tier.get('hot:a') == 'old'
+    assert two_tier.local_stats()['entries'] == 0
+
+
+def test_messages_from_other_processes(two_tier):
+    for key in ('hot:a', 'hot:b'):
+        two_tier.set(key, 1)
+        two_tier.get(key)
+    tier = two_tier.tier
+    tier.handle_message({'data': json.dumps([tier.sender, [two_tier.local_key('hot:a', None)]])})
+    assert two_tier.local_stats()['entries'] == 2
+    tier.handle_message({'data': json.dumps(['other', [two_tier.local_key('hot:a', None)]])})
+    assert two_tier.local_stats()['entries'] == 1
+    tier.handle_message({'data': json.dumps(['other', None])})
+    assert two_tier.local_stats()['entries'] == 0
+
+
+def test_local_stats_in_metrics(two_tier, monkeypatch):
+    monkeypatch.setattr(metrics, 'cache', two_tier)
+    aggregate = metrics.Aggregate()
+    two_tier.set('hot:a', 1)
+    two_tier.get('hot:a')
+    two_tier.get('hot:a')
+    aggregate.flush()
+    two_tier.get('hot:a')
+    aggregate.flush()
+
+    text = metrics.exposition()
+    assert 'peoples_local_cache_events_total{event="hits"} 2' in text
+    assert 'peoples_local_cache_events_total{event="misses"} 1' in text
@@ -0,0 +1,83 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from peoples.models import Category, Person, TagPost
+from .test_models import user
+from .test_views import category
+
+
+def counts(*objs):
+    return [type(obj).objects.get(pk=obj.pk).posts_count for obj in objs]
+
+
+@pytest.fixture
+def tag():
+    return TagPost.objects.create(tag='Тег', slug='tag')
+
+
+@pytest.fixture
+def person(category, user, tag):
+    person = Person.objects.create(title='Личность', slug='person', content='Описание', cat=category, author=user,
+                                   gender=Person.Gender.MALE)
+    person.tag.add(tag)
+    return person
+
+
+@pytest.mark.django_db
+def test_counters_follow_save(person, category, tag):
+    """Создание, смена категории и снятие с публикации меняют счетчики"""
+    assert counts(category, tag) == [1, 1]
+
+    other = Category.objects.create(name='Другая', slug='other')
+    person.cat = other
+    person.save()
+    assert counts(category, other, tag) == [0, 1, 1]
+
+    person.is_published = Person.Status.DRAFT
+    person.save()
+    assert counts(other, tag) == [0, 0]
+
+    person.content = 'Новое описание'
+    person.save()
+    assert counts(other, tag) == [0, 0]
+
+
+@pytest.mark.django_db
+def test_counters_follow_tags(person, tag):
+    """Добавление, удаление и очистка тегов с обеих сторон связи"""
+    other = TagPost.objects.create(tag='Другой', slug='other')
+    person.tag.add(other)
+    assert counts(tag, other) == [1, 1]
+
+    person.tag.remove(other, other)
+    person.tag.remove(other)
+    assert counts(tag, other) == [1, 0]
+
+    other.tags.add(person)
+    tag.tags.clear()
+    assert counts(tag, other) == [0, 1]
+
+    person.tag.clear()
+    assert counts(tag, other) == [0, 0]
+
+
+@pytest.mark.django_db
+def test_counters_follow_queryset_update_and_delete(person, category, tag):
+    """Массовые действия админки и удаление"""
+    Person.objects.filter(pk=person.pk).update(is_published=Person.Status.DRAFT)
+    assert counts(category, tag) == [0, 0]
+    Person.objects.filter(pk=person.pk).update(is_published=Person.Status.PUBLISHED)
+    assert counts(category, tag) == [1, 1]
+
+    person.delete()
+    assert counts(category, tag) == [0, 0]
+
+
+@pytest.mark.django_db
+def test_rebuild_counters(person, category, tag):
+    """Команда пересчитывает разошедшиеся счетчики"""
+    Category.objects.update(posts_count=5)
+    TagPost.objects.update(posts_count=0)
+    call_command('rebuild_counters', stdout=StringIO())
+    assert counts(category, tag) == [1, 1]
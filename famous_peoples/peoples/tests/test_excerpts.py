@@ -0,0 +1,67 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.template import Context, Template
+from django.urls import reverse
+from peoples.excerpts import EXCERPT_WORDS, make_excerpts
+from peoples.models import Person
+from .test_models import user
+from .test_views import client, category
+
+CONTENT = ('Первый абзац с <b>разметкой</b> &amp; сущностями.\n' + 'слово ' * 30 + '\n\nВторой абзац ' + 'текст ' * 30)
+
+
+@pytest.fixture
+def person(category, user):
+    return Person.objects.create(title='Личность', slug='person', content=CONTENT, gender=Person.Gender.MALE,
+                                 cat=category, author=user)
+
+
+@pytest.mark.parametrize('content', [CONTENT, '', 'Короткий текст', 'a\nb\n\nc'])
+def test_excerpt_html_matches_template_filters(content):
+    """Сохраненный HTML совпадает с прежним выводом linebreaks|truncatewords:40 в шаблоне"""
+    template = Template('{% autoescape off %}{{ content|linebreaks|truncatewords:40 }}{% endautoescape %}')
+    assert make_excerpts(content)[1] == template.render(Context({'content': content}))
+
+
+def test_plain_excerpt():
+    text, _ = make_excerpts(CONTENT)
+    assert '<' not in text and '\n' not in text
+    assert text.startswith('Первый абзац с разметкой & сущностями. слово')
+    assert len(text.split()) == EXCERPT_WORDS and text.endswith('…')
+
+
+@pytest.mark.django_db
+def test_excerpt_maintained_on_save(person):
+    person.refresh_from_db()
+    assert (person.excerpt, person.excerpt_html) == make_excerpts(CONTENT)
+
+    person.content = 'Новое описание'
+    person.save(update_fields=['content'])
+    person.refresh_from_db()
+    assert person.excerpt == 'Новое описание'
+    assert person.excerpt_html == '<p>Новое описание</p>'
+
+
+@pytest.mark.django_db
+def test_list_does_not_load_content(client, person):
+    rows = list(Person.published.for_list())
+    assert 'content' in rows[0].get_deferred_fields()
+
+    response = client.get(reverse('peoples'))
+    assert make_excerpts(CONTENT)[1] in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_rebuild_excerpts(person):
+    Person.objects.update(excerpt='', excerpt_html='')
+    out = StringIO()
+    call_command('rebuild_excerpts', batch_size=1, stdout=out)
+    assert 'Обновлено превью: 1 из 1' in out.getvalue()
+    person.refresh_from_db()
+    assert (person.excerpt, person.excerpt_html) == make_excerpts(CONTENT)
+
+    out = StringIO()
+    call_command('rebuild_excerpts', stdout=out)
+    assert 'Обновлено превью: 0 из 1' in out.getvalue()
@@ -0,0 +1,103 @@
+import json
+from datetime import timedelta
+
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from peoples.filters import PersonFilter
+from peoples.models import Category, Person, TagPost
+from .test_api_views import api_client
+from .test_models import user
+from .test_views import category
+
+
+@pytest.fixture
+def people(category, user):
+    other = Category.objects.create(name='Наука', slug='nauka')
+    tag = TagPost.objects.create(tag='Тег', slug='tag')
+    now = timezone.now()
+    people = []
+    for n, (gender, cat, published) in enumerate([('F', category, 1), ('M', category, 1), ('F', other, 1),
+                                                  ('F', category, 0), ('M', other, 0)]):
+        person = Person.objects.create(title=f'Личность {"ДГВБА"[n]}', slug=f'person-{n}', gender=gender, cat=cat,
+                                       is_published=published, author=user)
+        Person.objects.filter(pk=person.pk).update(time_create=now - timedelta(days=n))
+        people.append(person)
+    for person in people[:2] + people[3:4]:
+        person.tag.add(tag)
+    Person.objects.link_companions({people[0].pk: people[1].pk})
+    return people
+
+
+def slugs(response):
+    return [p['slug'] for p in response.data['results']]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params, expected', [
+    ({'gender': 'F', 'published': 'true'}, [0, 2]),
+    ({'gender': 'F', 'cat': 'istoriya', 'tag': 'tag', 'published': '1'}, [0]),
+    ({'published': 'false'}, [3, 4]),
+    ({'cat': 'nauka'}, [2, 4]),
+    ({'has_companion': 'true'}, [0, 1]),
+    ({'has_companion': 'false', 'tag': 'tag'}, [3]),
+    ({'cat': 'missing'}, []),
+])
+def test_filters(api_client, people, params, expected):
+    cache.clear()
+    response = api_client.get(reverse('person-list'), params)
+    assert slugs(response) == [f'person-{n}' for n in expected]
+    assert response.data['count'] == len(expected)
+
+
+@pytest.mark.django_db
+def test_created_range_and_ordering(api_client, people):
+    now = timezone.now()
+    params = {'created_after': (now - timedelta(days=3, hours=1)).isoformat(),
+              'created_before': (now - timedelta(days=1, hours=1)).isoformat()}
+    assert slugs(api_client.get(reverse('person-list'), params)) == ['person-2', 'person-3']
+    day = (now - timedelta(days=3)).date().isoformat()
+    assert 'person-0' not in slugs(api_client.get(reverse('person-list'), {'created_before': day}))
+
+    response = api_client.get(reverse('person-list'), {'ordering': 'title', 'published': 'true'})
+    assert slugs(response) == ['person-2', 'person-1', 'person-0']
+    response = api_client.get(reverse('person-list'), {'ordering': 'time_create', 'page_size': 2, 'page': 2})
+    assert slugs(response) == ['person-2', 'person-1']
+
+
+@pytest.mark.django_db
+def test_filter_combination_cached_once(api_client, people, django_assert_num_queries):
+    """Сочетание фильтров кэшируется отдельно и не зависит от порядка параметров"""
+    cache.clear()
+    first = api_client.get(reverse('person-list') + '?gender=F&cat=istoriya')
+    with django_assert_num_queries(0):
+        assert api_client.get(reverse('person-list') + '?cat=istoriya&gender=F').data == first.data
+    assert api_client.get(reverse('person-list') + '?gender=M&cat=istoriya').data != first.data
+
+    assert PersonFilter({'cat': 'istoriya', 'gender': 'F'}).key_parts == ('gender', 'F', 'cat', 'istoriya')
+    assert PersonFilter({}).key_parts == ()
+
+
+@pytest.mark.django_db
+def test_filter_validation(api_client, people):
+    response = api_client.get(reverse('person-list'), {'gender': 'X', 'published': 'yes', 'cat': 'a b',
+                                                       'created_after': '2026-13-01', 'ordering': 'slug'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert set(response.data) == {'gender', 'published', 'cat', 'created_after', 'ordering'}
+
+    response = api_client.get(reverse('person-list'), {'ordering': 'title', 'cursor': ''})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    response = api_client.get(reverse('person-list'), {'gender': 'F', 'cursor': ''})
+    assert slugs(response) == ['person-0', 'person-2', 'person-3']
+
+
+@pytest.mark.django_db
+def test_export_and_search_filters(api_client, people):
+    response = api_client.get(reverse('person-export'), {'cat': 'nauka', 'ordering': 'title'})
+    lines = b''.join(response.streaming_content).decode().splitlines()
+    assert [json.loads(line)['slug'] for line in lines] == ['person-4', 'person-2']
+
+    response = api_client.get(reverse('person-search'), {'q': 'личность', 'gender': 'M'})
+    assert slugs(response) == ['person-1']
@@ -0,0 +1,150 @@
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from peoples.models import Person
+from peoples import utils
+from .test_models import user
+from .test_views import client, category, tag, published_person, draft_person
+
+
+@pytest.mark.django_db
+def test_save_invalidates_list_and_detail(client, published_person, django_capture_on_commit_callbacks):
+    """Изменение личности сбрасывает списки и страницу личности в кэше"""
+    cache.clear()
+    client.get(reverse('peoples'))
+    client.get(reverse('post', kwargs={'post_slug': published_person.slug}))
+    assert cache.get(utils.versioned_key(utils.ALL_CACHE_KEY, 'count')) is not None
+    assert cache.get(utils.versioned_key(utils.detail_cache_key(published_person.slug))) is not None
+
+    with django_capture_on_commit_callbacks(execute=True):
+        published_person.title = 'Новый заголовок'
+        published_person.save()
+
+    assert cache.get(utils.versioned_key(utils.ALL_CACHE_KEY, 'count')) is None
+    assert cache.get(utils.versioned_key(utils.detail_cache_key(published_person.slug))) is None
+    response = client.get(reverse('peoples'))
+    assert response.context['posts'][0].title == 'Новый заголовок'
+
+
+@pytest.mark.django_db
+def test_slug_change_invalidates_old_detail(published_person, django_capture_on_commit_callbacks):
+    """При смене slug сбрасывается и версия со старым slug"""
+    old_key = utils.detail_cache_key(published_person.slug)
+    cache.set(utils.versioned_key(old_key), published_person)
+    with django_capture_on_commit_callbacks(execute=True):
+        published_person.slug = 'new-slug'
+        published_person.save()
+    assert cache.get(utils.versioned_key(old_key)) is None
+
+
+@pytest.mark.django_db
+def test_draft_change_keeps_public_lists(draft_person, django_capture_on_commit_callbacks):
+    """Изменение черновика не трогает публичные списки, только API"""
+    cache.set(utils.versioned_key(utils.ALL_CACHE_KEY), [])
+    cache.set(utils.versioned_key(utils.API_LIST_CACHE_KEY), [])
+    with django_capture_on_commit_callbacks(execute=True):
+        draft_person.content = 'текст'
+        draft_person.save()
+    assert cache.get(utils.versioned_key(utils.ALL_CACHE_KEY)) == []
+    assert cache.get(utils.versioned_key(utils.API_LIST_CACHE_KEY)) is None
+
+
+@pytest.mark.django_db
+def test_admin_action_invalidates(published_person, django_capture_on_commit_callbacks):
+    """Массовое снятие с публикации из админки сбрасывает кэш опубликованной личности"""
+    keys = [utils.ALL_CACHE_KEY, utils.GENDER_CACHE_KEYS['M'], utils.category_cache_key(published_person.cat.slug)]
+    cache.set_many({utils.versioned_key(key): [published_person] for key in keys})
+    with django_capture_on_commit_callbacks(execute=True):
+        Person.objects.filter(pk=published_person.pk).update(is_published=Person.Status.DRAFT)
+    assert cache.get_many([utils.versioned_key(key) for key in keys]) == {}
+
+
+@pytest.mark.django_db
+def test_tag_add_invalidates_tag_list(published_person, tag, django_capture_on_commit_callbacks):
+    """Добавление и удаление тега сбрасывает список по тегу"""
+    key = utils.tag_cache_key(tag.slug)
+    cache.set(utils.versioned_key(key), [])
+    with django_capture_on_commit_callbacks(execute=True):
+        published_person.tag.add(tag)
+    assert cache.get(utils.versioned_key(key)) is None
+
+    cache.set(utils.versioned_key(key), [published_person])
+    with django_capture_on_commit_callbacks(execute=True):
+        tag.tags.clear()
+    assert cache.get(utils.versioned_key(key)) is None
+
+
+@pytest.mark.django_db
+def test_category_rename_invalidates_lists(published_person, django_capture_on_commit_callbacks):
+    """Переименование категории сбрасывает списки, где выводится ее название"""
+    category = published_person.cat
+    keys = [utils.ALL_CACHE_KEY, utils.GENDER_CACHE_KEYS['M'], utils.category_cache_key(category.slug)]
+    cache.set_many({utils.versioned_key(key): [published_person] for key in keys})
+    with django_capture_on_commit_callbacks(execute=True):
+        category.name = 'Новое название'
+        category.save()
+    assert cache.get_many([utils.versioned_key(key) for key in keys]) == {}
+
+
+@pytest.mark.django_db
+def test_related_changes_invalidate_expanded_api(client, published_person, draft_person, tag,
+                                                 django_capture_on_commit_callbacks):
+    """Категория, теги и партнер входят в ответы API с ?expand=, поэтому их изменения сбрасывают эти ответы"""
+    list_url = reverse('person-list') + '?expand=cat,tags,companion'
+    detail_url = reverse('person-detail', kwargs={'pk': draft_person.pk}) + '?expand=cat,tags,companion'
+    cache.clear()
+
+    def expanded():
+        return client.get(list_url).json()['results'], client.get(detail_url).json()
+
+    expanded()
+    with django_capture_on_commit_callbacks(execute=True):
+        draft_person.cat.name = 'Новое название'
+        draft_person.cat.save()
+    results, detail = expanded()
+    assert all(p['cat']['name'] == 'Новое название' for p in results)
+    assert detail['cat']['name'] == 'Новое название'
+
+    with django_capture_on_commit_callbacks(execute=True):
+        draft_person.tag.add(tag)
+    assert expanded()[1]['tags'] == [{'id': tag.pk, 'tag': tag.tag, 'slug': tag.slug}]
+    with django_capture_on_commit_callbacks(execute=True):
+        tag.tag = 'Другой тег'
+        tag.save()
+    assert expanded()[1]['tags'][0]['tag'] == 'Другой тег'
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Person.objects.link_companions({draft_person.pk: published_person.pk})
+    expanded()
+    with django_capture_on_commit_callbacks(execute=True):
+        published_person.title = 'Новый заголовок'
+        published_person.save()
+    assert expanded()[1]['companion']['title'] == 'Новый заголовок'
+
+
+@pytest.mark.django_db
+def test_rename_bumps_shared_api_version(monkeypatch, category, tag, published_person, draft_person,
+                                         django_capture_on_commit_callbacks):
+    """Переименование категории или тега не поднимает версии страниц API каждой личности"""
+    published_person.tag.add(tag)
+    bumped = []
+    monkeypatch.setattr(utils, 'bump_cache_versions', lambda namespaces: bumped.extend(namespaces))
+    with django_capture_on_commit_callbacks(execute=True):
+        category.name = 'Новое название'
+        category.save()
+        tag.tag = 'Другой тег'
+        tag.save()
+    assert utils.API_RELATIONS_CACHE_KEY in bumped
+    assert not any(namespace.startswith('api_person_') and namespace[len('api_person_'):].isdigit()
+                   for namespace in bumped)
+    assert bumped.count(utils.API_RELATIONS_CACHE_KEY) == 2
+
+@pytest.mark.django_db
+def test_bump_cache_versions():
+    """Новая версия пространства имен делает недоступными все его ключи"""
+    cache.clear()
+    page_keys = [utils.versioned_key(utils.ALL_CACHE_KEY, 'page', n) for n in (1, 2)]
+    cache.set_many({key: [] for key in page_keys})
+    utils.bump_cache_versions([utils.ALL_CACHE_KEY])
+    assert utils.versioned_key(utils.ALL_CACHE_KEY, 'page', 1) not in page_keys
+    assert utils.versioned_key(utils.ALL_CACHE_KEY, 'page', 2) not in page_keys
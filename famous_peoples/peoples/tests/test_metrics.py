@@ -0,0 +1,95 @@
+import re
+
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from peoples import metrics
+from .test_models import user
+from .test_views import client, category
+from .test_query_budget import catalogue
+from .test_async_views import async_get
+
+
+@pytest.fixture
+def fresh_metrics(monkeypatch):
+    cache.clear()
+    monkeypatch.setattr(metrics, 'aggregate', metrics.Aggregate())
+    return metrics.aggregate
+
+
+def server_timing(response):
+    return dict(re.findall(r'(\w+);(?:dur=([\d.]+))?', response['Server-Timing']))
+
+
+@pytest.mark.django_db
+def test_server_timing_header(client, catalogue, fresh_metrics):
+    """Запросы к БД, кэш и рендеринг видны в Server-Timing; с прогретым кэшем запросов нет"""
+    url = reverse('peoples')
+    cold = client.get(url)
+    assert re.search(r'db;dur=[\d.]+;desc="[1-9]\d* queries"', cold['Server-Timing'])
+    assert re.search(r'cache;desc="0 hits, [1-9]\d* misses"', cold['Server-Timing'])
+    assert float(server_timing(cold)['render']) > 0
+
+    warm = client.get(url)
+    assert 'desc="0 queries"' in warm['Server-Timing']
+    assert re.search(r'cache;desc="[1-9]\d* hits, 0 misses"', warm['Server-Timing'])
+    timing = server_timing(warm)
+    assert float(timing['total']) >= float(timing['render'])
+
+
+@pytest.mark.django_db
+def test_server_timing_serializer(client, catalogue, fresh_metrics):
+    response = client.get(reverse('person-list'), headers={'accept': 'application/json'})
+    assert float(server_timing(response)['serialize']) > 0
+
+
+@pytest.mark.django_db
+def test_server_timing_async_view(async_get, catalogue, fresh_metrics):
+    """Запросы асинхронного ORM из потоков sync_to_async попадают в метрики того же запроса"""
+    response = async_get(reverse('post', kwargs={'post_slug': 'person-0'}))
+    assert response.resolver_match.func.view_class.__module__ == 'peoples.async_views'
+    assert re.search(r'desc="[1-9]\d* queries"', response['Server-Timing'])
+    assert float(server_timing(response)['render']) > 0
+
+
+@pytest.mark.django_db
+def test_prometheus_endpoint(client, catalogue, fresh_metrics):
+    """Счетчики суммируются в кэше, /metrics/ отдает их в формате Prometheus и себя не учитывает"""
+    for _ in range(2):
+        client.get(reverse('peoples'))
+    client.get(reverse('post', kwargs={'post_slug': 'missing'}))
+    fresh_metrics.flush()
+    # счетчики другого воркера прибавляются к тем же ключам
+    other = metrics.Aggregate()
+    other.add(metrics.RequestMetrics(), 'peoples', 200)
+    other.flush()
+
+    response = client.get(reverse('metrics'))
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    body = response.content.decode()
+    assert 'peoples_http_requests_total{route="peoples",status="2xx"} 3' in body
+    assert 'peoples_http_requests_total{route="post",status="4xx"} 1' in body
+    assert 'peoples_http_request_duration_seconds_bucket{route="peoples",le="+Inf"} 3' in body
+    assert 'peoples_http_request_duration_seconds_count{route="peoples"} 3' in body
+    assert re.search(r'peoples_db_queries_total\{route="peoples"\} [1-9]', body)
+    assert 'peoples_cache_requests_total{namespace="peoples_all",result="miss"}' in body
+    assert 'peoples_cache_requests_total{namespace="peoples_page",result="hit"} 1' in body
+    assert 'peoples_cache_requests_total{namespace="peoples_detail",result="miss"} 1' in body
+    assert 'route="metrics"' not in body
+
+
+@pytest.mark.django_db
+def test_prometheus_endpoint_access(client, user):
+    assert client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.1').status_code == 403
+    user.is_staff = True
+    user.save()
+    client.force_login(user)
+    assert client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.1').status_code == 200
+
+
+def test_cache_namespace():
+    assert metrics.cache_namespace('peoples_category_istoriya:v1:slice:0:3') == 'peoples_category'
+    assert metrics.cache_namespace('api_person_12:v3') == 'api_person'
+    assert metrics.cache_namespace('api_person_list:v3:count') == 'api_person_list'
+    assert metrics.cache_namespace('peoples_sidebar_tags:v2') == 'peoples_sidebar_tags'
@@ -1,6 +1,8 @@
 import pytest
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from peoples.models import Person, Category, TagPost
 
@@ -106,4 +108,61 @@ def test_save_companions_clear(category):
 def test_person_tags(category, tag1, tag2):
     person = Person.objects.create(title='Альберт Эйнштейн', slug='albert-einstein', gender=Person.Gender.MALE, cat=category)
     person.tag.add(tag1, tag2)
-    assert tag1, tag2 in person.tag.all()
\ No newline at end of file
+    assert tag1, tag2 in person.tag.all()
+
+@pytest.mark.django_db
+def test_save_companions_queries(category):
+    """Сохранение без смены партнера не трогает другие записи, смена партнера не вызывает save() у партнеров"""
+    m = Person.objects.create(title='Mal', slug='mal', gender=Person.Gender.MALE, cat=category)
+    f = Person.objects.create(title='Fem', slug='fem', gender=Person.Gender.FEMALE, cat=category)
+    f2 = Person.objects.create(title='Fem2', slug='fem2', gender=Person.Gender.FEMALE, cat=category)
+    m.companion = f
+    m.save()
+
+    m = Person.objects.get(pk=m.pk)
+    with CaptureQueriesContext(connection) as captured:
+        m.title = 'Mal2'
+        m.save()
+    assert not any('"companion_id" IN' in query['sql'] for query in captured.captured_queries)
+
+    m.companion = f2
+    m.save()
+    assert f2.companion == m
+    assert [p.companion_id for p in Person.objects.order_by('pk')] == [f2.pk, None, m.pk]
+
+
+@pytest.mark.django_db
+def test_save_companion_taken(category):
+    """Партнера из существующей пары можно забрать через save(): прежний партнер остается без пары"""
+    a = Person.objects.create(title='A', slug='a', gender=Person.Gender.MALE, cat=category)
+    b = Person.objects.create(title='B', slug='b', gender=Person.Gender.FEMALE, cat=category)
+    c = Person.objects.create(title='C', slug='c', gender=Person.Gender.MALE, cat=category)
+    Person.objects.link_companions({a.pk: b.pk})
+
+    c.companion = b
+    c.save()
+    assert c.companion is b
+    assert dict(Person.objects.values_list('pk', 'companion_id')) == {a.pk: None, b.pk: c.pk, c.pk: b.pk}
+
+    d = Person.objects.create(title='D', slug='d', gender=Person.Gender.MALE, cat=category, companion=b)
+    assert dict(Person.objects.values_list('pk', 'companion_id')) == {a.pk: None, b.pk: d.pk, c.pk: None,
+                                                                       d.pk: b.pk}
+
+@pytest.mark.django_db
+def test_link_companions(category):
+    """Массовое связывание: обмен партнерами и обнуление прежних пар"""
+    a, b, c, d = (Person.objects.create(title=str(n), slug=f'p{n}', gender=Person.Gender.MALE, cat=category)
+                  for n in range(4))
+    Person.objects.link_companions({a.pk: b.pk, c.pk: d.pk})
+    assert dict(Person.objects.values_list('pk', 'companion_id')) == {a.pk: b.pk, b.pk: a.pk, c.pk: d.pk, d.pk: c.pk}
+
+    assert Person.objects.link_companions({a.pk: c.pk, b.pk: d.pk}) == 4
+    assert dict(Person.objects.values_list('pk', 'companion_id')) == {a.pk: c.pk, c.pk: a.pk, b.pk: d.pk, d.pk: b.pk}
+
+    Person.objects.link_companions({a.pk: None})
+    assert dict(Person.objects.values_list('pk', 'companion_id')) == {a.pk: None, c.pk: None, b.pk: d.pk, d.pk: b.pk}
+
+    with pytest.raises(ValueError):
+        Person.objects.link_companions({a.pk: b.pk, c.pk: b.pk})
+    with pytest.raises(ValueError):
+        Person.objects.link_companions({a.pk: a.pk})
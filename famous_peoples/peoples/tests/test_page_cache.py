@@ -0,0 +1,163 @@
+import pytest
+from django.core.cache import cache
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils.http import http_date, parse_http_date
+from peoples import page_cache
+from peoples.models import Person
+from .test_models import user
+from .test_views import client, category
+from .test_query_budget import catalogue
+from .test_async_views import async_get
+from .test_api_views import api_client
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('name, kwargs', [
+    ('peoples', {}), ('men', {}), ('category', {'cat_slug': 'istoriya'}), ('tag', {'tag_slug': 'tag'}),
+    ('post', {'post_slug': 'person-0'}),
+])
+def test_page_served_from_cache(client, catalogue, django_assert_num_queries, name, kwargs):
+    """Повторный запрос отдает сохраненную страницу без запросов к БД и без шаблона"""
+    url = reverse(name, kwargs=kwargs)
+    first = client.get(url)
+    assert first.templates and first['ETag']
+    assert 'no-cache' in first['Cache-Control']
+
+    with django_assert_num_queries(0):
+        second = client.get(url)
+    assert second.status_code == 200
+    assert not second.templates
+    assert second.content == first.content
+    assert second['ETag'] == first['ETag']
+    assert second['Last-Modified'] == first['Last-Modified']
+
+
+@pytest.mark.django_db
+def test_unknown_query_params_share_page(client, catalogue, django_assert_num_queries):
+    """Параметры, которые представление не читает, не создают новых копий страницы; порядок параметров не важен"""
+    url = reverse('peoples')
+    first = client.get(url + '?page=2&utm_source=a')
+    with django_assert_num_queries(0):
+        assert client.get(url + '?utm_source=b&page=2&page=2').content == first.content
+    assert client.get(url + '?page=1&utm_source=a').content != first.content
+
+    search = reverse('search')
+    client.get(search + '?q=1&ref=a')
+    with django_assert_num_queries(0):
+        client.get(search + '?ref=b&q=1')
+    assert len([key for key in getattr(cache, 'remote', cache)._expire_info if page_cache.KEY_PREFIX in key]) == 3
+
+@pytest.mark.django_db
+def test_last_modified_is_newest_person(client, catalogue):
+    response = client.get(reverse('peoples') + '?page=2')
+    newest = max(person.time_update for person in Person.published.order_by('-time_create', '-id')[5:])
+    assert parse_http_date(response['Last-Modified']) == int(newest.timestamp())
+
+
+@pytest.mark.django_db
+def test_conditional_get(client, catalogue, django_assert_num_queries):
+    """If-None-Match и If-Modified-Since получают 304 без тела и без представления"""
+    url = reverse('post', kwargs={'post_slug': 'person-0'})
+    first = client.get(url)
+
+    with django_assert_num_queries(0):
+        response = client.get(url, headers={'if-none-match': first['ETag']})
+    assert response.status_code == 304
+    assert response.content == b''
+    assert not response.templates
+
+    response = client.get(url, headers={'if-modified-since': http_date(parse_http_date(first['Last-Modified']) + 60)})
+    assert response.status_code == 304
+
+    assert client.get(url, headers={'if-none-match': '"other"'}).status_code == 200
+
+
+@pytest.mark.django_db
+def test_conditional_get_after_eviction(client, catalogue):
+    """Если копия вытеснена, страница собирается заново, но совпавший ETag все равно дает 304"""
+    url = reverse('peoples')
+    etag = client.get(url)['ETag']
+    cache.delete(page_cache.page_key(RequestFactory().get(url), page_cache.PAGES['peoples']({}), 'anon'))
+
+    response = client.get(url, headers={'if-none-match': etag})
+    assert response.status_code == 304
+    assert response.templates
+
+
+@pytest.mark.django_db
+def test_change_invalidates_page(client, catalogue, django_capture_on_commit_callbacks):
+    url = reverse('post', kwargs={'post_slug': 'person-0'})
+    first = client.get(url)
+    with django_capture_on_commit_callbacks(execute=True):
+        catalogue[0].title = 'Новый заголовок'
+        catalogue[0].save()
+
+    response = client.get(url, headers={'if-none-match': first['ETag']})
+    assert response.status_code == 200
+    assert response.templates
+    assert 'Новый заголовок' in response.content.decode()
+    assert response['ETag'] != first['ETag']
+
+
+@pytest.mark.django_db
+def test_authenticated_variant(client, catalogue, user):
+    """Вошедший пользователь получает свою копию страницы с именем в шапке, аноним - общую"""
+    url = reverse('peoples')
+    anonymous = client.get(url)
+    assert 'private' not in anonymous['Cache-Control']
+
+    client.force_login(user)
+    # первая страница выписывает CSRF-cookie и не сохраняется, следующие читаются из своей копии
+    first = client.get(url)
+    assert first.templates and user.username in first.content.decode()
+    second = client.get(url)
+    assert second.templates
+    third = client.get(url)
+    assert not third.templates
+    assert third.content == second.content
+    assert 'private' in third['Cache-Control']
+    assert third['ETag'] != anonymous['ETag']
+
+    client.logout()
+    response = client.get(url)
+    assert not response.templates
+    assert response.content == anonymous.content
+
+
+@pytest.mark.django_db
+def test_async_view_shares_page_cache(client, async_get, catalogue):
+    url = reverse('women')
+    first = async_get(url)
+    assert first.templates
+    response = client.get(url, headers={'if-none-match': first['ETag']})
+    assert response.status_code == 304
+    assert not async_get(url).templates
+
+
+def version_keys():
+    # LocMemCache (у двухуровневого кэша - удаленный уровень): ключ -> срок жизни
+    backend = getattr(cache, 'remote', cache)
+    return {key: expires for key, expires in backend._expire_info.items() if key.endswith(':version')}
+
+
+@pytest.mark.django_db
+def test_missing_objects_create_no_versions(client, api_client, catalogue):
+    """Запросы к несуществующим объектам не копят счетчики версий; у остальных счетчиков конечный срок жизни"""
+    client.get(reverse('peoples'))
+    before = version_keys()
+    for name, kwargs in (('post', {'post_slug': 'missing'}), ('category', {'cat_slug': 'missing'}),
+                         ('tag', {'tag_slug': 'missing'})):
+        assert client.get(reverse(name, kwargs=kwargs)).status_code == 404
+    assert api_client.get(reverse('person-detail', kwargs={'pk': 10 ** 6})).status_code == 404
+    assert version_keys() == before
+
+    client.get(reverse('post', kwargs={'post_slug': 'person-0'}))
+    api_client.get(reverse('person-detail', kwargs={'pk': catalogue[0].pk}))
+    assert len(version_keys()) > len(before)
+    assert all(expires is not None for expires in version_keys().values())
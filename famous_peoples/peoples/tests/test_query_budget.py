@@ -0,0 +1,64 @@
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from peoples.models import Person, TagPost
+from .test_models import user
+from .test_views import client, category
+
+# Сколько запросов к БД может сделать каждая страница из peoples/urls.py. Бюджет не зависит от количества
+# записей на странице, поэтому N+1 в шаблоне или сериализаторе сразу его превысит.
+# (имя маршрута, kwargs, нужна ли авторизация, бюджет с пустым кэшем, бюджет с прогретым кэшем)
+PAGES = [
+    ('home', {}, False, 2, 0),
+    ('peoples', {}, False, 4, 0),
+    ('men', {}, False, 4, 0),
+    ('women', {}, False, 4, 0),
+    ('about', {}, False, 2, 0),
+    ('post', {'post_slug': 'person-0'}, False, 4, 0),
+    ('add_page', {}, True, 7, 5),
+    ('contact', {}, False, 2, 0),
+    ('category', {'cat_slug': 'istoriya'}, False, 4, 0),
+    ('tag', {'tag_slug': 'tag'}, False, 5, 1),
+    ('edit_page', {'slug': 'person-0'}, True, 9, 7),
+    ('person-autocomplete', {}, False, 1, 0),
+    ('person-list', {}, False, 2, 0),
+    ('person-detail', {'pk': 'first'}, False, 1, 0),
+    ('person-categories', {}, False, 1, 1),
+    ('category-delete', {'pk': 'category'}, False, 1, 1),
+]
+
+
+@pytest.fixture
+def catalogue(category, user):
+    tag = TagPost.objects.create(tag='Тег', slug='tag')
+    persons = []
+    for n in range(6):
+        person = Person.objects.create(title=f'Личность {n}', slug=f'person-{n}', content='Описание ' * 50,
+                                       gender=Person.Gender.MALE if n % 2 else Person.Gender.FEMALE,
+                                       cat=category, author=user)
+        person.tag.add(tag)
+        persons.append(person)
+    persons[0].companion = persons[1]
+    persons[0].save()
+    return persons
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('name, kwargs, login, cold_budget, warm_budget', PAGES)
+def test_query_budget(client, user, catalogue, django_assert_max_num_queries,
+                      name, kwargs, login, cold_budget, warm_budget):
+    """Количество запросов на странице укладывается в бюджет с пустым и с прогретым кэшем"""
+    kwargs = {**kwargs}
+    if kwargs.get('pk') == 'first':
+        kwargs['pk'] = catalogue[0].pk
+    elif kwargs.get('pk') == 'category':
+        kwargs['pk'] = catalogue[0].cat_id
+    if login:
+        client.force_login(user)
+    url = reverse(name, kwargs=kwargs)
+
+    cache.clear()
+    with django_assert_max_num_queries(cold_budget):
+        assert client.get(url).status_code == 200
+    with django_assert_max_num_queries(warm_budget):
+        assert client.get(url).status_code == 200
@@ -0,0 +1,77 @@
+import pickle
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from peoples import records
+from peoples.models import Person
+from peoples.serializers import PersonSerializer
+from .test_models import user
+from .test_views import client, category, published_person
+
+
+@pytest.fixture
+def people(category, user):
+    return [Person.objects.create(title=f'Личность {n}', slug=f'person-{n}', content='Описание ' * 100,
+                                  gender=Person.Gender.FEMALE if n % 2 else Person.Gender.MALE, cat=category,
+                                  author=user if n else None) for n in range(5)]
+
+
+@pytest.mark.django_db
+def test_people_roundtrip(people):
+    rows = list(Person.objects.for_list().order_by('pk'))
+    packed = records.PEOPLE.pack(rows)
+    restored = records.PEOPLE.unpack(pickle.loads(pickle.dumps(packed)))
+
+    assert restored == rows and list(map(hash, restored)) == list(map(hash, rows))
+    for record, person in zip(restored, rows):
+        for name in ('pk', 'id', 'title', 'slug', 'excerpt_html', 'gender', 'time_create', 'time_update',
+                     'thumbnails'):
+            assert getattr(record, name) == getattr(person, name)
+        assert record.get_absolute_url() == person.get_absolute_url()
+        assert record.get_gender_display() == person.get_gender_display()
+        assert record.cat == person.cat and record.cat.name == person.cat.name and record.cat.id == person.cat_id
+        assert not record.photo
+    assert restored[1].author == people[1].author and restored[1].author.username == people[1].author.username
+    assert restored[0].author is None
+
+    with pytest.raises(AttributeError):
+        restored[0].title = 'Другое'
+
+
+@pytest.mark.django_db
+def test_dicts_roundtrip_renders_identical_json(people):
+    data = PersonSerializer(Person.objects.all(), many=True).data
+    packed = records.DICTS.pack(data)
+    # тело с описаниями больше порога - сжато
+    assert packed[0] and len(pickle.dumps(packed)) < len(pickle.dumps(data)) / 3
+    assert JSONRenderer().render(records.DICTS.unpack(packed)) == JSONRenderer().render(data)
+
+    assert records.DICTS.unpack(records.DICTS.pack([])) == []
+    mixed = [{'a': 1}, {'b': 2, 'a': 3}]
+    assert records.DICTS.unpack(records.DICTS.pack(mixed)) == mixed
+
+
+def test_small_payload_not_compressed():
+    compressed, payload = records.dump([(1, 'a')])
+    assert not compressed and records.load((compressed, payload)) == [(1, 'a')]
+
+
+@pytest.mark.django_db
+def test_list_views_use_records(client, published_person):
+    # и при промахе срез проходит через упаковку, поэтому тип записей не зависит от состояния кэша
+    for url in (reverse('peoples'), reverse('peoples') + '?cursor='):
+        posts = client.get(url).context['posts']
+        assert all(isinstance(p, records.PersonRecord) for p in posts)
+        assert published_person in posts
+
+
+@pytest.mark.django_db
+def test_benchmark_cache_command(people):
+    out = StringIO()
+    call_command('benchmark_cache', repeat=2, stdout=out)
+    lines = out.getvalue().splitlines()
+    assert [line.split()[:2] for line in lines] == [['list', 'pickle'], ['list', 'p1'], ['api', 'pickle'],
+                                                     ['api', 'd1']]
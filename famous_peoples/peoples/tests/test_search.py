@@ -0,0 +1,82 @@
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APIClient
+from peoples.models import Person
+from peoples.search import InvertedIndex
+from peoples.stemmer import stem
+from .test_models import user
+from .test_views import client, category
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.fixture
+def persons(category, user):
+    def create(title, slug, content, **kwargs):
+        return Person.objects.create(title=title, slug=slug, content=content, gender=Person.Gender.MALE,
+                                     cat=category, author=user, **kwargs)
+
+    with_title = create('Поэт Пушкин', 'pushkin', 'Писал стихи и прозу')
+    with_content = create('Лермонтов', 'lermontov', 'Русский поэт, автор «Героя нашего времени»')
+    create('Менделеев', 'mendeleev', 'Химик, автор периодической таблицы')
+    create('Черновик', 'draft', 'Неизвестный поэт', is_published=Person.Status.DRAFT)
+    return with_title, with_content
+
+
+@pytest.mark.parametrize('words, expected', [
+    (['поэт', 'поэта', 'поэтом', 'поэты'], 'поэт'),
+    (['известный', 'известностью'], 'известн'),
+    (['ёлки', 'елки'], 'елк'),
+    (['Python'], 'python'),
+])
+def test_stem(words, expected):
+    """Формы слова сводятся к одной основе"""
+    assert {stem(word) for word in words} == {expected}
+
+
+def test_inverted_index_ranking():
+    """Совпадение в заголовке весит больше, чем в описании; нужны все слова запроса"""
+    index = InvertedIndex([(1, 'Химик', 'Великий поэт'), (2, 'Поэт', 'Великий химик'), (3, 'Поэт', 'Художник')])
+    assert index.search('поэты') == [3, 2, 1]
+    assert index.search('великого поэта') == [2, 1]
+    assert index.search('математик') == []
+    assert index.search('  ') == []
+
+
+@pytest.mark.django_db
+def test_search_view(client, persons):
+    """Страница поиска находит опубликованные личности по формам слов в порядке релевантности"""
+    response = client.get(reverse('search'), {'q': 'поэты'})
+    assert response.status_code == 200
+    assert list(response.context['posts']) == list(persons)
+    assert response.context['search_query'] == 'поэты'
+
+    response = client.get(reverse('search'), {'q': 'математик'})
+    assert 'ничего не найдено' in response.content.decode()
+    assert client.get(reverse('search')).status_code == 200
+
+
+@pytest.mark.django_db
+def test_search_sees_new_posts(client, persons, django_capture_on_commit_callbacks):
+    """Опубликованная после первого поиска личность появляется в закэшированных результатах"""
+    assert len(client.get(reverse('search'), {'q': 'поэт'}).context['posts']) == 2
+    with django_capture_on_commit_callbacks(execute=True):
+        Person.objects.filter(slug='draft').update(is_published=Person.Status.PUBLISHED)
+    assert len(client.get(reverse('search'), {'q': 'поэт'}).context['posts']) == 3
+
+
+@pytest.mark.django_db
+def test_api_search(persons):
+    """/api/person/search/ отдает страницу результатов и требует запрос"""
+    client = APIClient()
+    response = client.get(reverse('person-search'), {'q': 'Поэт', 'page_size': 1})
+    assert response.status_code == 200
+    assert response.data['count'] == 2
+    assert [p['slug'] for p in response.data['results']] == ['pushkin']
+    assert response.data['next'] is not None
+
+    assert client.get(reverse('person-search')).status_code == 400
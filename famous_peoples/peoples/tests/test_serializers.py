@@ -82,4 +82,55 @@ def test_person_serializer_author_read_only(category, user):
     assert serializer.is_valid()
 
     person = serializer.save()
-    assert person.author == user
\ No newline at end of file
+    assert person.author == user
+
+TRICKY = 'Кавычки " и \\ , разрывы   , управляющие \x01\n\t и эмодзи \U0001F600'
+
+
+@pytest.mark.django_db
+def test_field_plan_matches_serializers(person, category):
+    """План полей дает те же данные и тот же JSON, что сериализаторы DRF"""
+    from rest_framework.renderers import JSONRenderer
+    from peoples.renderers import FastJSONRenderer
+
+    Person.objects.create(title=TRICKY, slug='tricky', content=TRICKY, gender=Person.Gender.FEMALE, cat=category)
+    queryset = Person.objects.all()
+    expected = PersonSerializer(queryset, many=True).data
+    for data in (PERSON_PLAN.data(queryset), PERSON_PLAN.data(list(queryset)), PERSON_PLAN.data(queryset[1:]),
+                 list(PERSON_PLAN.iterator(queryset, 1))):
+        assert data == expected[-len(data):]
+        assert [list(row) for row in data] == [list(row) for row in expected[-len(data):]]
+    assert FastJSONRenderer().render(PERSON_PLAN.data(queryset)) == JSONRenderer().render(expected)
+
+    categories = Category.objects.all()
+    assert CATEGORY_PLAN.data(categories) == CategorySerializer(categories, many=True).data
+
+
+def test_field_plan_rejects_unsupported_fields():
+    class WithDate(serializers.ModelSerializer):
+        class Meta:
+            model = Person
+            fields = ['title', 'time_create']
+
+    class WithMethod(serializers.ModelSerializer):
+        upper = serializers.SerializerMethodField()
+
+        class Meta:
+            model = Person
+            fields = ['title', 'upper']
+
+    for serializer_class in (WithDate, WithMethod):
+        with pytest.raises(TypeError):
+            FieldPlan(serializer_class)
+
+
+def test_fast_renderer_matches_json_renderer():
+    from datetime import datetime, timezone
+    from rest_framework.renderers import JSONRenderer
+    from peoples.renderers import FastJSONRenderer
+
+    data = {'results': [{'title': TRICKY, 'n': 1, 'none': None, 'flag': True}], 3: 'ключ-число',
+            'time': datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc), 'huge': 2 ** 70}
+    assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+    assert FastJSONRenderer().render(data, 'application/json; indent=2') == \
+        JSONRenderer().render(data, 'application/json; indent=2')
@@ -0,0 +1,76 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.signals import post_save, pre_save
+from django.test.utils import CaptureQueriesContext
+from peoples import counters, utils
+from peoples.models import Person
+from peoples.templatetags.peoples_tags import show_categories, show_all_tags
+from .test_models import user
+from .test_views import category, tag, published_person, draft_person
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.mark.django_db
+def test_sidebar_only_published(published_person, draft_person, tag):
+    """В сайдбаре считаются только опубликованные посты"""
+    draft_person.tag.add(tag)
+    assert published_person.cat.name in show_categories()
+    assert tag.tag not in show_all_tags()
+
+
+@pytest.mark.django_db
+def test_sidebar_cached(published_person, django_assert_num_queries):
+    """Повторный вывод сайдбара не обращается к БД"""
+    show_categories(published_person.cat_id)
+    show_all_tags()
+    with django_assert_num_queries(0):
+        assert 'class="selected"' in show_categories(published_person.cat_id)
+        show_all_tags()
+
+
+@pytest.mark.django_db
+def test_sidebar_invalidation(published_person, tag, django_capture_on_commit_callbacks):
+    """Сайдбар сбрасывается при смене статуса или тегов, но не при изменении описания"""
+    published_person.tag.add(tag)
+    categories_key = utils.versioned_key(utils.SIDEBAR_CATEGORIES_CACHE_KEY)
+    tags_key = utils.versioned_key(utils.SIDEBAR_TAGS_CACHE_KEY)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        published_person.content = 'Новое описание'
+        published_person.save()
+    assert utils.versioned_key(utils.SIDEBAR_CATEGORIES_CACHE_KEY) == categories_key
+    assert utils.versioned_key(utils.SIDEBAR_TAGS_CACHE_KEY) == tags_key
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Person.objects.filter(pk=published_person.pk).update(is_published=Person.Status.DRAFT)
+    assert utils.versioned_key(utils.SIDEBAR_CATEGORIES_CACHE_KEY) != categories_key
+    assert utils.versioned_key(utils.SIDEBAR_TAGS_CACHE_KEY) != tags_key
+    assert published_person.cat.name not in show_categories()
+
+
+@pytest.mark.django_db
+def test_sidebar_invalidation_on_save(published_person, tag, django_capture_on_commit_callbacks):
+    """Смена статуса через save() сбрасывает сайдбар и без счетчиков; обычное сохранение не читает теги"""
+    published_person.tag.add(tag)
+    tags_key = utils.versioned_key(utils.SIDEBAR_TAGS_CACHE_KEY)
+    with CaptureQueriesContext(connection) as captured:
+        published_person.content = 'Новое описание'
+        published_person.save()
+    # exists() по тегам нужен только при смене статуса
+    assert not any(query['sql'].startswith('SELECT 1 AS "a"') for query in captured.captured_queries)
+
+    pre_save.disconnect(counters.person_pre_save, sender=Person)
+    post_save.disconnect(counters.person_post_save, sender=Person)
+    try:
+        with django_capture_on_commit_callbacks(execute=True):
+            published_person.is_published = Person.Status.DRAFT
+            published_person.save()
+    finally:
+        pre_save.connect(counters.person_pre_save, sender=Person)
+        post_save.connect(counters.person_post_save, sender=Person)
+    assert utils.versioned_key(utils.SIDEBAR_TAGS_CACHE_KEY) != tags_key
@@ -0,0 +1,129 @@
+from io import BytesIO, StringIO
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.urls import reverse
+from PIL import Image
+from peoples import thumbnails
+from peoples.models import Person
+from .test_models import user
+from .test_views import client, category
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
+
+
+def image_file(width, height=None, mode='RGB', name='photo.png'):
+    buffer = BytesIO()
+    Image.new(mode, (width, height or width // 2), 'red').save(buffer, 'PNG')
+    return ContentFile(buffer.getvalue(), name=name)
+
+
+@pytest.fixture
+def person(category, user, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        person = Person.objects.create(title='Личность', slug='person', content='Описание', photo=image_file(800),
+                                       gender=Person.Gender.MALE, cat=category, author=user,
+                                       is_published=Person.Status.PUBLISHED)
+    person.refresh_from_db()
+    return person
+
+
+def test_generate_never_upscales():
+    source = default_storage.save('photos/small.png', image_file(400))
+    data = thumbnails.generate(source)
+    assert data['source'] == source and data['width'] == 400
+    assert set(data['sizes']) == {'160', '320'}
+    with default_storage.open(data['sizes']['160']) as f:
+        assert Image.open(f).size == (160, 80)
+
+    tiny = default_storage.save('photos/tiny.png', image_file(100, mode='RGBA'))
+    # меньше самой узкой копии - одна копия в размер оригинала, прозрачность залита белым
+    sizes = thumbnails.generate(tiny)['sizes']
+    assert list(sizes) == ['160']
+    with default_storage.open(sizes['160']) as f:
+        assert Image.open(f).size == (100, 50)
+
+
+def test_safe_generate_broken_file():
+    source = default_storage.save('photos/broken.png', ContentFile(b'not an image'))
+    assert thumbnails.safe_generate(source) == {'source': source, 'sizes': {}}
+    assert thumbnails.safe_generate('photos/missing.png')['sizes'] == {}
+
+
+@pytest.mark.django_db
+def test_thumbnails_built_after_save(person):
+    assert person.thumbnails['source'] == person.photo.name
+    sizes = person.photo_thumbnails()
+    assert sorted(sizes) == list(thumbnails.WIDTHS)
+    assert all(default_storage.exists(name) for name in sizes.values())
+
+    assert person.photo_url(150) == default_storage.url(sizes[160])
+    assert person.photo_url(300) == default_storage.url(sizes[320])
+    assert person.photo_url(1000) == default_storage.url(sizes[640])
+    assert person.photo_srcset == ', '.join(f'{default_storage.url(sizes[w])} {w}w' for w in thumbnails.WIDTHS)
+
+
+@pytest.mark.django_db
+def test_new_photo_replaces_thumbnails(person, django_capture_on_commit_callbacks):
+    old = person.photo_thumbnails()
+    person.photo = image_file(300, name='other.png')
+    # пока задача не выполнена, выводится оригинал нового фото
+    assert person.photo_url(160) == person.photo.url
+    with django_capture_on_commit_callbacks(execute=True):
+        person.save()
+    person.refresh_from_db()
+    assert person.thumbnails['source'] == person.photo.name
+    assert sorted(person.photo_thumbnails()) == [160]
+    assert not any(default_storage.exists(name) for name in old.values())
+
+    with django_capture_on_commit_callbacks(execute=True):
+        person.photo = None
+        person.save()
+    person.refresh_from_db()
+    assert person.thumbnails == {}
+
+
+@pytest.mark.django_db
+def test_unrelated_save_does_not_rebuild(person, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks() as callbacks:
+        person.title = 'Новое название'
+        person.save()
+    assert not any('generate_thumbnails' in str(callback) for callback in callbacks)
+    assert not thumbnails.is_stale(person.photo.name, person.thumbnails)
+
+
+@pytest.mark.django_db
+def test_templates_use_thumbnails(client, person):
+    sizes = person.photo_thumbnails()
+    content = client.get(reverse('peoples')).content.decode()
+    assert f'src="{default_storage.url(sizes[160])}"' in content
+    assert 'sizes="150px"' in content and f'{default_storage.url(sizes[640])} 640w' in content
+
+    content = client.get(person.get_absolute_url()).content.decode()
+    assert f'src="{default_storage.url(sizes[320])}"' in content and 'sizes="300px"' in content
+
+
+@pytest.mark.django_db
+def test_regenerate_command(person, category, user):
+    imported = Person.objects.create(title='Импорт', slug='imported', content='Описание', photo=image_file(200),
+                                     gender=Person.Gender.FEMALE, cat=category, author=user)
+    # импорт пишет строки без post_save
+    Person.objects.filter(pk=imported.pk).update(thumbnails={})
+    built = person.thumbnails
+
+    out = StringIO()
+    call_command('regenerate_thumbnails', missing=True, processes=1, stdout=out)
+    assert 'Обновлено миниатюр: 1' in out.getvalue()
+    imported.refresh_from_db()
+    assert sorted(imported.photo_thumbnails()) == [160]
+    person.refresh_from_db()
+    assert person.thumbnails == built
+
+    call_command('regenerate_thumbnails', processes=1, chunk_size=1, stdout=out)
+    assert 'Обновлено миниатюр: 2' in out.getvalue()
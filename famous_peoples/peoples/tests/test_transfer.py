@@ -0,0 +1,140 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from peoples import utils
+from peoples.models import Category, Person, TagPost
+from peoples.transfer import write_records
+from .test_models import user
+from .test_views import category
+
+
+RECORDS = [
+    {'slug': 'pushkin', 'title': 'Пушкин', 'content': 'Поэт', 'gender': 'M', 'cat': 'poets', 'tags': ['classic'],
+     'companion': 'goncharova', 'author': 'TestUser'},
+    {'slug': 'goncharova', 'title': 'Гончарова', 'gender': 'F', 'cat': 'poets', 'companion': 'pushkin'},
+    {'slug': 'draft', 'title': 'Черновик', 'gender': 'M', 'cat': 'poets', 'is_published': 0},
+    {'slug': 'broken', 'title': 'Без категории', 'gender': 'M'},
+]
+
+
+def import_people(tmp_path, records, name='people.ndjson', chunk_size=2):
+    path = tmp_path / name
+    if name.endswith('.csv'):
+        out = StringIO()
+        write_records(out, [{'tags': [], **record} for record in records], 'csv')
+        path.write_text(out.getvalue(), encoding='utf-8')
+    else:
+        path.write_text('\n'.join(json.dumps(record, ensure_ascii=False) for record in records), encoding='utf-8')
+    out = StringIO()
+    call_command('import_people', str(path), chunk_size=chunk_size, stdout=out, stderr=StringIO())
+    return out.getvalue()
+
+
+@pytest.mark.django_db
+def test_import_people(tmp_path, user):
+    """Импорт создает категории и теги по slug, связывает партнеров и пересчитывает счетчики"""
+    output = import_people(tmp_path, RECORDS)
+    assert 'Создано 3, обновлено 0, пропущено 1, связано партнеров 2' in output
+
+    pushkin = Person.objects.get(slug='pushkin')
+    assert pushkin.companion.slug == 'goncharova'
+    assert pushkin.companion.companion == pushkin
+    assert pushkin.author == user
+    assert [tag.slug for tag in pushkin.tag.all()] == ['classic']
+    assert Category.objects.get(slug='poets').posts_count == 2
+    assert TagPost.objects.get(slug='classic').posts_count == 1
+    assert Person.objects.get(slug='draft').is_published == Person.Status.DRAFT
+
+
+@pytest.mark.django_db
+def test_import_updates_by_slug(tmp_path, user, django_capture_on_commit_callbacks):
+    """Повторный импорт обновляет записи по slug, заменяет теги, разрывает пары и сбрасывает кэш страниц"""
+    import_people(tmp_path, RECORDS)
+    cached_key = utils.versioned_key(utils.detail_cache_key('pushkin'))
+    cached_all = utils.versioned_key(utils.ALL_CACHE_KEY)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        output = import_people(tmp_path, [{**RECORDS[0], 'title': 'А. С. Пушкин', 'tags': [], 'companion': None}],
+                               name='people.csv')
+    assert 'Создано 0, обновлено 1' in output
+    pushkin = Person.objects.get(slug='pushkin')
+    assert pushkin.title == 'А. С. Пушкин'
+    assert pushkin.companion is None
+    assert Person.objects.get(slug='goncharova').companion is None
+    assert not pushkin.tag.exists()
+    assert Person.objects.count() == 3
+    assert utils.versioned_key(utils.detail_cache_key('pushkin')) != cached_key
+    assert utils.versioned_key(utils.ALL_CACHE_KEY) != cached_all
+
+
+@pytest.mark.django_db
+def test_import_malformed_line_rolls_back(tmp_path, user):
+    """Строка, которая не читается как запись, отменяет весь импорт и называется в ошибке"""
+    path = tmp_path / 'people.ndjson'
+    lines = [json.dumps(record, ensure_ascii=False) for record in RECORDS[:3]]
+    path.write_text('\n'.join([*lines, '', '{"slug": "cut', '[]']), encoding='utf-8')
+    with pytest.raises(CommandError, match='строка 5'):
+        call_command('import_people', str(path), chunk_size=1, stdout=StringIO(), stderr=StringIO())
+    assert not Person.objects.exists()
+    assert not Category.objects.exists()
+
+    path.write_text('\n'.join([*lines, '[]']), encoding='utf-8')
+    with pytest.raises(CommandError, match='строка 4: ожидается объект JSON'):
+        call_command('import_people', str(path), stdout=StringIO(), stderr=StringIO())
+    assert not Person.objects.exists()
+
+
+@pytest.mark.django_db
+def test_import_rejects_tags_string(tmp_path, user):
+    """Строка вместо списка тегов не разбивается на однобуквенные теги: запись пропускается"""
+    output = import_people(tmp_path, [{**RECORDS[2], 'tags': 'classic'}, {**RECORDS[1], 'tags': ['classic']}])
+    assert 'Создано 1, обновлено 0, пропущено 1' in output
+    assert list(TagPost.objects.values_list('slug', flat=True)) == ['classic']
+
+@pytest.mark.django_db
+def test_import_skips_wrong_types(tmp_path, user):
+    """Запись с нестроковыми slug, cat или автором пропускается, а не отменяет импорт; ненайденный партнер - ошибка"""
+    records = [{**RECORDS[1], 'companion': 'missing'}, {**RECORDS[0], 'slug': ['x']}, {**RECORDS[2], 'cat': {}},
+               {**RECORDS[2], 'slug': 'author', 'author': ['TestUser']}, {**RECORDS[2], 'is_published': [1]}]
+    path = tmp_path / 'people.ndjson'
+    path.write_text('\n'.join(json.dumps(record, ensure_ascii=False) for record in records), encoding='utf-8')
+    out, err = StringIO(), StringIO()
+    call_command('import_people', str(path), stdout=out, stderr=err)
+    assert 'Создано 1, обновлено 0, пропущено 4' in out.getvalue()
+    assert "slug - строка, а не ['x']" in err.getvalue()
+    assert 'missing: партнер не найден' in err.getvalue()
+    assert list(Person.objects.values_list('slug', flat=True)) == ['goncharova']
+
+
+@pytest.mark.django_db
+def test_import_from_stdin(monkeypatch, user):
+    """Импорт из stdin не закрывает его"""
+    stdin = StringIO(json.dumps(RECORDS[2], ensure_ascii=False))
+    monkeypatch.setattr('sys.stdin', stdin)
+    out = StringIO()
+    call_command('import_people', '-', stdout=out, stderr=StringIO())
+    assert 'Создано 1' in out.getvalue()
+    assert not stdin.closed
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('name', ['people.ndjson', 'people.csv'])
+def test_export_import_roundtrip(tmp_path, category, user, name):
+    """Выгруженный файл загружается обратно без изменений"""
+    tag = TagPost.objects.create(tag='Тег', slug='tag')
+    first = Person.objects.create(title='Первый', slug='first', gender='M', cat=category, author=user)
+    second = Person.objects.create(title='Вторая', slug='second', gender='F', cat=category, companion=first)
+    first.tag.add(tag)
+
+    path = tmp_path / name
+    call_command('export_people', str(path), chunk_size=1, stderr=StringIO())
+    exported = path.read_text(encoding='utf-8')
+
+    Person.objects.all().delete()
+    cache.clear()
+    call_command('import_people', str(path), stdout=StringIO(), stderr=StringIO())
+    call_command('export_people', str(path), stderr=StringIO())
+    assert path.read_text(encoding='utf-8') == exported
+    assert Person.objects.get(slug='second').companion.slug == 'first'
@@ -0,0 +1,72 @@
+import time
+
+import pytest
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from peoples import utils
+from peoples.models import Category
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+def test_cached_computes_once():
+    """Повторный вызов берет значение из кэша"""
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return 'value'
+
+    assert utils.cached('key', compute) == 'value'
+    assert utils.cached('key', compute) == 'value'
+    assert len(calls) == 1
+
+
+def test_cached_serves_stale_while_locked():
+    """Пока другой воркер держит блокировку, отдается устаревшее значение"""
+    cache.set('key', ('stale', time.time() - 1, 0), 60)
+    cache.add('key:lock', 1)
+    assert utils.cached('key', lambda: 'fresh') == 'stale'
+
+
+def test_cached_refreshes_expired_value():
+    """Истекшее значение пересчитывает воркер, взявший блокировку"""
+    cache.set('key', ('stale', time.time() - 1, 0), 60)
+    assert utils.cached('key', lambda: 'fresh') == 'fresh'
+    assert cache.get('key')[0] == 'fresh'
+    assert cache.get('key:lock') is None
+
+
+def test_cached_waits_for_lock_owner(monkeypatch):
+    """Без старого значения запрос ждет результат владельца блокировки, а не считает сам"""
+    cache.add('key:lock', 1)
+    monkeypatch.setattr(utils.time, 'sleep', lambda _: cache.set('key', ('computed', time.time() + 60, 0)))
+    assert utils.cached('key', lambda: pytest.fail('значение посчитано повторно')) == 'computed'
+
+
+def test_cached_releases_lock_on_error():
+    """Ошибка при вычислении не оставляет блокировку"""
+    with pytest.raises(ZeroDivisionError):
+        utils.cached('key', lambda: 1 / 0)
+    assert cache.get('key:lock') is None
+
+
+@pytest.mark.django_db
+def test_cached_pages(django_assert_num_queries):
+    """В кэш попадают количество и отдельные страницы, а не весь queryset"""
+    Category.objects.bulk_create(Category(name=f'Категория {n}', slug=f'cat-{n}') for n in range(7))
+    paginator = Paginator(utils.CachedPages('test_pages', Category.objects.order_by('pk')), 3)
+
+    with django_assert_num_queries(2):
+        page = paginator.page(2)
+        assert [c.slug for c in page] == ['cat-3', 'cat-4', 'cat-5']
+
+    paginator = Paginator(utils.CachedPages('test_pages', Category.objects.order_by('pk')), 3)
+    with django_assert_num_queries(0):
+        assert paginator.count == 7
+        assert len(paginator.page(2)) == 3
+    with django_assert_num_queries(1):
+        assert [c.slug for c in paginator.page(3)] == ['cat-6']
@@ -1,9 +1,12 @@
+from base64 import urlsafe_b64encode
+
 import pytest
 from django.urls import reverse
 from django.test import Client
 from pytest_django.asserts import assertRedirects
 from peoples.models import Person, Category, TagPost
 from django.core.cache import cache
+from peoples import utils
 from .test_models import user
 
 
@@ -252,4 +255,75 @@ def test_tag_post_list_view(client, published_person, tag):
     assert 'posts' in response.context
     assert response.context['title'] == 'Тег: ' + tag.tag
     assert all(tag in p.tag.all() for p in response.context['posts'])
-    assert response.status_code == 200
\ No newline at end of file
+    assert response.status_code == 200
+
+@pytest.mark.django_db
+def test_peoples_keyset_pagination(client, published_person):
+    """Постраничный переход по курсору вперед и назад"""
+    cache.clear()
+    for n in range(6):
+        Person.objects.create(title=f'Личность {n}', slug=f'person-{n}', gender=Person.Gender.MALE,
+                              cat=published_person.cat)
+    expected = list(Person.published.all())
+
+    response = client.get(reverse('peoples'), {'cursor': ''})
+    first_page = response.context['page_obj']
+    assert list(response.context['posts']) == expected[:5]
+    assert not first_page.has_previous()
+
+    response = client.get(reverse('peoples'), {'cursor': first_page.next_cursor})
+    second_page = response.context['page_obj']
+    assert list(response.context['posts']) == expected[5:]
+    assert not second_page.has_next()
+
+    response = client.get(reverse('peoples'), {'cursor': second_page.previous_cursor})
+    assert list(response.context['posts']) == expected[:5]
+
+
+@pytest.mark.django_db
+def test_numbered_pages_link_into_keyset(client, published_person, monkeypatch):
+    """С KEYSET_FROM_PAGE-й нумерованной страницы ссылка "дальше" ведет в режим курсора"""
+    cache.clear()
+    monkeypatch.setattr(utils, 'KEYSET_FROM_PAGE', 2)
+    for n in range(11):
+        Person.objects.create(title=f'Личность {n}', slug=f'person-{n}', gender=Person.Gender.MALE,
+                              cat=published_person.cat)
+    expected = list(Person.published.all())
+
+    first = client.get(reverse('peoples'), {'utm_source': 'mail'})
+    assert 'href="?page=2"' in first.content.decode()
+    second = client.get(reverse('peoples'), {'page': 2})
+    cursor = second.context['page_obj'].next_cursor
+    assert f'href="?cursor={cursor}"' in second.content.decode()
+
+    response = client.get(reverse('peoples'), {'cursor': cursor})
+    assert list(response.context['posts']) == expected[10:]
+    assert f'href="?cursor={response.context["page_obj"].previous_cursor}"' in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_pagination_links_keep_query(client, published_person):
+    """Ссылки пагинации сохраняют поисковый запрос, но не посторонние параметры"""
+    cache.clear()
+    for n in range(6):
+        Person.objects.create(title=f'Личность {n}', slug=f'person-{n}', gender=Person.Gender.MALE,
+                              cat=published_person.cat)
+    content = client.get(reverse('search'), {'q': 'Личность', 'utm_source': 'mail'}).content.decode()
+    assert 'href="?q=%D0%9B%D0%B8%D1%87%D0%BD%D0%BE%D1%81%D1%82%D1%8C&amp;page=2"' in content
+    assert 'utm_source' not in content
+
+@pytest.mark.django_db
+def test_peoples_keyset_invalid_cursor(client, published_person):
+    """Испорченный курсор - 404"""
+    response = client.get(reverse('peoples'), {'cursor': 'bad'})
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_keyset_cursor_out_of_range(client, published_person):
+    """Курсор с датой вне диапазона datetime - 404, а не ошибка сервера"""
+    cursor = urlsafe_b64encode(b'n99999999999999999999.1').decode().rstrip('=')
+    with pytest.raises(ValueError):
+        utils.decode_cursor(cursor)
+    assert client.get(reverse('peoples'), {'cursor': cursor}).status_code == 404
+    assert client.get(reverse('person-list'), {'cursor': cursor}).status_code == 404
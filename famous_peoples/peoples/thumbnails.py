@@ -0,0 +1,85 @@
+import logging
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+import peoples.models as m
+from peoples import tasks
+
+
+# Уменьшенные копии Person.photo. Их строит Celery-задача peoples.tasks.generate_thumbnails после сохранения
+# нового фото (или команда regenerate_thumbnails для всех сразу), а пути лежат в Person.thumbnails:
+# {"source": имя оригинала, "width": ширина оригинала, "sizes": {"160": "thumbs/photos/.../name_160w.jpg", ...}}.
+# Пока копии не готовы или относятся к другому файлу, шаблоны выводят оригинал
+
+WIDTHS = (160, 320, 640)
+QUALITY = 82
+THUMBS_DIR = 'thumbs'
+
+logger = logging.getLogger(__name__)
+
+
+def derivative_name(source, width):
+    root, _ = posixpath.splitext(source)
+    return posixpath.join(THUMBS_DIR, f'{root}_{width}w.jpg')
+
+
+def render(image, width):
+    copy = image.copy()
+    copy.thumbnail((width, width * 10), Image.LANCZOS)
+    if copy.mode != 'RGB':
+        # прозрачность заливается белым, JPEG ее не поддерживает
+        background = Image.new('RGB', copy.size, 'white')
+        background.paste(copy, mask=copy.getchannel('A') if 'A' in copy.getbands() else None)
+        copy = background
+    buffer = BytesIO()
+    copy.save(buffer, 'JPEG', quality=QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def generate(source, storage=default_storage):
+    """
+    Строит копии шириной из WIDTHS (не больше оригинала) и возвращает значение для Person.thumbnails.
+    Не трогает БД, поэтому подходит для пула процессов
+    """
+    with storage.open(source, 'rb') as f:
+        image = ImageOps.exif_transpose(Image.open(f))
+        image.load()
+
+    sizes = {}
+    for width in WIDTHS:
+        if width >= image.width and sizes:
+            break
+        name = derivative_name(source, width)
+        if storage.exists(name):
+            storage.delete(name)
+        sizes[str(width)] = storage.save(name, ContentFile(render(image, width)))
+    return {'source': source, 'width': image.width, 'sizes': sizes}
+
+
+def safe_generate(source):
+    """generate() для задач и команды: битый или пропавший файл не повод для повторов - копий просто нет"""
+    try:
+        return generate(source)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+        logger.warning('Не удалось построить миниатюры %s: %s', source, e)
+        return {'source': source, 'sizes': {}}
+
+
+def is_stale(photo, thumbnails):
+    return (thumbnails or {}).get('source') != (photo or None) and bool(photo or thumbnails)
+
+
+@receiver(post_save, sender=m.Person)
+def person_photo_changed(sender, instance, **kwargs):
+    if 'photo' not in instance.__dict__ or 'thumbnails' not in instance.__dict__:
+        return
+    if is_stale(instance.photo.name, instance.thumbnails):
+        pk = instance.pk
+        transaction.on_commit(lambda: tasks.generate_thumbnails.delay(pk))
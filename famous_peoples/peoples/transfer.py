@@ -0,0 +1,206 @@
+import csv
+import itertools
+import json
+import time
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+import peoples.models as m
+from peoples import counters, excerpts, utils
+
+
+# Потоковый импорт и экспорт личностей (команды import_people и export_people). Одна запись - одна личность,
+# связи задаются slug'ами, поэтому файл переносится между базами с разными pk:
+# {"slug", "title", "content", "is_published", "gender", "photo", "cat", "tags": [...], "companion", "author"}
+# В CSV те же колонки, теги разделяются TAGS_SEPARATOR. Файл читается и пишется частями по chunk_size записей.
+# Импорт идет одной транзакцией: строка, которая не читается как запись, отменяет его целиком (FormatError)
+
+FIELDS = ('slug', 'title', 'content', 'is_published', 'gender', 'photo', 'cat', 'tags', 'companion', 'author')
+UPDATE_FIELDS = ('title', 'content', 'excerpt', 'excerpt_html', 'is_published', 'gender', 'photo', 'cat', 'author',
+                 'time_update')
+TAGS_SEPARATOR = '|'
+CHUNK_SIZE = 2000
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+class FormatError(ValueError):
+    def __init__(self, line, message):
+        super().__init__(f'строка {line}: {message}')
+        self.line = line
+
+
+def read_records(stream, fmt):
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        try:
+            for row in reader:
+                row['tags'] = [tag for tag in (row.get('tags') or '').split(TAGS_SEPARATOR) if tag]
+                yield row
+        except csv.Error as e:
+            raise FormatError(reader.line_num, e) from e
+    else:
+        for number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise FormatError(number, e.msg) from e
+            if not isinstance(record, dict):
+                raise FormatError(number, 'ожидается объект JSON')
+            yield record
+
+
+def write_records(stream, records, fmt):
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, FIELDS)
+        writer.writeheader()
+        for record in records:
+            writer.writerow({**record, 'tags': TAGS_SEPARATOR.join(record['tags'])})
+    else:
+        for record in records:
+            stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def export_records(queryset, chunk_size=CHUNK_SIZE):
+    """Записи для экспорта; теги запрашиваются одним запросом на каждые chunk_size личностей"""
+    rows = (queryset.order_by('pk')
+            .values_list('pk', 'slug', 'title', 'content', 'is_published', 'gender', 'photo', 'cat__slug',
+                         'companion__slug', 'author__username')
+            .iterator(chunk_size=chunk_size))
+    for chunk in chunked(rows, chunk_size):
+        tags = defaultdict(list)
+        through = m.Person.tag.through.objects.filter(person_id__in=[row[0] for row in chunk])
+        for person_id, slug in through.order_by('tagpost__slug').values_list('person_id', 'tagpost__slug'):
+            tags[person_id].append(slug)
+        for pk, slug, title, content, is_published, gender, photo, cat, companion, author in chunk:
+            yield {'slug': slug, 'title': title, 'content': content, 'is_published': is_published, 'gender': gender,
+                   'photo': photo or '', 'cat': cat, 'tags': tags[pk], 'companion': companion, 'author': author}
+
+
+class Importer:
+    """
+    Загружает записи частями: каждая часть - bulk_create(update_conflicts) по slug, весь импорт - одна транзакция.
+    Категории и теги ищутся по словарям slug -> pk (неизвестные создаются), партнеры связываются
+    вторым проходом через PersonQuerySet.link_companions, когда все личности уже в базе
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.categories = dict(m.Category.objects.values_list('slug', 'pk'))
+        self.tags = dict(m.TagPost.objects.values_list('slug', 'pk'))
+        # (pk, slug партнера или None) - в памяти только личности, у которых меняется партнер
+        self.companions = []
+        self.stats = {'created': 0, 'updated': 0, 'skipped': 0, 'linked': 0}
+        self.errors = []
+
+    def resolve(self, mapping, model, slug, **fields):
+        if slug not in mapping:
+            mapping[slug] = model.objects.get_or_create(slug=slug, defaults=fields)[0].pk
+        return mapping[slug]
+
+    def build(self, record, users):
+        for field in ('slug', 'title', 'cat', 'author', 'companion', 'content', 'photo'):
+            if record.get(field) is not None and not isinstance(record[field], str):
+                raise ValueError(f'{field} - строка, а не {record[field]!r}')
+        if not record.get('slug') or not record.get('title') or not record.get('cat'):
+            raise ValueError('нужны slug, title и cat')
+        gender = record.get('gender') or ''
+        if gender not in m.Person.Gender.values:
+            raise ValueError(f'неизвестный пол {gender!r}')
+        is_published = record.get('is_published')
+        try:
+            is_published = m.Person.Status.PUBLISHED if is_published in (None, '') else int(is_published)
+        except TypeError:
+            raise ValueError(f'неизвестный статус {is_published!r}')
+        if is_published not in m.Person.Status.values:
+            raise ValueError(f'неизвестный статус {is_published!r}')
+        tags = record.get('tags') or []
+        if not isinstance(tags, list) or not all(isinstance(tag, str) and tag for tag in tags):
+            raise ValueError(f'tags - список slug тегов, а не {tags!r}')
+        person = m.Person(
+            slug=record['slug'], title=record['title'], content=record.get('content') or '',
+            is_published=is_published, gender=gender,
+            photo=record.get('photo') or None, author_id=users.get(record.get('author')),
+            cat_id=self.resolve(self.categories, m.Category, record['cat'], name=record['cat']),
+        )
+        # bulk_create не вызывает save(), превью заполняется здесь
+        excerpts.fill(person)
+        return person
+
+    def load_chunk(self, records):
+        User = get_user_model()
+        # неверные значения отсеет build()
+        usernames = {author for record in records if isinstance(author := record.get('author'), str) and author}
+        users = dict(User.objects.filter(username__in=usernames).values_list('username', 'pk'))
+
+        persons = {}
+        for record in records:
+            try:
+                persons[record['slug']] = (self.build(record, users), record)
+            except (KeyError, ValueError) as e:
+                self.stats['skipped'] += 1
+                self.errors.append(f"{record.get('slug')}: {e}")
+
+        with transaction.atomic():
+            existing = set(m.Person.objects.filter(slug__in=persons).values_list('slug', flat=True))
+            m.Person.objects.bulk_create([person for person, _ in persons.values()], update_conflicts=True,
+                                         unique_fields=['slug'], update_fields=UPDATE_FIELDS)
+            pks = dict(m.Person.objects.filter(slug__in=persons).values_list('slug', 'pk'))
+
+            Through = m.Person.tag.through
+            Through.objects.filter(person_id__in=pks.values()).delete()
+            Through.objects.bulk_create([
+                Through(person_id=pks[slug], tagpost_id=self.resolve(self.tags, m.TagPost, tag, tag=tag))
+                for slug, (_, record) in persons.items() for tag in set(record.get('tags') or ())
+            ], ignore_conflicts=True)
+
+            # страницы обновленных личностей могли быть в кэше; сигналы bulk_create не отправляет
+            namespaces = [key(value) for slug in existing
+                          for key, value in ((utils.detail_cache_key, slug), (utils.api_person_cache_key, pks[slug]))]
+            transaction.on_commit(lambda: utils.reset_cache_versions(namespaces))
+
+        # у существующих личностей пустой партнер в файле разрывает пару
+        self.companions += [(pks[slug], record.get('companion') or None) for slug, (_, record) in persons.items()
+                            if record.get('companion') or slug in existing and 'companion' in record]
+        self.stats['updated'] += len(existing)
+        self.stats['created'] += len(persons) - len(existing)
+
+    def link_companions(self):
+        for chunk in chunked(self.companions, self.chunk_size):
+            slugs = {slug for _, slug in chunk} - {None}
+            pks = dict(m.Person.objects.filter(slug__in=slugs).values_list('slug', 'pk'))
+            self.errors += [f'{slug}: партнер не найден' for slug in sorted(slugs - pks.keys())]
+            pairs = {pk: pks.get(slug) for pk, slug in chunk if slug is None or slug in pks}
+            try:
+                self.stats['linked'] += m.Person.objects.link_companions(pairs)
+            except ValueError as e:
+                self.errors.append(str(e))
+
+    def run(self, records):
+        started = time.monotonic()
+        with transaction.atomic():
+            for chunk in chunked(records, self.chunk_size):
+                self.load_chunk(chunk)
+            self.link_companions()
+
+            counters.rebuild()
+            transaction.on_commit(lambda: utils.reset_cache_versions(catalogue_cache_namespaces()))
+        self.stats['seconds'] = round(time.monotonic() - started, 2)
+        return self.stats
+
+
+def catalogue_cache_namespaces():
+    """Списки, сайдбар, поиск и подсказки - все, что строится по множеству личностей"""
+    return [utils.ALL_CACHE_KEY, *utils.GENDER_CACHE_KEYS.values(), utils.API_LIST_CACHE_KEY,
+            utils.SEARCH_CACHE_KEY, utils.AUTOCOMPLETE_CACHE_KEY, utils.SIDEBAR_CATEGORIES_CACHE_KEY,
+            utils.SIDEBAR_TAGS_CACHE_KEY,
+            *map(utils.category_cache_key, m.Category.objects.values_list('slug', flat=True)),
+            *map(utils.tag_cache_key, m.TagPost.objects.values_list('slug', flat=True))]
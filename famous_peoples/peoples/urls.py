@@ -18,8 +18,10 @@ urlpatterns = [
     path('contact/', contact, name='contact'),
     path('category/<slug:cat_slug>/', Category.as_view(), name='category'),
     path('tag/<slug:tag_slug>/', TagPostList.as_view(), name='tag'),
+    path('search/', Search.as_view(), name='search'),
     path('edit/<slug:slug>/', UpdatePage.as_view(), name='edit_page'),
     path('person-autocomplete/', PersonAutocomplete.as_view(), name='person-autocomplete'),
+    path('metrics/', prometheus_metrics, name='metrics'),
     path('api/', include(router.urls), name='persons-api'),
     path('api/category-delete/<int:pk>/', CategoryAPIDestroy.as_view(), name='category-delete'),
 ]
\ No newline at end of file
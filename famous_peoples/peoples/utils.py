@@ -1,7 +1,23 @@
+import asyncio
+import math
+import random
+import time
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.http import Http404
+
+from peoples import metrics, records
+
+
 menu = [
     {'title': "Все", 'url_name': 'peoples'},
     {'title': "Мужчины", 'url_name': 'men'},
     {'title': "Женщины", 'url_name': 'women'},
+    {'title': "Поиск", 'url_name': 'search'},
     {'title': "Обратная связь", 'url_name': 'contact'},
     {'title': "О сайте", 'url_name': 'about'},
 ]
@@ -18,3 +34,488 @@ class DataMixin:
         context.update(kwargs)
         return context
 
+
+class KeysetPaginationMixin:
+    """
+    Для ListView: с параметром ?cursor= страница выбирается по курсору (time_create, id), а не через OFFSET.
+    Нумерованные страницы с KEYSET_FROM_PAGE-й ведут дальше по курсору (link_keyset)
+    """
+    cursor_kwarg = 'cursor'
+
+    def paginate_queryset(self, queryset, page_size):
+        if (cursor := self.request.GET.get(self.cursor_kwarg)) is None:
+            paginator, page, object_list, is_paginated = super().paginate_queryset(queryset, page_size)
+            return paginator, link_keyset(page), object_list, is_paginated
+
+        try:
+            if isinstance(queryset, CachedPages):
+                page = queryset.keyset_page(cursor, page_size)
+            else:
+                page = keyset_page(queryset, cursor, page_size)
+        except ValueError:
+            raise Http404('Неверный курсор')
+        if not page.object_list and not self.get_allow_empty():
+            raise Http404('Пустая страница')
+        return None, page, page.object_list, page.has_other_pages()
+
+
+# Пространства имен кэша. У каждого есть счетчик версии в кэше, и все ключи строятся через versioned_key(),
+# поэтому peoples/invalidation.py не удаляет ключи, а поднимает версию - старые ключи просто перестают читаться
+# и доживают свой TTL. Так читатель, получивший данные до изменения, не может записать их под актуальный ключ
+CACHE_TIMEOUT = 60 * 60 * 6
+DETAIL_CACHE_TIMEOUT = 60 * 60 * 12
+# Защита от лавины запросов: после истечения значение еще STALE_TIMEOUT секунд хранится в кэше и отдается,
+# пока один воркер (взявший блокировку на LOCK_TIMEOUT) считает новое
+STALE_TIMEOUT = 60 * 10
+# Счетчик версии живет не дольше самых долгих записей под ним. Истечь он может безопасно: новый счетчик начнется
+# с текущего времени (_initial_version) и будет больше всех прежних
+VERSION_TIMEOUT = DETAIL_CACHE_TIMEOUT + STALE_TIMEOUT
+
+ALL_CACHE_KEY = 'peoples_all'
+GENDER_CACHE_KEYS = {'M': 'peoples_men', 'F': 'peoples_women'}
+API_LIST_CACHE_KEY = 'api_person_list'
+# названия категорий и тегов в ответах API c ?expand=: одна версия на все страницы личностей вместо версии каждой
+API_RELATIONS_CACHE_KEY = 'api_person_relations'
+SIDEBAR_CATEGORIES_CACHE_KEY = 'peoples_sidebar_categories'
+SIDEBAR_TAGS_CACHE_KEY = 'peoples_sidebar_tags'
+SEARCH_CACHE_KEY = 'peoples_search'
+AUTOCOMPLETE_CACHE_KEY = 'peoples_autocomplete'
+
+
+def category_cache_key(slug):
+    return f'peoples_category_{slug}'
+
+
+def tag_cache_key(slug):
+    return f'peoples_tag_{slug}'
+
+
+def detail_cache_key(slug):
+    return f'peoples_detail_{slug}'
+
+
+def api_person_cache_key(pk):
+    return f'api_person_{pk}'
+
+
+def api_person_key_parts(fieldset):
+    """Часть ключа страницы личности в API; с развернутыми категорией или тегами - и их общая версия"""
+    if not fieldset.related:
+        return fieldset.key_parts
+    return (*fieldset.key_parts, 'r', get_cache_version(API_RELATIONS_CACHE_KEY))
+
+
+async def aapi_person_key_parts(fieldset):
+    if not fieldset.related:
+        return fieldset.key_parts
+    return (*fieldset.key_parts, 'r', await aget_cache_version(API_RELATIONS_CACHE_KEY))
+
+
+def _initial_version():
+    # Если счетчик вытеснен из кэша, новая версия все равно будет больше всех прежних
+    return time.time_ns() // 1000
+
+
+def get_cache_version(namespace):
+    version_key = f'{namespace}:version'
+    if (version := cache.get(version_key)) is None:
+        version = _initial_version()
+        if not cache.add(version_key, version, VERSION_TIMEOUT):
+            version = cache.get(version_key, version)
+    return version
+
+
+def make_key(namespace, version, parts):
+    return ':'.join(map(str, (namespace, f'v{version}', *parts)))
+
+
+def versioned_key(namespace, *parts):
+    return make_key(namespace, get_cache_version(namespace), parts)
+
+
+async def aget_cache_version(namespace):
+    version_key = f'{namespace}:version'
+    if (version := await cache.aget(version_key)) is None:
+        version = _initial_version()
+        if not await cache.aadd(version_key, version, VERSION_TIMEOUT):
+            version = await cache.aget(version_key, version)
+    return version
+
+
+async def aversioned_key(namespace, *parts):
+    return make_key(namespace, await aget_cache_version(namespace), parts)
+
+
+def bump_cache_versions(namespaces):
+    for namespace in namespaces:
+        version_key = f'{namespace}:version'
+        try:
+            cache.incr(version_key)
+        except ValueError:
+            cache.set(version_key, _initial_version(), VERSION_TIMEOUT)
+
+
+def reset_cache_versions(namespaces):
+    """Как bump_cache_versions, но одним запросом к кэшу: новый счетчик начнется с текущего времени"""
+    cache.delete_many([f'{namespace}:version' for namespace in namespaces])
+
+
+LOCK_TIMEOUT = 10
+LOCK_POLL_INTERVAL = 0.05
+EARLY_REFRESH_BETA = 1.0
+
+
+def entry_for(value, timeout, delta):
+    # время логического истечения и длительность вычисления для XFetch
+    return value, time.time() + timeout, delta
+
+
+def store(key, value, timeout, delta):
+    cache.set(key, entry_for(value, timeout, delta), timeout + STALE_TIMEOUT)
+
+
+def cached(key, compute, timeout=CACHE_TIMEOUT):
+    """
+    Значение из кэша или результат compute() с single-flight и stale-while-revalidate.
+
+    Вместе со значением хранится время логического истечения и длительность вычисления: чем дороже
+    вычисление, тем раньше до истечения один из запросов (вероятностно, XFetch) начнет пересчет.
+    """
+    entry = cache.get(key)
+    metrics.record_cache(key, hit=entry is not None)
+    if entry is not None:
+        value, expires, delta = entry
+        if time.time() - delta * EARLY_REFRESH_BETA * math.log(1 - random.random()) < expires:
+            return value
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            start = time.monotonic()
+            value = compute()
+            store(key, value, timeout, time.monotonic() - start)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    if entry is not None:
+        return entry[0]
+
+    # Старого значения нет (первый запрос или новая версия) - ждем, пока его посчитает владелец блокировки
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        if (entry := cache.get(key)) is not None:
+            return entry[0]
+        if cache.get(lock_key) is None:
+            break
+    return compute()
+
+
+async def acached(key, compute, timeout=CACHE_TIMEOUT):
+    """cached() для асинхронных представлений: compute - корутинная функция, кэш читается через async API"""
+    entry = await cache.aget(key)
+    metrics.record_cache(key, hit=entry is not None)
+    if entry is not None:
+        value, expires, delta = entry
+        if time.time() - delta * EARLY_REFRESH_BETA * math.log(1 - random.random()) < expires:
+            return value
+
+    lock_key = f'{key}:lock'
+    if await cache.aadd(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            start = time.monotonic()
+            value = await compute()
+            await cache.aset(key, entry_for(value, timeout, time.monotonic() - start), timeout + STALE_TIMEOUT)
+        finally:
+            await cache.adelete(lock_key)
+        return value
+
+    if entry is not None:
+        return entry[0]
+
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+        if (entry := await cache.aget(key)) is not None:
+            return entry[0]
+        if await cache.aget(lock_key) is None:
+            break
+    return await compute()
+
+
+# Пространства имен одного объекта (личность по slug или pk, категория и тег по slug) берутся из URL, поэтому
+# счетчик версии создается, только когда объект нашелся: иначе случайные URL и 404 копили бы счетчики в кэше.
+# found(value) - нашелся ли объект; исключение compute() (Http404, DoesNotExist) счетчик тоже не создает.
+# Версия берется до чтения данных: если изменение закоммитится раньше, инвалидация сама создаст счетчик,
+# cache.add() не пройдет и прочитанное значение в кэш не попадет
+
+def _cached_new_version(namespace, parts, compute, timeout, found):
+    # (значение, версия или None, если счетчик не создан)
+    version = _initial_version()
+    start = time.monotonic()
+    key = make_key(namespace, version, parts)
+    metrics.record_cache(key, hit=False)
+    value = compute()
+    if (found is None or found(value)) and cache.add(f'{namespace}:version', version, VERSION_TIMEOUT):
+        store(key, value, timeout, time.monotonic() - start)
+        return value, version
+    return value, None
+
+
+async def _acached_new_version(namespace, parts, compute, timeout, found):
+    version = _initial_version()
+    start = time.monotonic()
+    key = make_key(namespace, version, parts)
+    metrics.record_cache(key, hit=False)
+    value = await compute()
+    if (found is None or found(value)) and await cache.aadd(f'{namespace}:version', version, VERSION_TIMEOUT):
+        await cache.aset(key, entry_for(value, timeout, time.monotonic() - start), timeout + STALE_TIMEOUT)
+        return value, version
+    return value, None
+
+
+def cached_versioned(namespace, parts, compute, timeout=CACHE_TIMEOUT, found=None):
+    """cached(versioned_key(namespace, *parts), compute), но без счетчика версии для несуществующего объекта"""
+    if (version := cache.get(f'{namespace}:version')) is not None:
+        return cached(make_key(namespace, version, parts), compute, timeout)
+    return _cached_new_version(namespace, parts, compute, timeout, found)[0]
+
+
+async def acached_versioned(namespace, parts, compute, timeout=CACHE_TIMEOUT, found=None):
+    if (version := await cache.aget(f'{namespace}:version')) is not None:
+        return await acached(make_key(namespace, version, parts), compute, timeout)
+    return (await _acached_new_version(namespace, parts, compute, timeout, found))[0]
+
+
+class CachedPages:
+    """
+    Замена queryset для Paginator: в кэш попадают общее количество и отдельные срезы (страницы),
+    поэтому размер значения и стоимость распаковки не зависят от размера таблицы.
+    Срезы хранятся в компактном формате codec (peoples/records.py)
+    """
+
+    def __init__(self, namespace, queryset, timeout=CACHE_TIMEOUT, serialize=list, key_parts=(),
+                 codec=records.OBJECTS):
+        self.namespace = namespace
+        # key_parts различают несколько списков в одном пространстве имен (например, разные поисковые запросы)
+        self.key_parts = key_parts
+        self.queryset = queryset
+        self.timeout = timeout
+        # serialize превращает срез queryset в то, что упаковывает codec (например, данные сериализатора DRF)
+        self.serialize = serialize
+        self.codec = codec
+        # версия читается один раз на объект; счетчик создается по первой непустой выборке (cached_versioned)
+        self.version = None
+
+    def found(self, packed):
+        return bool(self.codec.unpack(packed))
+
+    def cached(self, parts, compute, found):
+        parts = (*self.key_parts, *parts)
+        if self.version is None:
+            self.version = cache.get(f'{self.namespace}:version')
+        if self.version is not None:
+            return cached(make_key(self.namespace, self.version, parts), compute, self.timeout)
+        value, self.version = _cached_new_version(self.namespace, parts, compute, self.timeout, found)
+        return value
+
+    def count(self):
+        return self.cached(('count', ), self.queryset.count, bool)
+
+    def exists(self):
+        return self.count() > 0
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self.queryset[item]
+        start, stop = item.start or 0, item.stop
+        packed = self.cached((self.codec.name, 'slice', start, stop),
+                             lambda: self.codec.pack(self.serialize(self.queryset[start:stop])), self.found)
+        return self.codec.unpack(packed)
+
+    def keyset_page(self, cursor, per_page):
+        decode_cursor(cursor)
+
+        def compute():
+            page = keyset_page(self.queryset, cursor, per_page)
+            page.object_list = self.codec.pack(self.serialize(page.object_list))
+            return page
+
+        page = self.cached((self.codec.name, 'seek', cursor, per_page), compute,
+                           lambda page: self.found(page.object_list))
+        return KeysetPage(self.codec.unpack(page.object_list), page.next_cursor, page.previous_cursor)
+
+
+class AsyncCachedPages:
+    """
+    CachedPages для асинхронных представлений: те же ключи, но кэш и ORM вызываются через async API.
+    Paginator синхронный, поэтому страница собирается в apage()
+    """
+
+    def __init__(self, namespace, queryset, timeout=CACHE_TIMEOUT, serialize=list, key_parts=(),
+                 codec=records.OBJECTS):
+        self.namespace = namespace
+        self.key_parts = key_parts
+        self.queryset = queryset
+        self.timeout = timeout
+        self.serialize = serialize
+        self.codec = codec
+        self.version = None
+
+    async def aprepare(self):
+        self.version = await cache.aget(f'{self.namespace}:version')
+        return self
+
+    found = CachedPages.found
+
+    async def acached(self, parts, compute, found):
+        parts = (*self.key_parts, *parts)
+        if self.version is None:
+            self.version = await cache.aget(f'{self.namespace}:version')
+        if self.version is not None:
+            return await acached(make_key(self.namespace, self.version, parts), compute, self.timeout)
+        value, self.version = await _acached_new_version(self.namespace, parts, compute, self.timeout, found)
+        return value
+
+    async def acount(self):
+        return await self.acached(('count', ), self.queryset.acount, bool)
+
+    async def aslice(self, start, stop):
+        async def compute():
+            return self.codec.pack(self.serialize([row async for row in self.queryset[start:stop]]))
+
+        return self.codec.unpack(await self.acached((self.codec.name, 'slice', start, stop), compute, self.found))
+
+    async def apage(self, number, per_page, allow_empty_first_page=True):
+        """django.core.paginator.Page; InvalidPage, если номера нет"""
+        count = await self.acount()
+        paginator = Paginator(CountOnly(count), per_page, allow_empty_first_page=allow_empty_first_page)
+        number = paginator.num_pages if number == 'last' else paginator.validate_number(number)
+        bottom = (number - 1) * per_page
+        top = min(bottom + per_page, count)
+        return Page(await self.aslice(bottom, top) if top > bottom else [], number, paginator)
+
+    async def akeyset_page(self, cursor, per_page):
+        decode_cursor(cursor)
+
+        async def compute():
+            page = await akeyset_page(self.queryset, cursor, per_page)
+            page.object_list = self.codec.pack(self.serialize(page.object_list))
+            return page
+
+        page = await self.acached((self.codec.name, 'seek', cursor, per_page), compute,
+                                  lambda page: self.found(page.object_list))
+        return KeysetPage(self.codec.unpack(page.object_list), page.next_cursor, page.previous_cursor)
+
+
+class CountOnly:
+    """Объект для Paginator, у которого известно только количество"""
+
+    def __init__(self, count):
+        self._count = count
+
+    def count(self):
+        return self._count
+
+
+# Keyset-пагинация по индексу (-time_create, -id). Курсор - непрозрачная строка с направлением
+# и позицией граничной записи, поэтому любая страница выбирается одним запросом по индексу без OFFSET и COUNT
+EPOCH = records.EPOCH
+
+
+def encode_cursor(obj, backwards=False):
+    micros = (obj.time_create - EPOCH) // timedelta(microseconds=1)
+    raw = f"{'p' if backwards else 'n'}{micros}.{obj.pk}"
+    return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(time_create, pk, backwards) из курсора; пустой курсор - первая страница. ValueError, если курсор испорчен"""
+    if not cursor:
+        return None
+    raw = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+    direction, position = raw[:1], raw[1:]
+    if direction not in ('n', 'p'):
+        raise ValueError(f'Неверный курсор: {cursor}')
+    micros, pk = position.split('.')
+    try:
+        time_create = EPOCH + timedelta(microseconds=int(micros))
+    except OverflowError:
+        # поддельный курсор с датой вне диапазона datetime
+        raise ValueError(f'Неверный курсор: {cursor}') from None
+    return time_create, int(pk), direction == 'p'
+
+
+# с этой нумерованной страницы ссылка "дальше" ведет в режим курсора: OFFSET глубоких страниц читает все строки до них
+KEYSET_FROM_PAGE = 5
+
+
+def link_keyset(page):
+    """Курсор следующей страницы (next_cursor) у нумерованной страницы списка, упорядоченного по -time_create, -id"""
+    if page.number >= KEYSET_FROM_PAGE and page.has_next():
+        page.next_cursor = encode_cursor(page.object_list[-1])
+    return page
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def _keyset_rows(queryset, cursor):
+    position = decode_cursor(cursor)
+    backwards = False
+    if position is None:
+        rows = queryset.order_by('-time_create', '-pk')
+    else:
+        time_create, pk, backwards = position
+        if backwards:
+            rows = queryset.filter(Q(time_create__gt=time_create) | Q(time_create=time_create, pk__gt=pk))
+            rows = rows.order_by('time_create', 'pk')
+        else:
+            rows = queryset.filter(Q(time_create__lt=time_create) | Q(time_create=time_create, pk__lt=pk))
+            rows = rows.order_by('-time_create', '-pk')
+    return rows, position, backwards
+
+
+def _keyset_result(rows, per_page, position, backwards):
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not rows:
+        return KeysetPage(rows)
+    if backwards:
+        rows.reverse()
+        return KeysetPage(rows, encode_cursor(rows[-1]), encode_cursor(rows[0], backwards=True) if has_more else None)
+    return KeysetPage(rows, encode_cursor(rows[-1]) if has_more else None,
+                      encode_cursor(rows[0], backwards=True) if position is not None else None)
+
+
+def keyset_page(queryset, cursor, per_page):
+    rows, position, backwards = _keyset_rows(queryset, cursor)
+    return _keyset_result(list(rows[:per_page + 1]), per_page, position, backwards)
+
+
+async def akeyset_page(queryset, cursor, per_page):
+    rows, position, backwards = _keyset_rows(queryset, cursor)
+    return _keyset_result([row async for row in rows[:per_page + 1]], per_page, position, backwards)
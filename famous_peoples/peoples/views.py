@@ -1,12 +1,14 @@
 from dal_select2.views import Select2QuerySetView
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import HttpResponseNotFound
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse, HttpResponseNotFound
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic import ListView, DetailView, CreateView, UpdateView
 from peoples import forms
 import peoples.models as m
-from peoples.utils import DataMixin
-from django.core.cache import cache
+from peoples import autocomplete, metrics, records, search, utils
+from peoples.utils import DataMixin, KeysetPaginationMixin
 
 
 def page_not_found(request, exception):
@@ -17,7 +19,7 @@ def home(request):
     return render(request, "peoples/home.html")
 
 
-class Peoples(DataMixin, ListView):
+class Peoples(DataMixin, KeysetPaginationMixin, ListView):
     template_name = 'peoples/index.html'
     context_object_name = 'posts'
     paginate_by = 5
@@ -26,14 +28,10 @@ class Peoples(DataMixin, ListView):
         return self.get_mixin_context(super().get_context_data(**kwargs), title='Все личности')
 
     def get_queryset(self):
-        cache_key = 'peoples_all'
-        if (queryset := cache.get(cache_key)) is None:
-            queryset = list(m.Person.published.all().select_related('cat'))
-            cache.set(cache_key, queryset, 60 * 15)
-        return queryset
+        return utils.CachedPages(utils.ALL_CACHE_KEY, m.Person.published.for_list(), codec=records.PEOPLE)
 
 
-class Men(DataMixin, ListView):
+class Men(DataMixin, KeysetPaginationMixin, ListView):
     template_name = 'peoples/index.html'
     context_object_name = 'posts'
     allow_empty = False
@@ -42,14 +40,11 @@ class Men(DataMixin, ListView):
         return self.get_mixin_context(super().get_context_data(**kwargs), title='Мужчины')
 
     def get_queryset(self):
-        cache_key = 'peoples_men'
-        if (queryset := cache.get(cache_key)) is None:
-            queryset = list(m.Person.published.filter(gender='M').select_related('cat'))
-            cache.set(cache_key, queryset, 60 * 15)
-        return queryset
+        return utils.CachedPages(utils.GENDER_CACHE_KEYS['M'], m.Person.published.filter(gender='M').for_list(),
+                                 codec=records.PEOPLE)
 
 
-class Women(DataMixin, ListView):
+class Women(DataMixin, KeysetPaginationMixin, ListView):
     template_name = 'peoples/index.html'
     context_object_name = 'posts'
     allow_empty = False
@@ -58,14 +53,11 @@ class Women(DataMixin, ListView):
         return self.get_mixin_context(super().get_context_data(**kwargs), title='Женщины')
 
     def get_queryset(self):
-        cache_key = 'peoples_women'
-        if (queryset := cache.get(cache_key)) is None:
-            queryset = list(m.Person.published.filter(gender='F').select_related('cat'))
-            cache.set(cache_key, queryset, 60 * 15)
-        return queryset
+        return utils.CachedPages(utils.GENDER_CACHE_KEYS['F'], m.Person.published.filter(gender='F').for_list(),
+                                 codec=records.PEOPLE)
 
 
-class Category(DataMixin, ListView):
+class Category(DataMixin, KeysetPaginationMixin, ListView):
     template_name = 'peoples/index.html'
     context_object_name = 'posts'
     allow_empty = False
@@ -75,13 +67,31 @@ class Category(DataMixin, ListView):
         cat = context['posts'][0].cat
         return self.get_mixin_context(context, title='Категория - ' + cat.name, cat_selected=cat.id)
 
+    @staticmethod
+    def pages(slug):
+        return utils.CachedPages(utils.category_cache_key(slug), m.Person.published.filter(cat__slug=slug).for_list(),
+                                 codec=records.PEOPLE)
+
+    def get_queryset(self):
+        return self.pages(self.kwargs['cat_slug'])
+
+
+class Search(DataMixin, ListView):
+    template_name = 'peoples/search.html'
+    context_object_name = 'posts'
+    paginate_by = 5
+
+    def get_context_data(self, *, object_list=None, **kwargs):
+        context = super().get_context_data(**kwargs)
+        return self.get_mixin_context(context, title=f'Поиск: {self.query}' if self.query else 'Поиск',
+                                      search_query=self.query)
+
     def get_queryset(self):
-        slug = self.kwargs['cat_slug']
-        cache_key = f'peoples_category_{slug}'
-        if (queryset := cache.get(cache_key)) is None:
-            queryset = list(m.Person.published.filter(cat__slug=slug).select_related('cat'))
-            cache.set(cache_key, queryset, 60 * 15)
-        return queryset
+        self.query = self.request.GET.get('q', '').strip()
+        if not self.query:
+            return []
+        return utils.CachedPages(utils.SEARCH_CACHE_KEY, search.search(m.Person.published.for_list(), self.query),
+                                 key_parts=(search.query_key(self.query), ), codec=records.PEOPLE)
 
 
 class ShowPost(DataMixin, DetailView):
@@ -93,13 +103,22 @@ class ShowPost(DataMixin, DetailView):
         context = super().get_context_data(**kwargs)
         return self.get_mixin_context(context, title=context['post'])
 
+    @staticmethod
+    def cached_post(slug):
+        return utils.cached_versioned(utils.detail_cache_key(slug), (),
+                                      lambda: get_object_or_404(m.Person.published.for_detail(), slug=slug),
+                                      utils.DETAIL_CACHE_TIMEOUT)
+
     def get_object(self):
-        slug = self.kwargs[self.slug_url_kwarg]
-        cache_key = f'peoples_detail_{slug}'
-        if (obj := cache.get(cache_key)) is None:
-            obj = get_object_or_404(m.Person.published, slug=slug)
-            cache.set(cache_key, obj, 60 * 30)
-        return obj
+        return self.cached_post(self.kwargs[self.slug_url_kwarg])
+
+
+def prometheus_metrics(request):
+    """Счетчики всех воркеров в текстовом формате Prometheus; доступ - персонал и INTERNAL_IPS"""
+    if not (request.user.is_staff or request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS):
+        raise PermissionDenied
+    metrics.aggregate.flush()
+    return HttpResponse(metrics.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 
 def about(request):
@@ -152,7 +171,7 @@ def contact(request):
     return render(request, 'peoples/contact.html', {'form': form, 'title': 'Обратная связь'})
 
 
-class TagPostList(DataMixin, ListView):
+class TagPostList(DataMixin, KeysetPaginationMixin, ListView):
     template_name = 'peoples/index.html'
     context_object_name = 'posts'
     allow_empty = False
@@ -162,22 +181,25 @@ class TagPostList(DataMixin, ListView):
         tag = m.TagPost.objects.get(slug=self.kwargs['tag_slug'])
         return self.get_mixin_context(context, title='Тег: ' + tag.tag)
 
+    @staticmethod
+    def pages(slug):
+        return utils.CachedPages(utils.tag_cache_key(slug), m.Person.published.filter(tag__slug=slug).for_list(),
+                                 codec=records.PEOPLE)
+
     def get_queryset(self):
-        slug = self.kwargs['tag_slug']
-        cache_key = f'peoples_tag_{slug}'
-        if (queryset := cache.get(cache_key)) is None:
-            queryset = list(m.Person.published.filter(tag__slug=slug).select_related('cat'))
-            cache.set(cache_key, queryset, 60 * 15)
-        return queryset
+        return self.pages(self.kwargs['tag_slug'])
 
 class PersonAutocomplete(Select2QuerySetView):
+    """Подсказки для выбора партнера: строки {'id', 'title', 'gender'} из peoples/autocomplete.py, а не модели"""
+    genders = dict(m.Person.Gender.choices)
+
     def get_queryset(self):
-        qs = m.Person.objects.all()
-        if self.q:
-            qs = qs.filter(title__icontains=self.q)
-        return qs
+        return autocomplete.suggest(self.q)
+
+    def get_result_value(self, item):
+        return str(item['id'])
 
     def get_result_label(self, item):
-        return f"{item.title} ({item.get_gender_display()})"
+        return f"{item['title']} ({self.genders.get(item['gender'], item['gender'])})"
 
 
@@ -1,9 +1,13 @@
+from itertools import islice
+from random import randint
+from smtplib import SMTPException
+
 from celery import shared_task
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, get_connection, send_mail
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db.models import Max, Min
 from peoples.models import Person
-from random import choice
 
 
 @shared_task
@@ -28,15 +32,62 @@ def send_password_reset_email(email, subject, message):
     )
 
 
+# Ежедневное приветствие рассылается веером: send_daily_greeting только выбирает личность и режет получателей
+# на пачки по GREETING_CHUNK_SIZE, каждую пачку отправляет отдельная задача через одно SMTP-соединение
+GREETING_CHUNK_SIZE = 100
+
+
+def random_person_title():
+    """Случайная опубликованная личность за два запроса по индексу pk, без загрузки таблицы"""
+    published = Person.published.order_by()
+    bounds = published.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return None
+    # при пропусках в pk личность после большого пропуска выпадает чаще - для приветствия это не важно
+    pk = randint(bounds['low'], bounds['high'])
+    return published.filter(pk__gte=pk).order_by('pk').values_list('title', flat=True).first()
+
+
 @shared_task
 def send_daily_greeting():
-    person = choice(list(Person.published.all()))
+    title = random_person_title()
+    if title is None:
+        return 0
+
     mail_users = get_user_model().objects.filter(is_active=True, email__isnull=False, email__contains='@mail.ru')
-    for user in mail_users:
-        send_mail(
-            subject=f'Приветствие от {person.title}',
-            message=f'{user.username}, {person.title} передает тебе привет!',
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            fail_silently=False,
-        )
\ No newline at end of file
+    recipients = mail_users.order_by('pk').values_list('username', 'email').iterator(chunk_size=GREETING_CHUNK_SIZE)
+    chunks = 0
+    while chunk := list(islice(recipients, GREETING_CHUNK_SIZE)):
+        send_greeting_batch.delay(title, chunk)
+        chunks += 1
+    return chunks
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=60)
+def send_greeting_batch(self, title, recipients):
+    """recipients - пары [username, email]; повторно отправляются только письма, которые не ушли"""
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except (SMTPException, OSError):
+        # соединение или авторизация не удались - не ушло ни одно письмо
+        raise self.retry(args=(title, recipients))
+
+    failed = []
+    with connection:
+        for username, email in recipients:
+            message = EmailMessage(
+                subject=f'Приветствие от {title}',
+                body=f'{username}, {title} передает тебе привет!',
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[email],
+                connection=connection,
+            )
+            try:
+                connection.send_messages([message])
+            except (SMTPException, OSError):
+                failed.append([username, email])
+
+    if failed:
+        raise self.retry(args=(title, failed))
+    return len(recipients)
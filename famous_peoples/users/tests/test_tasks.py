@@ -0,0 +1,71 @@
+from smtplib import SMTPAuthenticationError, SMTPRecipientsRefused
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from users import tasks
+from .test_views import person
+from peoples.tests.test_views import category
+
+
+@pytest.fixture
+def recipients():
+    User = get_user_model()
+    User.objects.create_user(username='other', email='other@gmail.com', password='Password_1')
+    User.objects.create_user(username='inactive', email='inactive@mail.ru', password='Password_1', is_active=False)
+    return [User.objects.create_user(username=f'user{n}', email=f'user{n}@mail.ru', password='Password_1')
+            for n in range(5)]
+
+
+@pytest.fixture
+def eager_batches(monkeypatch):
+    """Пачки выполняются сразу в тесте, без брокера"""
+    monkeypatch.setattr(tasks, 'GREETING_CHUNK_SIZE', 2)
+    monkeypatch.setattr(tasks.send_greeting_batch, 'delay', lambda *args: tasks.send_greeting_batch.apply(args))
+
+
+@pytest.mark.django_db
+def test_send_daily_greeting(person, recipients, eager_batches, django_assert_max_num_queries):
+    """Письма получают только активные пользователи mail.ru, по пачкам"""
+    with django_assert_max_num_queries(3):
+        assert tasks.send_daily_greeting() == 3
+    assert sorted(message.to[0] for message in mail.outbox) == [f'user{n}@mail.ru' for n in range(5)]
+    assert mail.outbox[0].subject == f'Приветствие от {person.title}'
+
+
+@pytest.mark.django_db
+def test_send_daily_greeting_without_persons(recipients, eager_batches):
+    assert tasks.send_daily_greeting() == 0
+    assert mail.outbox == []
+
+
+def test_send_greeting_batch_retries_failed(monkeypatch):
+    """Повторно отправляются только письма, которые не ушли"""
+    send_messages = EmailBackend.send_messages
+    refused = {'user1@mail.ru'}
+
+    def flaky_send_messages(self, messages):
+        if messages[0].to[0] in refused:
+            refused.clear()
+            raise SMTPRecipientsRefused({messages[0].to[0]: (550, b'busy')})
+        return send_messages(self, messages)
+
+    monkeypatch.setattr(EmailBackend, 'send_messages', flaky_send_messages)
+    tasks.send_greeting_batch.apply(('Пушкин', [['user0', 'user0@mail.ru'], ['user1', 'user1@mail.ru']]))
+    assert [message.to[0] for message in mail.outbox] == ['user0@mail.ru', 'user1@mail.ru']
+
+
+def test_send_greeting_batch_retries_connection(monkeypatch):
+    """Если соединение не открылось, пачка повторяется целиком"""
+    attempts = []
+
+    def flaky_open(self):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise SMTPAuthenticationError(535, b'auth failed')
+
+    monkeypatch.setattr(EmailBackend, 'open', flaky_open)
+    result = tasks.send_greeting_batch.apply(('Пушкин', [['user0', 'user0@mail.ru'], ['user1', 'user1@mail.ru']]))
+    assert result.get() == 2
+    assert [message.to[0] for message in mail.outbox] == ['user0@mail.ru', 'user1@mail.ru']